@@ -13,7 +13,7 @@ from antelope import antelope_herd
 
 import importlib
 
-from .from_json import from_json, to_json
+from .from_json import from_json, from_json_stream, to_json
 from .archives import archive_factory, ArchiveError
 
 FOUND_PROVIDERS = LowerDict()
@@ -3,9 +3,11 @@ from antelope import NoReference
 from .entity_store import EntityStore, SourceAlreadyKnown, EntityExists, uuid_regex
 from .basic_archive import BasicArchive, BASIC_ENTITY_TYPES, InterfaceError, ArchiveError
 from .archive_index import index_archive, BasicIndex, LcIndex
+from .lazy_index import LazyIndex
 from .term_manager import TermManager
 from .lc_archive import LcArchive, LC_ENTITY_TYPES
-from ..from_json import from_json
+from .columnar_archive import ColumnarArchive, write_columnar
+from ..from_json import from_json, from_json_stream
 
 from pathlib import Path
 from collections import defaultdict
@@ -35,7 +37,7 @@ class Qdb(BasicArchive):
 
 
 def update_archive(archive, json_file):
-    archive.load_from_dict(from_json(json_file), jsonfile=json_file)
+    archive.load_from_dict(from_json_stream(json_file), jsonfile=json_file)
 
 
 # find antelope providers
@@ -43,7 +45,9 @@ init_map = {
     'basicarchive': BasicArchive,
     'basicindex': BasicIndex,
     'lcarchive': LcArchive,
-    'lcindex': LcIndex
+    'lcindex': LcIndex,
+    'lazyindex': LazyIndex,
+    'columnararchive': ColumnarArchive
 }
 
 
@@ -66,7 +70,7 @@ def archive_from_json(fname, factory=archive_factory, catalog=None, **archive_kw
     :param catalog: [None] necessary to retrieve upstream archives, if specified
     :return: an ArchiveInterface
     """
-    j = from_json(fname)
+    j = from_json_stream(fname)
 
     if 'upstreamReference' in j or catalog is not None:
         print('**Upstream reference encountered: %s' % j['upstreamReference'])
@@ -22,12 +22,19 @@ class BasicIndex(AbstractIndex, BasicArchive):
     def serialize(self, characterizations=False, values=False, domesticate=False):
         return super(BasicIndex, self).serialize(characterizations=False, values=False, domesticate=False)
 
+    def _serialize_sections(self, characterizations=False, values=False, domesticate=False):
+        return super(BasicIndex, self)._serialize_sections(characterizations=False, values=False, domesticate=False)
+
 
 class LcIndex(AbstractIndex, LcArchive):
     _ns_uuid_required = None
     def serialize(self, exchanges=False, characterizations=False, values=False, domesticate=False):
         return super(LcIndex, self).serialize(exchanges=False, characterizations=False, values=False, domesticate=False)
 
+    def _serialize_sections(self, exchanges=False, characterizations=False, values=False, domesticate=False):
+        return super(LcIndex, self)._serialize_sections(exchanges=False, characterizations=False, values=False,
+                                                        domesticate=False)
+
 
 def index_archive(archive, source, ref=None, signifier='index', force=False):
     if source is None:
@@ -52,8 +59,7 @@ def index_archive(archive, source, ref=None, signifier='index', force=False):
         index = BasicIndex(source, ref=ref, static=True, **archive.init_args)
         types = BASIC_ENTITY_TYPES
     for t in types:
-        for e in archive.entities_by_type(t):
-            index.add(e)
+        index.add_many(archive.entities_by_type(t))
 
     # import original archives list of names
     names = defaultdict(list)
@@ -3,13 +3,14 @@ import re
 from collections import defaultdict
 from .entity_store import EntityStore, SourceAlreadyKnown, EntityExists
 from .term_manager import TermManager
+from .text_index import TextIndex, expand_subtag
 
 from ..implementations import BasicImplementation, IndexImplementation, QuantityImplementation, ConfigureImplementation
 from antelope import BasicQuery, EntityNotFound, FlowInterface
 from ..entities import LcQuantity, LcUnit, LcFlow
 from ..characterizations import DuplicateCharacterizationError
 
-from ..from_json import from_json, to_json
+from ..from_json import from_json_stream, to_json, join_sections
 
 
 
@@ -76,7 +77,7 @@ class BasicArchive(EntityStore):
         :param ref: fallback reference to use if none is specified in source file
         :return:
         """
-        j = from_json(filename)
+        j = from_json_stream(filename)
         init_args.update(j.pop('initArgs', {}))
 
         old_ref = j.pop('dataReference', ref)
@@ -120,7 +121,16 @@ class BasicArchive(EntityStore):
 
         return ar
 
-    def __init__(self, *args, contexts=None, flowables=None, term_manager=None, **kwargs):
+    def __init__(self, *args, contexts=None, flowables=None, term_manager=None, text_index=False, **kwargs):
+        """
+        :param contexts: passed to the TermManager, if one is created
+        :param flowables: passed to the TermManager, if one is created
+        :param term_manager: [None] a TermManager to use instead of creating a captive one
+        :param text_index: [False] whether to use an inverted index of entity properties to answer searches (see
+         text_index.TextIndex).  The index is built on the first search.
+        """
+        self._use_text_index = text_index
+        self._text_index = None
         super(BasicArchive, self).__init__(*args, **kwargs)
         self._tm = term_manager or TermManager(contexts=contexts, flowables=flowables)
         self._set_query()
@@ -185,9 +195,104 @@ class BasicArchive(EntityStore):
         super(BasicArchive, self)._ensure_valid_refs(entity)
 
     def add(self, entity):
-        self._add(entity, entity.external_ref)
+        self._add(entity, self._entity_key(entity))
         self._add_to_tm(entity)
 
+    def _entity_key(self, entity):
+        return entity.external_ref
+
+    def add_many(self, entities, validate=True, merge_strategy=None):
+        """
+        Add a collection of entities at once.  All the entities are validated before any are added, and none of them
+        is announced as it is added.  Each entity is added with _add_bulk(), and the entities are registered with the
+        term manager in a single pass at the end with _add_many_to_tm().
+
+        Subclasses that override add() have each entity passed to add() instead, including entities whose keys are
+        already present, so that the subclass's own handling applies.
+        :param entities: iterable of entities
+        :param validate: [True] whether to validate the entities (ignored if the archive was created with no_validate)
+        :param merge_strategy: [None] passed to the term manager when adding flows
+        :return: list of entities added.  Entities whose keys are already present in the archive (or earlier in the
+         collection) are skipped.  (If add() is overridden, every entity is returned.)
+        """
+        entities = list(entities)
+        if type(self).add is not BasicArchive.add:
+            for entity in entities:
+                self.add(entity)
+            return entities
+        if validate and not self._no_validate:
+            invalid = [e for e in entities if e.is_entity and not e.validate()]
+            if invalid:
+                raise ValueError('%d entities fail validation: %s' % (len(invalid), repr(invalid[0])))
+        added = []
+        self._dup_uuids = []
+        try:
+            for entity in entities:
+                if self._entity_key(entity) in self._entities:
+                    continue
+                self._add_bulk(entity)
+                added.append(entity)
+        finally:
+            dups, self._dup_uuids = self._dup_uuids, None
+            if dups:
+                print('Warning: %d UUIDs already exist (%s, ...)' % (len(dups), dups[0]))
+            self._add_many_to_tm(added, merge_strategy=merge_strategy)
+        return added
+
+    def _add_bulk(self, entity):
+        """
+        Add a single entity on behalf of add_many(): the entity has already been validated, is not announced, and is
+        registered with the term manager afterwards.  Can be overridden.
+        :param entity:
+        :return:
+        """
+        self._add(entity, self._entity_key(entity), quiet=True, validate=False)
+
+    def _add_many_to_tm(self, entities, merge_strategy=None):
+        """
+        Register entities added by add_many() with the term manager: quantities first, then flows in one
+        TermManager.add_flows() call.  If _add_to_tm() is overridden, it is called for each entity instead.
+        :param entities:
+        :param merge_strategy:
+        :return:
+        """
+        if type(self)._add_to_tm is not BasicArchive._add_to_tm:
+            for entity in entities:
+                self._add_to_tm(entity, merge_strategy=merge_strategy)
+            return
+        for entity in entities:
+            if entity.entity_type == 'quantity':
+                self._add_to_tm(entity)
+        self.tm.add_flows([entity for entity in entities if isinstance(entity, FlowInterface)],
+                          merge_strategy=merge_strategy)
+
+    def _add(self, entity, key, quiet=False, validate=True):
+        super(BasicArchive, self)._add(entity, key, quiet=quiet, validate=validate)
+        if self._text_index is not None:
+            self._text_index.add(key, entity)
+
+    def reindex(self, entity=None):
+        """
+        Update the text index after an entity's properties have been changed other than by setting them (properties
+        that are set are re-indexed automatically).
+        :param entity: [None] the entity to re-index; if omitted, the index is discarded and will be rebuilt on the
+         next search
+        :return:
+        """
+        if entity is None:
+            self._text_index = None
+        elif self._text_index is not None:
+            key = entity.external_ref
+            if key in self._text_index:
+                self._text_index.add(key, entity)
+
+    def _build_text_index(self):
+        index = TextIndex()
+        for keys in self._ents_by_type.values():
+            for key in keys:
+                index.add(key, self._entities[key])
+        self._text_index = index
+
     def _add_to_tm(self, entity, merge_strategy=None):
         if entity.entity_type == 'quantity':
             self.tm.add_quantity(entity)
@@ -314,13 +419,14 @@ class BasicArchive(EntityStore):
             raise TypeError('Unknown entity type %s' % etype)
         return entity
 
-    def entity_from_json(self, e):
+    def _new_entity_from_json(self, e):
         """
-        Create an LcEntity subclass from a json-derived dict
+        Create an LcEntity subclass from a json-derived dict, without adding it to the archive
 
         this could use some serious refactoring
         :param e:
-        :return:
+        :return: the new entity and its characterizations (empty unless it is a flow); or, if the entity is already
+         known, the existing entity and None
         """
         if 'tags' in e:
             raise OldJson('This file type is no longer supported.')
@@ -332,7 +438,7 @@ class BasicArchive(EntityStore):
             ext_ref = e['entity_uuid']
         ext_ref = str(ext_ref)
         if ext_ref in self._entities:
-            return self[ext_ref]
+            return self[ext_ref], None
         etype = e.pop('entityType')
         if etype == 'flow':
             # need to delay adding characterizations until after entity is registered with term manager
@@ -345,14 +451,52 @@ class BasicArchive(EntityStore):
         e['origin'] = e.pop('origin', self.ref)
 
         entity = self._make_entity(e, etype, ext_ref)
+        return entity, chars
+
+    def entity_from_json(self, e):
+        """
+        Create an LcEntity subclass from a json-derived dict and add it to the archive
+        :param e:
+        :return:
+        """
+        entity, chars = self._new_entity_from_json(e)
+        if chars is None:
+            return entity
 
         self.add(entity)
-        if etype == 'flow':
+        if entity.entity_type == 'flow':
             # characterization infrastructure
             self._add_chars(entity, chars)
 
         return entity
 
+    def entities_from_json(self, es, entity_type=None):
+        """
+        Create entities from a list of json-derived dicts and add them to the archive with add_many()
+        :param es: iterable of dicts
+        :param entity_type: [None] if given, assigned to each dict's entityType
+        :return: list of the archive's entities corresponding to the dicts
+        """
+        batch = []
+        new = dict()  # key -> entity not yet in the archive
+        for e in es:
+            if entity_type is not None:
+                e['entityType'] = entity_type
+            entity, chars = self._new_entity_from_json(e)
+            if chars is not None:
+                key = self._entity_key(entity)
+                if key in new:  # repeated: as with entity_from_json(), the first is kept
+                    entity, chars = new[key], None
+                else:
+                    new[key] = entity
+            batch.append((entity, chars))
+        self.add_many(new.values())
+        for entity, chars in batch:
+            if chars:
+                # characterization infrastructure
+                self._add_chars(entity, chars)
+        return [entity for entity, _ in batch]
+
     def load_from_dict(self, j, _check=True, jsonfile=None):
         """
         Archives loaded from JSON files are considered static.
@@ -384,9 +528,7 @@ class BasicArchive(EntityStore):
 
         q_map = dict()
         if 'quantities' in j:
-            for e in j['quantities']:
-                e['entityType'] = 'quantity'
-                q = self.entity_from_json(e)
+            for q in self.entities_from_json(j['quantities'], 'quantity'):
                 if q.uuid is not None:
                     q_map[q.uuid] = q
                 q_map[q.external_ref] = q
@@ -394,9 +536,7 @@ class BasicArchive(EntityStore):
             self.tm.add_from_json(j['termManager'], q_map, self.ref)
 
         if 'flows' in j:
-            for e in j['flows']:
-                e['entityType'] = 'flow'
-                self.entity_from_json(e)
+            self.entities_from_json(j['flows'], 'flow')
 
         if 'loaded' in j:
             self._loaded = j['loaded']
@@ -408,7 +548,7 @@ class BasicArchive(EntityStore):
         if self.source is None:
             return
         if os.path.exists(self.source):
-            self.load_from_dict(from_json(self.source))
+            self.load_from_dict(from_json_stream(self.source))
 
     @staticmethod
     def _narrow_search(entity, **kwargs):
@@ -418,13 +558,6 @@ class BasicArchive(EntityStore):
         :param kwargs:
         :return: bool
         """
-        def _recurse_expand_subtag(tag):
-            if tag is None:
-                return ''
-            elif isinstance(tag, str):
-                return tag
-            else:
-                return '\n'.join([_recurse_expand_subtag(t) for t in tag])
         keep = True
         for k, v in kwargs.items():
             if v is None:
@@ -434,7 +567,7 @@ class BasicArchive(EntityStore):
             if isinstance(v, str):
                 v = [v]
             for vv in v:
-                keep = keep and bool(re.search(vv, _recurse_expand_subtag(entity[k]),
+                keep = keep and bool(re.search(vv, expand_subtag(entity[k]),
                                                flags=(re.IGNORECASE|re.MULTILINE)))
         return keep
 
@@ -451,6 +584,13 @@ class BasicArchive(EntityStore):
             offset = int(offset)
         else:
             offset = 0
+        if etype is None:
+            etype = kwargs.pop('entity_type', None)
+        if etype is not None and all(v is None for v in kwargs.values()):
+            # nothing to filter: page directly through the sorted entities
+            for k in self.entities_by_type(etype, offset=offset, count=count or None):
+                yield k
+            return
         if count is None:
             count = len(self._entities)  # just need something that is guaranteed not to run out
         for k in self._search(etype, **kwargs):
@@ -474,43 +614,61 @@ class BasicArchive(EntityStore):
             if 'entity_type' in kwargs.keys():
                 etype = kwargs.pop('entity_type')
         if etype is not None:
-            for ent in self.entities_by_type(etype):
-                if self._narrow_search(ent, **kwargs):
-                    yield ent
+            ents = self.entities_by_type(etype)
         else:
-            for ent in self._entities.values():
-                if self._narrow_search(ent, **kwargs):
-                    yield ent
+            ents = self._entities.values()
+        candidates = None
+        if self._use_text_index:
+            if self._text_index is None:
+                self._build_text_index()
+            else:
+                self._text_index.refresh(self._entities)
+            keys = self._text_index.candidates(**kwargs)
+            if keys is not None:
+                candidates = set(id(self._entities[k]) for k in keys)
+        for ent in ents:
+            if candidates is not None and id(ent) not in candidates:
+                continue
+            if self._narrow_search(ent, **kwargs):
+                yield ent
 
     def _serialize_quantities(self, domesticate=False):
         return sorted([q.serialize(domesticate=domesticate, drop_fields=self._drop_fields['quantity'])
                        for q in self.entities_by_type('quantity')],
                       key=lambda x: x['externalId'])
 
-    def serialize(self, characterizations=False, values=False, domesticate=False):
-        """
+    def _serialize_flows(self, domesticate=False):
+        for f in sorted(self.entities_by_type('flow'), key=lambda x: x.external_ref):
+            yield f.serialize(domesticate=domesticate, drop_fields=self._drop_fields['flow'])
 
-        :param characterizations:
-        :param values:
-        :param domesticate: [False] if True, omit entities' origins so that they will appear to be from the new archive
-         upon serialization
-        :return:
-        """
+    def _serialize_sections(self, characterizations=False, values=False, domesticate=False):
         j = super(BasicArchive, self).serialize()
         j['@context'] = LD_CONTEXT
 
-        j['flows'] = sorted([f.serialize(domesticate=domesticate, drop_fields=self._drop_fields['flow'])
-                             for f in self.entities_by_type('flow')],
-                            key=lambda x: x['externalId'])
         if characterizations:
+            # computed up front because it adds the characterized quantities to the archive
             j['termManager'], qqs, rqs = self.tm.serialize(self.ref, values=values)
             for q in qqs:
                 if self[q] is None:
                     self.add(self.tm.get_canonical(q))
 
-        j['quantities'] = self._serialize_quantities(domesticate=domesticate)
+        sections = {
+            'flows': self._serialize_flows(domesticate=domesticate),
+            'quantities': self._serialize_quantities(domesticate=domesticate)
+        }
+        return j, sections
+
+    def serialize(self, characterizations=False, values=False, domesticate=False):
+        """
 
-        return j
+        :param characterizations:
+        :param values:
+        :param domesticate: [False] if True, omit entities' origins so that they will appear to be from the new archive
+         upon serialization
+        :return:
+        """
+        return join_sections(*self._serialize_sections(characterizations=characterizations, values=values,
+                                                       domesticate=domesticate))
 
     def export_quantities(self, filename, *quantities, domesticate=True, values=True, gzip=False):
         """
@@ -539,3 +697,6 @@ class BasicArchive(EntityStore):
 
     def _serialize_all(self, **kwargs):
         return self.serialize(characterizations=True, values=True, **kwargs)
+
+    def _serialize_all_sections(self, **kwargs):
+        return self._serialize_sections(characterizations=True, values=True, **kwargs)
@@ -0,0 +1,246 @@
+"""
+Columnar storage for characterization factors.
+
+By default, the TermManager stores every characterization as a Characterization object with its own dict of
+per-locale values, held in dicts (or CLookups) of sets.  When a term manager is created with columnar=True, the
+characterizations are instead recorded in a ColumnarCFStore: flowable names, contexts, quantities, origins and
+locales are interned as integer ids, and the CF attributes and values are kept in flat typed arrays.  The per-flowable
+lookups then hold only integer CF ids.
+
+Characterization objects are created on demand when a CF is retrieved.  At most one object exists for a given CF at a
+time, and its location values write through to the store, so that updates made through the object (e.g. by
+TermManager.add_characterization) are persisted.
+"""
+
+from array import array
+from collections.abc import MutableMapping
+from weakref import WeakValueDictionary
+
+from ..characterizations import Characterization
+
+
+class Interner(object):
+    """
+    Maps hashable terms to consecutive integer ids and back
+    """
+    def __init__(self):
+        self._ids = dict()
+        self._terms = []
+
+    def __len__(self):
+        return len(self._terms)
+
+    def id(self, term):
+        try:
+            return self._ids[term]
+        except KeyError:
+            i = self._ids[term] = len(self._terms)
+            self._terms.append(term)
+            return i
+
+    def term(self, i):
+        return self._terms[i]
+
+
+class _StoredLocations(dict):
+    """
+    The per-locale values of a materialized Characterization.  Mutations are written through to the store.
+    """
+    def __init__(self, store, cf_id, *args):
+        super(_StoredLocations, self).__init__(*args)
+        self._store = store
+        self._cf_id = cf_id
+
+    def __setitem__(self, key, value):
+        super(_StoredLocations, self).__setitem__(key, value)
+        self._store.set_value(self._cf_id, key, value)
+
+    def __delitem__(self, key):
+        super(_StoredLocations, self).__delitem__(key)
+        self._store.del_value(self._cf_id, key)
+
+    def pop(self, key, *args):
+        if key in self:
+            self._store.del_value(self._cf_id, key)
+        return super(_StoredLocations, self).pop(key, *args)
+
+    def update(self, *args, **kwargs):
+        for k, v in dict(*args, **kwargs).items():
+            self.__setitem__(k, v)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.__setitem__(key, default)
+        return self[key]
+
+    def clear(self):
+        for k in list(self.keys()):
+            self.__delitem__(k)
+
+
+class ColumnarCFStore(object):
+    """
+    Integer-coded, array-backed storage of characterization factors.
+
+    Each CF has one entry in each of the CF columns (flowable name, ref quantity, query quantity, context, origin).
+    Each location value has one entry in each of the value columns (CF id, locale, value, next value).  The values of
+    a CF form a linked list starting at the CF's first value row.  Numeric values are stored as float64; qualitative
+    (string) values are kept in a side dict.
+    """
+    def __init__(self):
+        self._flowables = Interner()
+        self._quantities = Interner()
+        self._contexts = Interner()
+        self._origins = Interner()
+        self._locales = Interner()
+
+        self._cf_flowable = array('l')
+        self._cf_rq = array('l')
+        self._cf_qq = array('l')
+        self._cf_cx = array('l')
+        self._cf_origin = array('l')
+        self._cf_first = array('l')  # first value row, or -1
+
+        self._v_locale = array('l')  # locale id, or -1 for a deleted value
+        self._v_value = array('d')
+        self._v_next = array('l')
+        self._v_str = dict()  # value row -> qualitative value
+
+        self._live = WeakValueDictionary()  # cf id -> materialized Characterization
+
+    def __len__(self):
+        return len(self._cf_qq)
+
+    @property
+    def n_values(self):
+        return sum(1 for k in self._v_locale if k >= 0)
+
+    def cf_id(self, cf):
+        """
+        Returns the id of a CF that is already stored, or None
+        :param cf:
+        :return:
+        """
+        if isinstance(cf._locations, _StoredLocations) and cf._locations._store is self:
+            return cf._locations._cf_id
+        return None
+
+    def add(self, cf):
+        """
+        Store a Characterization and return its integer id.  The supplied object is adopted: its values subsequently
+        write through to the store.  Adding an object that is already stored returns its existing id.
+        :param cf:
+        :return:
+        """
+        i = self.cf_id(cf)
+        if i is not None:
+            return i
+        i = len(self._cf_qq)
+        self._cf_flowable.append(self._flowables.id(cf.flowable))
+        self._cf_rq.append(self._quantities.id(cf.ref_quantity))
+        self._cf_qq.append(self._quantities.id(cf.quantity))
+        self._cf_cx.append(self._contexts.id(cf.context))
+        self._cf_origin.append(self._origins.id(cf.origin))
+        self._cf_first.append(-1)
+        for loc, val in cf._locations.items():
+            self.set_value(i, loc, val)
+        cf._locations = _StoredLocations(self, i, cf._locations)
+        self._live[i] = cf
+        return i
+
+    def _rows(self, cf_id):
+        r = self._cf_first[cf_id]
+        while r >= 0:
+            yield r
+            r = self._v_next[r]
+
+    def _row_value(self, r):
+        if r in self._v_str:
+            return self._v_str[r]
+        return self._v_value[r]
+
+    def values(self, cf_id):
+        """
+        :param cf_id:
+        :return: dict of locale to value
+        """
+        return {self._locales.term(self._v_locale[r]): self._row_value(r)
+                for r in self._rows(cf_id) if self._v_locale[r] >= 0}
+
+    def set_value(self, cf_id, locale, value):
+        loc = self._locales.id(locale)
+        last = -1
+        for r in self._rows(cf_id):
+            if self._v_locale[r] == loc:
+                break
+            last = r
+        else:
+            r = len(self._v_locale)
+            self._v_locale.append(loc)
+            self._v_value.append(0.0)
+            self._v_next.append(-1)
+            if last < 0:
+                self._cf_first[cf_id] = r
+            else:
+                self._v_next[last] = r
+        if isinstance(value, str):
+            self._v_str[r] = value
+            self._v_value[r] = float('nan')
+        else:
+            self._v_str.pop(r, None)
+            self._v_value[r] = value
+
+    def del_value(self, cf_id, locale):
+        loc = self._locales.id(locale)
+        for r in self._rows(cf_id):
+            if self._v_locale[r] == loc:
+                self._v_locale[r] = -1
+                self._v_str.pop(r, None)
+
+    def get(self, cf_id):
+        """
+        Return the Characterization for the given CF id, creating it if necessary
+        :param cf_id:
+        :return:
+        """
+        try:
+            return self._live[cf_id]
+        except KeyError:
+            pass
+        cf = Characterization.__new__(Characterization)
+        cf.flowable = self._flowables.term(self._cf_flowable[cf_id])
+        cf.quantity = self._quantities.term(self._cf_qq[cf_id])
+        cf._ref_q = self._quantities.term(self._cf_rq[cf_id])
+        cf._context = self._contexts.term(self._cf_cx[cf_id])
+        cf._origin = self._origins.term(self._cf_origin[cf_id])
+        cf._locations = _StoredLocations(self, cf_id, self.values(cf_id))
+        self._live[cf_id] = cf
+        return cf
+
+
+class ColumnarDict(MutableMapping):
+    """
+    Drop-in replacement for the context -> Characterization dict used by the TermManager, holding CF ids in a
+    ColumnarCFStore
+    """
+    def __init__(self, store):
+        self._store = store
+        self._d = dict()
+
+    def __getitem__(self, key):
+        return self._store.get(self._d[key])
+
+    def __setitem__(self, key, value):
+        self._d[key] = self._store.add(value)
+
+    def __delitem__(self, key):
+        del self._d[key]
+
+    def __contains__(self, key):
+        return key in self._d
+
+    def __iter__(self):
+        return iter(self._d)
+
+    def __len__(self):
+        return len(self._d)
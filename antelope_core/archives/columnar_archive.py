@@ -0,0 +1,313 @@
+"""
+A binary, columnar on-disk format for LcArchives.
+
+A columnar archive is a directory containing:
+ - header.json: the archive's complete serialization, except for process exchanges and characterization factors
+ - strings.json: a table of all the strings referred to by the integer columns below
+ - one .npy file per column, readable with numpy.load() (and memory-mappable):
+   exchanges: x_process, x_flow, x_direction, x_termination, x_reference, x_value, x_value_mask, x_alloc_start
+   allocation: a_direction, a_flow, a_value  (the valueDict entries of each exchange, in exchange order)
+   characterizations: cf_quantity, cf_flowable, cf_context, cf_ref_quantity, cf_reference, cf_locale, cf_value,
+     cf_value_mask
+
+String columns hold indices into the string table, with -1 for None.  Exchanges are stored in process order, with
+x_process giving the index of each exchange's process in the header's process list; the allocation entries of
+exchange i are rows x_alloc_start[i] to x_alloc_start[i+1].  Whether a value is present is recorded in a separate
+mask column, so that NaN is stored as an ordinary value: x_value_mask is VALUE_ABSENT if the exchange's serialization
+has no 'value', VALUE_NULL if its value is null, and VALUE_STORED if the value is in x_value; cf_value_mask is False
+for the placeholder row of a characterization that has no values.  (Directories written without the mask columns are
+read as if every NaN were missing.)
+
+Write an archive with write_columnar(); load one with ColumnarArchive.from_directory() or through a catalog resource
+whose dataSourceType is 'ColumnarArchive'.  The loaded archive has the same serialization as one loaded from a JSON
+file written with write_to_file(complete=True).
+"""
+
+import os
+import re
+import json
+
+import numpy as np
+
+from ..entities import LcProcess, ZeroAllocation
+from ..from_json import from_json, to_json
+from .lc_archive import LcArchive
+
+
+HEADER_FILE = 'header.json'
+STRINGS_FILE = 'strings.json'
+DIRECTIONS = ('Input', 'Output')
+
+X_COLUMNS = ('x_process', 'x_flow', 'x_direction', 'x_termination', 'x_reference', 'x_value', 'x_value_mask',
+             'x_alloc_start')
+A_COLUMNS = ('a_direction', 'a_flow', 'a_value')
+CF_COLUMNS = ('cf_quantity', 'cf_flowable', 'cf_context', 'cf_ref_quantity', 'cf_reference', 'cf_locale',
+              'cf_value', 'cf_value_mask')
+
+VALUE_ABSENT, VALUE_NULL, VALUE_STORED = 0, 1, 2  # x_value_mask
+QUALITATIVE_FILE = 'cf_qualitative.json'  # row -> non-numeric CF value
+
+
+class _StringTable(object):
+    def __init__(self):
+        self._ids = dict()
+        self.strings = []
+
+    def __call__(self, s):
+        if s is None:
+            return -1
+        try:
+            return self._ids[s]
+        except KeyError:
+            i = self._ids[s] = len(self.strings)
+            self.strings.append(s)
+            return i
+
+
+def _value(j, key):
+    """
+    :return: the value to store, and its x_value_mask entry
+    """
+    if key not in j:
+        return float('nan'), VALUE_ABSENT
+    v = j[key]
+    if v is None:
+        return float('nan'), VALUE_NULL
+    return v, VALUE_STORED
+
+
+def write_columnar(archive, path, domesticate=False):
+    """
+    Write an LcArchive's complete contents (equivalent to serialize(exchanges=True, characterizations=True,
+    values=True)) to a columnar archive directory
+    :param archive: an LcArchive
+    :param path: directory to write (created if absent)
+    :param domesticate: [False] passed to serialize()
+    :return:
+    """
+    j = archive.serialize(exchanges=True, characterizations=True, values=True, domesticate=domesticate)
+    j['dataSourceType'] = 'ColumnarArchive'
+    j['dataSource'] = path
+    st = _StringTable()
+
+    cols = {k: [] for k in X_COLUMNS + A_COLUMNS}
+    for i, p in enumerate(j['processes']):
+        for x in p.pop('exchanges'):
+            cols['x_alloc_start'].append(len(cols['a_value']))
+            cols['x_process'].append(i)
+            cols['x_flow'].append(st(x['flow']))
+            cols['x_direction'].append(DIRECTIONS.index(x['direction']))
+            cols['x_termination'].append(st(x.get('termination')))
+            cols['x_reference'].append(bool(x.get('isReference', False)))
+            v, mask = _value(x, 'value')
+            cols['x_value'].append(v)
+            cols['x_value_mask'].append(mask)
+            for k, v in sorted(x.get('valueDict', dict()).items()):  # same order as to_json(sort_keys=True)
+                drr, fuu = k.split(':', 1)
+                cols['a_direction'].append(DIRECTIONS.index(drr))
+                cols['a_flow'].append(st(fuu))
+                cols['a_value'].append(v)
+    cols['x_alloc_start'].append(len(cols['a_value']))
+
+    cols.update({k: [] for k in CF_COLUMNS})
+    qualitative = dict()
+    tm = j.get('termManager', dict())
+    for qq, fbs in tm.pop('Characterizations', dict()).items():
+        for fb, cxs in fbs.items():
+            for cx, spec in cxs.items():
+                locs = spec.get('value')
+                present = bool(locs)
+                if not present:
+                    locs = {None: None}
+                for loc, val in locs.items():
+                    if isinstance(val, str):
+                        qualitative[len(cols['cf_value'])] = val
+                        val = None
+                    cols['cf_quantity'].append(st(qq))
+                    cols['cf_flowable'].append(st(fb))
+                    cols['cf_context'].append(st(cx))
+                    cols['cf_ref_quantity'].append(st(spec['ref_quantity']))
+                    cols['cf_reference'].append(bool(spec.get('isReference', False)))
+                    cols['cf_locale'].append(st(loc))
+                    cols['cf_value'].append(float('nan') if val is None else val)
+                    cols['cf_value_mask'].append(present)
+
+    os.makedirs(path, exist_ok=True)
+    for k, v in cols.items():
+        if k in ('x_reference', 'cf_reference', 'cf_value_mask'):
+            arr = np.array(v, dtype=bool)
+        elif k in ('x_value', 'a_value', 'cf_value'):
+            arr = np.array(v, dtype=np.float64)
+        elif k in ('x_direction', 'a_direction', 'x_value_mask'):
+            arr = np.array(v, dtype=np.int8)
+        else:
+            arr = np.array(v, dtype=np.int64)
+        np.save(os.path.join(path, k + '.npy'), arr)
+    with open(os.path.join(path, STRINGS_FILE), 'w') as fp:
+        json.dump(st.strings, fp)
+    with open(os.path.join(path, QUALITATIVE_FILE), 'w') as fp:
+        json.dump(qualitative, fp)
+    to_json(j, os.path.join(path, HEADER_FILE))
+
+
+def read_columns(path, mmap=True):
+    """
+    :param path: columnar archive directory
+    :param mmap: [True] whether to memory-map the columns
+    :return: dict of column name to numpy array
+    """
+    mode = 'r' if mmap else None
+    cols = dict()
+    for k in X_COLUMNS + A_COLUMNS + CF_COLUMNS:
+        fname = os.path.join(path, k + '.npy')
+        if k.endswith('_mask') and not os.path.exists(fname):
+            continue
+        cols[k] = np.load(fname, mmap_mode=mode)
+    if 'x_value_mask' not in cols:  # written before the mask columns were introduced
+        cols['x_value_mask'] = np.where(np.isnan(cols['x_value']), VALUE_ABSENT, VALUE_STORED).astype(np.int8)
+    if 'cf_value_mask' not in cols:
+        cols['cf_value_mask'] = ~np.isnan(cols['cf_value'])
+    return cols
+
+
+class ColumnarArchive(LcArchive):
+    """
+    An LcArchive that is loaded from a columnar archive directory (see write_columnar()).  Exchanges are built
+    directly from the column arrays, without intermediate dicts.
+    """
+    @classmethod
+    def from_directory(cls, path, ref=None, **init_args):
+        """
+        :param path: columnar archive directory
+        :param ref: fallback reference to use if none is specified in the header
+        :param init_args:
+        :return:
+        """
+        header = from_json(os.path.join(path, HEADER_FILE))
+        init_args.update(header.get('initArgs', {}))
+        ref = init_args.pop('dataReference', header.get('dataReference', ref))
+        ns_uuid = init_args.pop('ns_uuid', header.get('nsUuid'))
+        ar = cls(path, ref=ref, ns_uuid=ns_uuid, **init_args)
+        ar.load_columnar(header=header)
+        return ar
+
+    def __init__(self, *args, **kwargs):
+        super(ColumnarArchive, self).__init__(*args, **kwargs)
+        self._strings = None
+        self._columns = None
+        self._x_ranges = None
+
+    def write_to_file(self, filename, gzip=False, complete=False, compact=False, sort_keys=True, fast=False,
+                      **kwargs):
+        """
+        Write the archive in columnar format, to a directory.  Always complete; compact, sort_keys, and fast are
+        ignored.  If gzip is True or filename names a JSON file (.json or .json.gz), a complete JSON archive is
+        written instead (see LcArchive.write_to_file()).  An existing file that is not a directory is not
+        overwritten.
+        """
+        if gzip or re.search(r'\.json(\.gz)?$', filename):
+            gzip = gzip or filename.endswith('.gz')
+            return super(ColumnarArchive, self).write_to_file(filename, gzip=gzip, complete=True, compact=compact,
+                                                              sort_keys=sort_keys, fast=fast, **kwargs)
+        if os.path.exists(filename) and not os.path.isdir(filename):
+            raise ValueError('Columnar archives are written to a directory; %s is a file' % filename)
+        write_columnar(self, filename, **kwargs)
+
+    def _str(self, i):
+        if i < 0:
+            return None
+        return self._strings[i]
+
+    def _characterizations(self):
+        """
+        Reconstruct the termManager 'Characterizations' dict from the CF columns
+        :return:
+        """
+        c = self._columns
+        with open(os.path.join(self.source, QUALITATIVE_FILE)) as fp:
+            qualitative = {int(k): v for k, v in json.load(fp).items()}
+        chars = dict()
+        for row, (qq, fb, cx, rq, is_ref, loc, val, present) in enumerate(zip(*(c[k].tolist() for k in CF_COLUMNS))):
+            spec = chars.setdefault(self._str(qq), dict()).setdefault(self._str(fb), dict()).setdefault(
+                self._str(cx), {'ref_quantity': self._str(rq)})
+            if is_ref:
+                spec['isReference'] = True
+            if row in qualitative:
+                val = qualitative[row]
+            elif not present:
+                continue
+            spec.setdefault('value', dict())[self._str(loc)] = val
+        return chars
+
+    def load_columnar(self, header=None):
+        if header is None:
+            header = from_json(os.path.join(self.source, HEADER_FILE))
+        with open(os.path.join(self.source, STRINGS_FILE)) as fp:
+            self._strings = json.load(fp)
+        self._columns = read_columns(self.source)
+        starts = np.searchsorted(self._columns['x_process'], np.arange(len(header.get('processes', [])) + 1))
+        self._x_ranges = {str(p.get('externalId') or p.get('entityId')): (int(starts[i]), int(starts[i + 1]))
+                          for i, p in enumerate(header.get('processes', []))}
+        if 'termManager' in header:
+            header['termManager']['Characterizations'] = self._characterizations()
+        try:
+            self.load_from_dict(header, jsonfile=self.source)
+        finally:
+            self._strings = self._columns = self._x_ranges = None
+        self._loaded = True
+
+    def _load_all(self, **kwargs):
+        if self.source is None or not os.path.isdir(self.source):
+            return
+        self.load_columnar()
+
+    def _process_from_json(self, entity_j, ext_ref):
+        if 'exchanges' in entity_j or self._columns is None:
+            return super(ColumnarArchive, self)._process_from_json(entity_j, ext_ref)
+        entity_j.pop('referenceExchange', None)
+        a_b_q = entity_j.pop('AllocatedByQuantity', None)
+        process = LcProcess(ext_ref, **entity_j)
+
+        start, stop = self._x_ranges.get(ext_ref, (0, 0))
+        c = self._columns
+        flows, dirns, terms, is_refs, values, masks, a_starts = (
+            c[k][start:stop + (k == 'x_alloc_start')].tolist()
+            for k in ('x_flow', 'x_direction', 'x_termination', 'x_reference', 'x_value', 'x_value_mask',
+                      'x_alloc_start'))
+        ref_x = dict()
+        # first add reference exchanges
+        for i in range(stop - start):
+            if is_refs[i]:
+                f = self._entities[self._strings[flows[i]]]
+                d = DIRECTIONS[dirns[i]]
+                v = values[i] if masks[i] == VALUE_STORED else None
+                ref_x[f.external_ref] = process.add_exchange(f, d, value=v)
+                process.set_reference(f, d)
+        # then add ordinary [allocated] exchanges
+        for i in range(stop - start):
+            if is_refs[i]:
+                continue
+            f = self._entities[self._strings[flows[i]]]
+            d = DIRECTIONS[dirns[i]]
+            if terms[i] >= 0:
+                t = self._strings[terms[i]]
+                cx = self.tm[t]
+                if cx is not None:
+                    t = cx
+            else:
+                t = self.tm[f.context]
+            if masks[i] != VALUE_ABSENT:
+                process.add_exchange(f, d, value=values[i] if masks[i] == VALUE_STORED else None, termination=t)
+            for a in range(a_starts[i], a_starts[i + 1]):
+                rx = ref_x[self._strings[int(c['a_flow'][a])]]
+                process.add_exchange(f, d, reference=rx, value=float(c['a_value'][a]), termination=t)
+
+        if a_b_q is not None:
+            alloc_q = self[a_b_q['externalId']]  # allocation quantity must be locally present
+            if alloc_q is not None:
+                try:
+                    process.allocate_by_quantity(alloc_q)
+                except ZeroAllocation:
+                    pass
+
+        return process
@@ -17,12 +17,13 @@ from __future__ import print_function, unicode_literals
 import uuid
 import re
 import os
+from bisect import bisect_left
 from datetime import datetime
 
 from collections import defaultdict
 
 from antelope import local_ref
-from ..from_json import to_json
+from ..from_json import write_json_sections
 
 
 # CatalogRef = namedtuple('CatalogRef', ['archive', 'id'])
@@ -65,6 +66,20 @@ class SourceAlreadyKnown(Exception):
     pass
 
 
+def prefix_range(keys, prefix):
+    """
+    Find the keys that start with a given prefix
+    :param keys: a sorted list of strings
+    :param prefix:
+    :return: a slice of keys
+    """
+    start = bisect_left(keys, prefix)
+    stop = start
+    while stop < len(keys) and keys[stop].startswith(prefix):
+        stop += 1
+    return keys[start:stop]
+
+
 class EntityExists(Exception):
     pass
 
@@ -122,7 +137,7 @@ class EntityStoreInterface:
     def _add(self, entity, key):
         raise NotImplemented
 
-    def entities_by_type(self, entity_type):
+    def entities_by_type(self, entity_type, offset=None, count=None):
         raise NotImplemented
 
     def count_by_type(self, entity_type):
@@ -156,6 +171,7 @@ class EntityStore(object):
     '''
     _ns_uuid_required = False
     _origin = None  # can be set when a catalog is assigning a ref
+    _key_memo_size = 65536  # bound on the number of memoized ref resolutions
 
     def _ref_to_uuid(self, key):
         """
@@ -181,14 +197,24 @@ class EntityStore(object):
         """
         This method always returns a valid key into _entities, or None.  May be overridden.
 
+        Refs that resolve to a key by way of a UUID are memoized, since an entity cannot be removed once added.
+        Refs that fail to resolve are not, since the entity may be added later.
+
         :param key:
         :return:
         """
         if key in self._entities:
             return key
+        try:
+            return self._key_memo[key]
+        except KeyError:
+            pass
         uu = self._ref_to_uuid(key)
         if uu is not None:
             if uu in self._entities:
+                if len(self._key_memo) >= self._key_memo_size:
+                    self._key_memo.clear()
+                self._key_memo[key] = uu
                 return uu
 
     def get_uuid(self, key):
@@ -292,6 +318,10 @@ class EntityStore(object):
                 ref = dataReference
 
         self._entities = {}  # uuid-indexed list of known entities
+        self._sorted_ids = []  # sorted keys of self._entities, for prefix lookups
+        self._new_ids = []  # keys added to self._entities since _sorted_ids was last updated
+        self._dup_uuids = None  # during a bulk add, collects duplicate UUIDs instead of printing a warning for each
+        self._key_memo = dict()  # ref -> key into self._entities, for refs that resolve via UUID (see _ref_to_key)
 
         self._quiet = quiet  # whether to print out a message every time a new entity is added / deleted / modified
 
@@ -299,6 +329,7 @@ class EntityStore(object):
 
         self._counter = defaultdict(int)
         self._ents_by_type = defaultdict(set)
+        self._sorted_keys = dict()  # entity type -> sorted list of keys; dropped when a key of that type is added
         self._no_validate = no_validate
 
         self._loaded = False
@@ -554,9 +585,7 @@ class EntityStore(object):
         if item is None:
             return None
         try:
-            if isinstance(item, int) and self._ns_uuid is not None:
-                return self._entities[self._ref_to_nsuuid(item)]
-            return self._entities[self._ref_to_key(item)]
+            return self._entities[self._ref_to_key(item)]  # integer refs are resolved to ns-uuids here
         except KeyError:
             return None
 
@@ -575,9 +604,12 @@ class EntityStore(object):
                 if to_uuid(entity.uuid) != entity.uuid:
                     raise UuidNotValid(entity, entity.uuid)
             if entity.uuid in self._entities:
-                print('Warning: UUID %s already exists' % entity.uuid)
+                if self._dup_uuids is None:
+                    print('Warning: UUID %s already exists' % entity.uuid)
+                else:
+                    self._dup_uuids.append(entity.uuid)
 
-    def _add(self, entity, key, quiet=False):
+    def _add(self, entity, key, quiet=False, validate=True):
         if key is None:
             raise ValueError('Key not allowed to be None')
         if key in self._entities:
@@ -588,7 +620,7 @@ class EntityStore(object):
         if entity.entity_type not in self._entity_types:
             raise TypeError('Entity type %s not valid!' % entity.entity_type)
 
-        if entity.is_entity and not self._no_validate:
+        if validate and entity.is_entity and not self._no_validate:
             if not entity.validate():
                 raise ValueError('Entity fails validation: %s' % repr(entity))
 
@@ -601,18 +633,23 @@ class EntityStore(object):
 
         ## ADD TO ENTITIES DB
         self._entities[key] = entity
+        self._new_ids.append(key)
 
         if hasattr(entity, 'uuid'):
             if entity.uuid is not None and entity.uuid not in self._entities:
                 self._entities[entity.uuid] = entity
+                self._new_ids.append(entity.uuid)
 
         if self._ns_uuid is not None:  # ensure UUID3s work even if custom UUIDs are specified
             nsuuid = self._ref_to_uuid(entity.external_ref)
             if nsuuid is not None and nsuuid not in self._entities:
                 self._entities[nsuuid] = entity
+                self._new_ids.append(nsuuid)
 
         self._counter[entity.entity_type] += 1
-        self._ents_by_type[entity.entity_type].add(key)  # it's not ok to change an entity's type
+        if key not in self._ents_by_type[entity.entity_type]:
+            self._ents_by_type[entity.entity_type].add(key)  # it's not ok to change an entity's type
+            self._sorted_keys.pop(entity.entity_type, None)
 
     def check_counter(self, entity_type=None):
         if entity_type is None:
@@ -622,19 +659,29 @@ class EntityStore(object):
                                                            self._counter[entity_type]))
             self._counter[entity_type] = 0
 
+    def _entity_ids(self):
+        """
+        All the keys of self._entities (external refs, uuids and ns-uuids), in sorted order
+        :return:
+        """
+        if len(self._sorted_ids) + len(self._new_ids) != len(self._entities):
+            # keys were registered without _add()
+            self._sorted_ids = sorted(self._entities.keys())
+        elif self._new_ids:
+            self._sorted_ids = sorted(self._sorted_ids + self._new_ids)  # merges two sorted runs
+        self._new_ids = []
+        return self._sorted_ids
+
     def find_partial_id(self, uid, startswith=True):
         """
         :param uid: is a fragmentary (or complete) uuid string.
-        :param startswith: [True] use .startswith instead of full regex
+        :param startswith: [True] find keys that start with uid (in key order); if False, keys that match uid as a
+         regex (in the order they were added)
         :return: result set
         """
         if startswith:
-            def test(x, y):
-                return y.startswith(x)
-        else:
-            def test(x, y):
-                return bool(re.search(x, y))
-        result_set = [v for k, v in self._entities.items() if test(uid, k)]
+            return [self._entities[k] for k in prefix_range(self._entity_ids(), uid)]
+        result_set = [v for k, v in self._entities.items() if bool(re.search(uid, k))]
         return result_set
 
     def _fetch(self, entity, **kwargs):
@@ -718,8 +765,31 @@ class EntityStore(object):
             self._load_all(**kwargs)
             self._loaded = True
 
-    def entities_by_type(self, entity_type):
-        for u in sorted(self._ents_by_type[entity_type]):
+    def _keys_by_type(self, entity_type):
+        """
+        The keys of the given type, in sorted order.  The list is cached until an entity of that type is added, at
+        which point it is replaced (not modified), so it is safe to iterate over while adding entities.
+        :param entity_type:
+        :return:
+        """
+        try:
+            return self._sorted_keys[entity_type]
+        except KeyError:
+            keys = self._sorted_keys[entity_type] = sorted(self._ents_by_type[entity_type])
+            return keys
+
+    def entities_by_type(self, entity_type, offset=None, count=None):
+        """
+        Generate entities of the given type, sorted by key
+        :param entity_type:
+        :param offset: [None] number of entities to skip
+        :param count: [None] maximum number of entities to return
+        :return:
+        """
+        keys = self._keys_by_type(entity_type)
+        start = int(offset or 0)
+        stop = None if count is None else start + int(count)
+        for u in keys[start:stop]:
             yield self._entities[u]
 
     def count_by_type(self, entity_type):
@@ -746,12 +816,49 @@ class EntityStore(object):
         """
         return self.serialize(**kwargs)
 
-    def write_to_file(self, filename, gzip=False, complete=False, **kwargs):
+    def _serialize_sections(self, **kwargs):
+        """
+        The archive's serialization, split into a header dict and a dict of sections, each of which is an iterable
+        that generates serialized entities in order.  write_to_file() uses this to write an archive without holding
+        its complete serialization in memory.  Subclasses that extend serialize() should extend this to match.
+        :param kwargs: as serialize()
+        :return: header, sections
+        """
+        return self.serialize(**kwargs), dict()
+
+    def _serialize_all_sections(self, **kwargs):
+        """
+        To be overridden along with _serialize_all()
+        :param kwargs:
+        :return: header, sections
+        """
+        return self._serialize_sections(**kwargs)
+
+    def _sections_match(self, method, sections_method):
+        """
+        Whether a sections method can stand in for its serialization method, i.e. the serialization method is not
+        overridden in a subclass of the class that implements the sections method
+        """
+        mro = type(self).__mro__
+        owner = next(c for c in mro if method in c.__dict__)
+        sections_owner = next(c for c in mro if sections_method in c.__dict__)
+        return issubclass(sections_owner, owner)
+
+    def write_to_file(self, filename, gzip=False, complete=False, compact=False, sort_keys=True, fast=False,
+                      **kwargs):
         """
+        Entities are written as they are serialized, section by section, unless the subclass's serialize method does
+        not support it.
+        The output goes to a temporary file that replaces filename only once it is complete, so a failure during
+        serialization leaves any existing file intact.
 
         :param filename:
         :param gzip:
         :param complete:
+        :param compact: [False] omit indentation.  Smaller and faster to write, but a compact index file cannot be
+         opened lazily (see LazyIndex).  Compact files are still read one entity at a time by from_json_stream()
+        :param sort_keys: [True] sort the keys of every object.  Entities are always written in external_ref order.
+        :param fast: [False] encode with orjson if it is installed
         :param kwargs: whatever is required by the subclass's serialize method
         :return:
         """
@@ -760,9 +867,15 @@ class EntityStore(object):
         elif filename not in self.names:
             self._add_name(self.ref, filename)
         if complete:
-            s = self._serialize_all(**kwargs)
+            if self._sections_match('_serialize_all', '_serialize_all_sections'):
+                s, sections = self._serialize_all_sections(**kwargs)
+            else:
+                s, sections = self._serialize_all(**kwargs), dict()
             if self._loaded:
                 s['loaded'] = True
         else:
-            s = self.serialize(**kwargs)
-        to_json(s, filename, gzip=gzip)
+            if self._sections_match('serialize', '_serialize_sections'):
+                s, sections = self._serialize_sections(**kwargs)
+            else:
+                s, sections = self.serialize(**kwargs), dict()
+        write_json_sections(s, sections, filename, gzip=gzip, compact=compact, sort_keys=sort_keys, fast=fast)
@@ -0,0 +1,289 @@
+"""
+An index archive whose flows and processes are only built when they are requested.
+
+Index files (see archive_index.index_archive()) are written by to_json() with an indent, so each entity in the
+'flows' and 'processes' sections occupies a known range of lines.  On first open, a LazyIndex scans the file for
+those ranges and records each entity's external ref, uuid, and byte range in a small offsets file alongside the data.
+The data file is then memory-mapped, and a process is decoded from its byte range the first time it is retrieved.
+Quantities and flows are loaded on open, along with the term manager, so that the index's flowables, contexts, and
+other term manager queries give the same answers as a fully loaded index; processes, which make up the bulk of an
+index, are built on demand.  The memory map is released once every process has been built, or by close().
+
+Gzipped index files are decompressed once to a sidecar file so that they can be memory-mapped.  Files that are not
+indented are loaded in full, as an ordinary LcIndex.
+"""
+
+import gzip as gz
+import json
+import mmap
+import os
+import re
+import shutil
+from collections import defaultdict
+
+from .archive_index import LcIndex
+from .entity_store import prefix_range
+from ..from_json import JsonSectionReader, from_json_stream
+
+
+LAZY_SECTIONS = {'quantities': 'quantity', 'flows': 'flow', 'processes': 'process'}
+EAGER_SECTIONS = ('quantities', 'flows')  # decoded on open; only processes are built on demand
+OFFSETS_VERSION = 2
+
+_ELEMENT_START = b'\n    {'
+_ELEMENT_END = b'\n    }'
+_SECTION_END = b'\n  ]'
+_EXT_REF = re.compile(rb'\n      "externalId": ("(?:[^"\\]|\\.)*"|-?\d+)')
+_UUID = re.compile(rb'\n      "entityId": ("(?:[^"\\]|\\.)*")')
+
+
+def _data_file(source):
+    """
+    Return an uncompressed copy of the source, creating it if needed
+    :param source:
+    :return:
+    """
+    if not bool(re.search(r'\.gz$', source)):
+        return source
+    data = source[:-3]
+    if not os.path.exists(data) or os.path.getmtime(data) < os.path.getmtime(source):
+        with gz.open(source, 'rb') as fi, open(data, 'wb') as fo:
+            shutil.copyfileobj(fi, fo)
+    return data
+
+
+def _scan(mm, fname):
+    """
+    Locate the entities in an indented JSON archive
+    :param mm: the file's contents (an mmap)
+    :param fname: for error reporting
+    :return: list of [entity_type, external_ref, uuid, start, end], or None if the file is not indented
+    """
+    if mm[:2] != b'{\n':
+        return None
+    records = []
+    for section, etype in LAZY_SECTIONS.items():
+        key = ('\n  "%s": [' % section).encode()
+        pos = mm.find(key)
+        if pos < 0:
+            continue
+        if mm[pos + len(key):pos + len(key) + 1] == b']':
+            continue  # empty section
+        stop = mm.find(_SECTION_END, pos)
+        if stop < 0:
+            raise ValueError('%s: unterminated section %s' % (fname, section))
+        while True:
+            start = mm.find(_ELEMENT_START, pos, stop)
+            if start < 0:
+                break
+            end = mm.find(_ELEMENT_END, start, stop) + len(_ELEMENT_END)
+            m = _EXT_REF.search(mm, start, end)
+            u = _UUID.search(mm, start, end)
+            uuid = None if u is None else json.loads(u.group(1))
+            if m is None:
+                ext_ref = uuid
+            else:
+                ext_ref = str(json.loads(m.group(1)))
+            records.append([etype, ext_ref, uuid, start + 1, end])
+            pos = end
+    return records
+
+
+def build_offsets(source):
+    """
+    Return the offset index for an index file, building it (and writing it alongside the data) if it is absent or
+    out of date.
+    :param source: an index file, optionally gzipped
+    :return: the name of the uncompressed data file, and a dict with keys 'header' (the file's top-level values other
+     than entity lists) and 'entities' (list of [entity_type, external_ref, uuid, start, end]; None if the file is not
+     indented)
+    """
+    data = _data_file(source)
+    offsets_file = data + '.offsets'
+    stat = os.stat(data)
+    if os.path.exists(offsets_file):
+        with open(offsets_file) as fp:
+            offsets = json.load(fp)
+        if offsets.get('version') == OFFSETS_VERSION and \
+                offsets['size'] == stat.st_size and offsets['mtime'] == stat.st_mtime_ns:
+            return data, offsets
+    reader = JsonSectionReader(data)
+    try:
+        header, _ = reader.index(lazy=tuple(LAZY_SECTIONS.keys()))
+    finally:
+        reader.close()
+    with open(data, 'rb') as fp:
+        mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            records = _scan(mm, data)
+        finally:
+            mm.close()
+    offsets = {'version': OFFSETS_VERSION, 'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'header': header,
+               'entities': records}
+    try:
+        with open(offsets_file, 'w') as fp:
+            json.dump(offsets, fp)
+    except OSError:
+        pass  # read-only location: rebuild next time
+    return data, offsets
+
+
+class LazyIndex(LcIndex):
+    """
+    A static LcIndex that builds processes on demand from a memory-mapped index file.
+    """
+    _fp = None
+    _mm = None
+
+    @classmethod
+    def open(cls, source, ref=None, **kwargs):
+        """
+        Open an index file, taking the archive reference from the file unless one is given
+        :param source: an index file (typically .json.gz)
+        :param ref: [None]
+        :param kwargs:
+        :return: a loaded LazyIndex
+        """
+        _, offsets = build_offsets(source)
+        header = offsets['header']
+        if ref is None:
+            ref = header.get('dataReference', header.get('initArgs', dict()).get('dataReference'))
+        kwargs['static'] = True
+        index = cls(source, ref=ref, **kwargs)
+        index.load_all()
+        return index
+
+    def __init__(self, *args, **kwargs):
+        super(LazyIndex, self).__init__(*args, **kwargs)
+        self._data = None
+        self._fp = None
+        self._mm = None
+        self._pending = dict()  # external ref or uuid -> record of an entity not yet built
+        self._pending_by_type = defaultdict(dict)  # entity type -> external ref -> record
+        self._pending_ids = []  # sorted keys of self._pending as of load
+
+    def _load_all(self, **kwargs):
+        if self.source is None or not os.path.exists(self.source):
+            return
+        data, offsets = build_offsets(self.source)
+        if offsets['entities'] is None:
+            self.load_from_dict(from_json_stream(self.source), jsonfile=self.source)
+            return
+        self._data = data
+        self._open_data()
+        header = dict(offsets['header'])
+        for section in EAGER_SECTIONS:
+            header[section] = []
+        for rec in offsets['entities']:
+            etype, ext_ref, uuid, start, end = rec
+            if ext_ref in self._entities:
+                continue
+            if etype == 'process':
+                self._pending[ext_ref] = rec
+                if uuid is not None:
+                    self._pending[uuid] = rec
+                self._pending_by_type[etype][ext_ref] = rec
+            else:
+                header[next(k for k, v in LAZY_SECTIONS.items() if v == etype)].append(self._decode(rec))
+        self._pending_ids = sorted(self._pending.keys())
+        self.load_from_dict(header, _check=False, jsonfile=self.source)
+        if not self._pending:
+            self.close()
+
+    def _open_data(self):
+        if self._mm is None:
+            self._fp = open(self._data, 'rb')
+            self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        """
+        Release the memory map and data file.  They are reopened if an unbuilt process is later requested.
+        :return:
+        """
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def __del__(self):
+        self.close()
+
+    def _decode(self, rec):
+        start, end = rec[3:5]
+        self._open_data()
+        return json.loads(self._mm[start:end])
+
+    def _materialize(self, key):
+        """
+        Build an entity from its byte range
+        :param key: external ref or uuid
+        :return: the entity, or None if the key is not pending
+        """
+        rec = self._pending.get(key)
+        if rec is None:
+            return None
+        etype, ext_ref, uuid = rec[:3]
+        self._pending.pop(ext_ref, None)
+        if uuid is not None:
+            self._pending.pop(uuid, None)
+        self._pending_by_type[etype].pop(ext_ref, None)
+        e = self._decode(rec)
+        e['entityType'] = etype
+        entity = self.entity_from_json(e)
+        if not self._pending:
+            self.close()
+        return entity
+
+    def _materialize_type(self, entity_type):
+        for ext_ref in list(self._pending_by_type[entity_type].keys()):
+            self._materialize(ext_ref)
+
+    def _materialize_all(self):
+        for etype in list(self._pending_by_type.keys()):
+            self._materialize_type(etype)
+
+    @property
+    def n_pending(self):
+        return sum(len(v) for v in self._pending_by_type.values())
+
+    def __contains__(self, item):
+        return item in self._pending or super(LazyIndex, self).__contains__(item)
+
+    def __getitem__(self, item):
+        entity = super(LazyIndex, self).__getitem__(item)
+        if entity is None and self._pending:
+            if hasattr(item, 'external_ref'):
+                item = item.external_ref
+            entity = self._materialize(str(item))
+        return entity
+
+    def entities_by_type(self, entity_type, offset=None, count=None):
+        self._materialize_type(entity_type)
+        return super(LazyIndex, self).entities_by_type(entity_type, offset=offset, count=count)
+
+    def count_by_type(self, entity_type):
+        return super(LazyIndex, self).count_by_type(entity_type) + len(self._pending_by_type[entity_type])
+
+    def find_partial_id(self, uid, startswith=True):
+        if startswith:
+            found = prefix_range(self._pending_ids, uid)
+        else:
+            found = [k for k in self._pending if re.search(uid, k)]
+        for k in found:
+            self._materialize(k)  # no-op for keys already built
+        return super(LazyIndex, self).find_partial_id(uid, startswith=startswith)
+
+    def _search(self, etype=None, **kwargs):
+        if etype is None and 'entity_type' not in kwargs:
+            self._materialize_all()
+        return super(LazyIndex, self)._search(etype=etype, **kwargs)
+
+    def serialize(self, **kwargs):
+        self._materialize_all()
+        return super(LazyIndex, self).serialize(**kwargs)
+
+    def _serialize_sections(self, **kwargs):
+        self._materialize_all()
+        return super(LazyIndex, self)._serialize_sections(**kwargs)
@@ -9,6 +9,7 @@ from antelope import LcQuery
 from ..entities import LcProcess, ZeroAllocation
 from ..implementations import ExchangeImplementation, BackgroundImplementation, LcConfigureImplementation
 from .basic_archive import BasicArchive, BASIC_ENTITY_TYPES
+from ..from_json import join_sections
 
 
 LC_ENTITY_TYPES = BASIC_ENTITY_TYPES + ('process', )
@@ -19,7 +20,9 @@ class LcArchive(BasicArchive):
     A class meant for storing and managing LCA data collections.  Adds processes as a supported entity type (contrast
     with LcForeground which adds fragments).
 
-    To support processes, adds inventory, background, and configure interfaces.
+    To support processes, adds inventory, background, and configure interfaces.  The background interface is a proxy
+    unless the archive is created with matrix_background=True, in which case LCI results are computed from the
+    archive's technosphere matrix (requires scipy).
     """
     _entity_types = LC_ENTITY_TYPES
 
@@ -30,6 +33,9 @@ class LcArchive(BasicArchive):
         if iface == 'inventory' or iface == 'exchange':
             return ExchangeImplementation(self)
         elif iface == 'background':
+            if self.init_args.get('matrix_background'):
+                from ..implementations.matrix_background import MatrixBackgroundImplementation  # requires scipy
+                return MatrixBackgroundImplementation(self)
             return BackgroundImplementation(self)
         elif iface == 'configure':
             return LcConfigureImplementation(self)
@@ -57,8 +63,7 @@ class LcArchive(BasicArchive):
         """
         super(LcArchive, self).load_from_dict(j, _check=False, jsonfile=jsonfile)
         if 'processes' in j:
-            for e in j['processes']:
-                self.entity_from_json(e)
+            self.entities_from_json(j['processes'])
         if _check:
             self.check_counter()
         if jsonfile is not None and jsonfile == self.source:
@@ -133,14 +138,27 @@ class LcArchive(BasicArchive):
             return self._process_from_json(e, ext_ref)
         return super(LcArchive, self)._make_entity(e, etype, ext_ref)
 
-    def entities_by_type(self, entity_type):
+    def entities_by_type(self, entity_type, offset=None, count=None):
         if entity_type not in self._entity_types:
             entity_type = {
                 'p': 'process',
                 'f': 'flow',
                 'q': 'quantity'
             }[entity_type[0]]
-        return super(LcArchive, self).entities_by_type(entity_type)
+        return super(LcArchive, self).entities_by_type(entity_type, offset=offset, count=count)
+
+    def _serialize_processes(self, exchanges=False, values=False, domesticate=False):
+        for p in sorted(self.entities_by_type('process'), key=lambda x: x.external_ref):
+            yield p.serialize(exchanges=exchanges, values=values, domesticate=domesticate,
+                              drop_fields=self._drop_fields['process'])
+
+    def _serialize_sections(self, exchanges=False, characterizations=False, values=False, domesticate=False):
+        j, sections = super(LcArchive, self)._serialize_sections(characterizations=characterizations, values=values,
+                                                                 domesticate=domesticate)
+        sections['processes'] = self._serialize_processes(exchanges=exchanges, values=values, domesticate=domesticate)
+        if self._descendant:
+            j['dataSourceType'] = 'LcArchive'  # re-instantiate as base class
+        return j, sections
 
     def serialize(self, exchanges=False, characterizations=False, values=False, domesticate=False):
         """
@@ -152,15 +170,11 @@ class LcArchive(BasicArchive):
          upon serialization
         :return:
         """
-        j = super(LcArchive, self).serialize(characterizations=characterizations, values=values,
-                                             domesticate=domesticate)
-        j['processes'] = sorted([p.serialize(exchanges=exchanges, values=values,
-                                             domesticate=domesticate, drop_fields=self._drop_fields['process'])
-                                 for p in self.entities_by_type('process')],
-                                key=lambda x: x['externalId'])
-        if self._descendant:
-            j['dataSourceType'] = 'LcArchive'  # re-instantiate as base class
-        return j
+        return join_sections(*self._serialize_sections(exchanges=exchanges, characterizations=characterizations,
+                                                       values=values, domesticate=domesticate))
 
     def _serialize_all(self, **kwargs):
         return self.serialize(exchanges=True, characterizations=True, values=True, **kwargs)
+
+    def _serialize_all_sections(self, **kwargs):
+        return self._serialize_sections(exchanges=True, characterizations=True, values=True, **kwargs)
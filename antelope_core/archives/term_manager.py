@@ -48,7 +48,9 @@ retrieve data:
 
 
 """
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
+from functools import partial
+import hashlib
 
 from synonym_dict import SynonymDict
 from synonym_dict.compartments import InconsistentLineage
@@ -56,6 +58,7 @@ from synonym_dict.compartments import InconsistentLineage
 from antelope import EntityNotFound
 from ..contexts import ContextManager, NullContext
 from .quantity_manager import QuantityManager
+from .cf_store import ColumnarCFStore, ColumnarDict
 
 from ..characterizations import Characterization, DuplicateCharacterizationError
 
@@ -94,6 +97,67 @@ class OriginStrangeness(Exception):
 from collections import defaultdict
 
 
+class ConversionCache(object):
+    """
+    A bounded least-recently-used map that memoizes the outcome of reference quantity conversions, keyed on
+    (flowable, found quantity, target quantity, context, locale, seen quantities).  The stored value is either the
+    tuple of QRResults that extends a conversion from the found quantity to the target quantity, or the exception that
+    the search raised.  Entries are also indexed by flowable term, so that when a characterization of a flowable is
+    added or changed, the TermManager can discard only the entries for that flowable's terms.
+    """
+    def __init__(self, maxsize=16384):
+        self._d = OrderedDict()
+        self._by_flowable = defaultdict(set)  # lowercased flowable term -> keys
+        self._maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._d)
+
+    def get(self, key):
+        """
+        :param key:
+        :return: the cached outcome; raises KeyError on a miss
+        """
+        try:
+            value = self._d[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self._d.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._d[key] = value
+        self._d.move_to_end(key)
+        self._by_flowable[str(key[0]).lower()].add(key)
+        if len(self._d) > self._maxsize:
+            old, _ = self._d.popitem(last=False)
+            keys = self._by_flowable[str(old[0]).lower()]
+            keys.discard(old)
+            if len(keys) == 0:
+                self._by_flowable.pop(str(old[0]).lower())
+
+    def discard_flowable(self, terms):
+        """
+        Discard the entries for the given flowable terms
+        :param terms: iterable of strings
+        :return:
+        """
+        for t in terms:
+            for key in self._by_flowable.pop(str(t).lower(), ()):
+                self._d.pop(key, None)
+
+    def clear(self):
+        self._d.clear()
+        self._by_flowable.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._d), 'maxsize': self._maxsize}
+
+
 class TermManager(object):
     """
     A TermManager is an archive-specific mapping of string terms to flowables and contexts.  During normal operation
@@ -141,7 +205,8 @@ class TermManager(object):
     """
     is_lcia_engine = False
 
-    def __init__(self, contexts=None, flowables=None, quantities=None, merge_strategy='graft', quiet=True):
+    def __init__(self, contexts=None, flowables=None, quantities=None, merge_strategy='graft', quiet=True,
+                 columnar=False):
         """
         :param contexts: optional filename to initialize CompartmentManager
         :param flowables: optional filename to initialize FlowablesDict
@@ -159,6 +224,8 @@ class TermManager(object):
            'merge': - aggressively merge all co-synonymous flowables.  not tested.
 
         :param quiet:
+        :param columnar: [False] store characterizations in integer-coded arrays (see ColumnarCFStore) instead of as
+         individual Characterization objects.  Objects are created on demand when CFs are retrieved.
 
         """
         # the synonym sets
@@ -168,7 +235,12 @@ class TermManager(object):
 
         self._q_dict = dict()  # dict of dicts. _q_dict[canonical quantity][canonical flowable] -> a context lookup
         #
-        self._cl_typ = dict
+        if columnar:
+            self._cf_store = ColumnarCFStore()
+            self._cl_typ = partial(ColumnarDict, self._cf_store)
+        else:
+            self._cf_store = None
+            self._cl_typ = dict
 
         # the reverse mappings
         self._flow_map = defaultdict(set)  # maps flowable to flows having that flowable
@@ -177,6 +249,13 @@ class TermManager(object):
         # track duplicates
         self._dupes = []  #  List[DuplicateCharacterization]
 
+        # memoized ref quantity conversions
+        self._conv_cache = ConversionCache()
+
+        # opt-in persistent store of quantity relation results, and the content stamps that validate it
+        self._cf_cache = None
+        self._stamps = dict()
+
         # config
         self._merge_strategy = merge_strategy
         self._quiet = bool(quiet)
@@ -226,6 +305,33 @@ class TermManager(object):
     def quiet(self):
         return self._quiet
 
+    @property
+    def cf_store(self):
+        """
+        The ColumnarCFStore holding characterizations, or None if the term manager is not columnar
+        :return:
+        """
+        return self._cf_store
+
+    @property
+    def conversion_cache(self):
+        """
+        The ConversionCache used by quantity implementations to memoize ref quantity conversions
+        :return:
+        """
+        return self._conv_cache
+
+    @property
+    def cf_cache(self):
+        """
+        A PersistentCFCache, or None if not enabled
+        :return:
+        """
+        return self._cf_cache
+
+    def set_cf_cache(self, cf_cache):
+        self._cf_cache = cf_cache
+
     def add_quantity(self, quantity):
         if quantity.entity_type != 'quantity':
             raise TypeError('Must be quantity type')
@@ -517,6 +623,13 @@ class TermManager(object):
         :param merge_strategy: overrule default merge strategy
         :return: the Flowable object to which the flow's terms have been added
         """
+        self._check_flow_quantity(flow)
+        cx = self._check_context(flow)
+        if cx is NullContext:
+            merge_strategy = 'distinct'  # keep distinct terms for null-context flows
+        return self.add_flow_terms(flow, merge_strategy=merge_strategy)
+
+    def _check_flow_quantity(self, flow):
         if hasattr(flow, 'reference_entity') and flow.reference_entity is not None:
             if isinstance(flow.reference_entity, str):
                 try:
@@ -525,10 +638,35 @@ class TermManager(object):
                     raise ValueError('unrecognized quantity spec %s ' % flow.reference_entity)
             else:
                 self.add_quantity(flow.reference_entity)  # ensure exists
-        cx = self._check_context(flow)
-        if cx is NullContext:
-            merge_strategy = 'distinct'  # keep distinct terms for null-context flows
-        return self.add_flow_terms(flow, merge_strategy=merge_strategy)
+
+    def add_flows(self, flows, merge_strategy=None):
+        """
+        Add a collection of flows.  The same as calling add_flow() on each one, except that each distinct reference
+        quantity is registered, and each distinct context is resolved, only once.
+        :param flows: iterable of flows
+        :param merge_strategy: overrule default merge strategy
+        :return: list of the Flowable objects to which the flows' terms have been added
+        """
+        quantities = dict()  # id -> reference quantity (kept to make the ids stable)
+        contexts = dict()  # (context, origin) -> local context
+        fbs = []
+        for flow in flows:
+            rq = getattr(flow, 'reference_entity', None)
+            if id(rq) not in quantities:
+                self._check_flow_quantity(flow)
+                quantities[id(rq)] = rq
+            if hasattr(flow, 'context'):
+                key = (flow.get_context(), flow.origin)
+                try:
+                    cx = contexts[key]
+                except KeyError:
+                    cx = contexts[key] = self._check_context(flow)
+                except TypeError:  # unhashable context
+                    cx = self._check_context(flow)
+            else:
+                cx = NullContext
+            fbs.append(self.add_flow_terms(flow, merge_strategy='distinct' if cx is NullContext else merge_strategy))
+        return fbs
 
     def add_characterization(self, flowable, ref_quantity, query_quantity, value, context=None, origin=None,
                              location=None, overwrite=False):
@@ -546,6 +684,7 @@ class TermManager(object):
         :param origin: (optional; origin of value; defaults to quantity.origin)
         :return: created or updated characterization
         """
+        self._stamps.clear()
         if origin is None:
             origin = query_quantity.origin
 
@@ -558,6 +697,7 @@ class TermManager(object):
             fb = self._fm[flowable]
         except KeyError:
             fb = self._create_flowable(flowable)
+        self._conv_cache.discard_flowable(self._fm.synonyms(fb))
 
         try:
             rq = self._canonical_q(ref_quantity)
@@ -733,6 +873,8 @@ class TermManager(object):
         cl = self._qaccess(qq, fb)
         self._store_cf(cl, context, new_cf)
         self._fq_map[fb].add(qq)
+        self._conv_cache.discard_flowable(self._fm.synonyms(fb))  # also reached by flowable merges
+        self._stamps.clear()
 
     def _factors_for_flowable(self, fb, qq, cx, **kwargs):
         """
@@ -799,6 +941,49 @@ class TermManager(object):
                 for k in self.factors_for_flowable(f, quantity=qq, context=context, **kwargs):
                     yield k
 
+    def _cf_tokens(self, quantity):
+        for cf in self.factors_for_quantity(quantity):
+            yield repr((str(cf.flowable), str(cf.context), cf.ref_quantity.link, str(cf.origin),
+                        sorted((loc, repr(cf[loc])) for loc in cf.locations)))
+
+    def content_stamp(self, quantity):
+        """
+        A digest of the characterizations that can contribute to a quantity relation result for the given query
+        quantity: the quantity's own CFs, plus the CFs of all non-LCIA quantities, which are used to convert between
+        reference quantities.  Stamps are memoized and discarded whenever a characterization is added.
+        :param quantity:
+        :return: a hex string
+        """
+        qq = self._canonical_q(quantity)
+        if qq in self._stamps:
+            return self._stamps[qq]
+        h = hashlib.sha1(qq.link.encode('utf-8'))
+        for tok in sorted(self._cf_tokens(qq)):
+            h.update(tok.encode('utf-8'))
+        if None not in self._stamps:
+            r = hashlib.sha1()
+            for q in sorted((q for q in list(self._q_dict.keys()) if not q.is_lcia_method), key=lambda x: x.link):
+                r.update(q.link.encode('utf-8'))
+                for tok in sorted(self._cf_tokens(q)):
+                    r.update(tok.encode('utf-8'))
+            self._stamps[None] = r.hexdigest()
+        h.update(self._stamps[None].encode('utf-8'))
+        self._stamps[qq] = h.hexdigest()
+        return self._stamps[qq]
+
+    def flowable_stamp(self, term):
+        """
+        A digest of the synonym state that determines how a flowable term is interpreted: the terms of the flowable to
+        which it currently maps.  This changes when a synonym is added to that flowable or when flowables are merged.
+        :param term: a string
+        :return: a hex string, or '' if the term is not known
+        """
+        try:
+            terms = list(self._fm.synonyms(term))
+        except KeyError:
+            return ''
+        return hashlib.sha1('\n'.join(terms).encode('utf-8')).hexdigest()
+
     def get_flowable(self, term, strict=True):
         """
         Input is a Flow or str
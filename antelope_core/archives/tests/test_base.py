@@ -1,4 +1,5 @@
 from ..lc_archive import LcArchive
+from ...entities import LcFlow
 from ...from_json import from_json
 
 import os
@@ -165,6 +166,20 @@ class LcArchiveTest(unittest.TestCase):
         ent = self._ar['ha']
         self.assertEqual(ent.uuid, uuid)
 
+    def test_key_memo(self):
+        ar = LcArchive.from_file(test_file)
+        self.assertEqual(len(ar._key_memo), 0)
+        fl = ar[24235]  # integer ref resolves to an ns-uuid
+        self.assertEqual(fl.uuid, '9cc0ccce-8e33-35ca-a3c0-c7bb6c397e95')
+        self.assertIn(24235, ar._key_memo)
+        self.assertIs(ar[24235], fl)
+        self.assertIs(ar['flow/9cc0ccce-8e33-35ca-a3c0-c7bb6c397e95'], fl)
+        self.assertIsNone(ar['aardvark'])
+        self.assertNotIn('aardvark', ar._key_memo)
+        new = LcFlow('aardvark', Name='Aardvark', referenceQuantity=ar['l'])
+        ar.add(new)
+        self.assertIs(ar['aardvark'], new)
+
     def test_get_entity(self):
         """
         An error-preventer: put in an entity itself, get back the entity IF the entity is part of the archive.
@@ -176,6 +191,74 @@ class LcArchiveTest(unittest.TestCase):
     def test_ents_by_type(self):
         self.assertEqual(len([q for q in self._ar.entities_by_type('q')]), 3)
 
+    def test_ents_by_type_paged(self):
+        ar = LcArchive.from_file(test_file)
+        flows = list(ar.entities_by_type('flow'))
+        self.assertEqual([f.external_ref for f in flows], sorted(f.external_ref for f in flows))
+        self.assertEqual(list(ar.entities_by_type('flow', offset=1, count=2)), flows[1:3])
+        self.assertEqual(list(ar.search('flow', offset=1, count=2)), flows[1:3])
+        new = LcFlow.new('Aardvark', ar['l'])
+        ar.add(new)
+        self.assertIn(new, list(ar.entities_by_type('flow')))
+        self.assertEqual(ar.count_by_type('flow'), len(flows) + 1)
+
+    def test_find_partial_id(self):
+        ar = LcArchive.from_file(test_file)
+        for prefix in ('', '2', '21d34f33', '21d34f33-c', 'Refor', 'l', 'zz'):
+            expected = sorted((k for k in ar._entities if k.startswith(prefix)))
+            self.assertEqual(ar.find_partial_id(prefix), [ar._entities[k] for k in expected])
+        q = ar['21d34f33-c0af-3d82-9bef-3cf03e0db9dc']
+        self.assertIn(q, ar.find_partial_id(ar._ref_to_nsuuid('l')[:8]))  # ns-uuid alias
+        self.assertEqual(ar.find_partial_id('c0af', startswith=False), [q])
+        new = LcFlow.new('Aardvark', q)
+        ar.add(new)
+        self.assertEqual(ar.find_partial_id(new.uuid[:12]), [new])
+
+    def test_add_many(self):
+        ar = LcArchive.from_file(test_file)
+        q = ar['Item(s)']
+        flows = [LcFlow.new('Bulk flow %d' % i, q, context=('air', )) for i in range(5)]
+        added = ar.add_many(flows + [flows[0], ar['ha']])
+        self.assertEqual(added, flows)
+        self.assertEqual(ar.count_by_type('flow'), 8)
+        for f in flows:
+            self.assertIs(ar[f.external_ref], f)
+            self.assertIs(ar[f.uuid], f)
+            self.assertIn(f.name, ar.tm.flowables())
+
+        bad = LcFlow.new('Bad flow', ar['21d34f33-b0af-3d82-9bef-3cf03e0db9dc'])
+        bad._d.pop('Name')
+        with self.assertRaises(ValueError):
+            ar.add_many([LcFlow.new('Good flow', q), bad])
+        self.assertEqual(ar.count_by_type('flow'), 8)
+
+    def test_add_many_overrides(self):
+        """
+        Subclasses that override add() or _add_to_tm() have them called for each entity, as before add_many()
+        """
+        class AddArchive(LcArchive):
+            def add(self, entity):
+                added.append(entity)
+                super(AddArchive, self).add(entity)
+
+        class TmArchive(LcArchive):
+            def _add_to_tm(self, entity, merge_strategy=None):
+                registered.append(entity)
+                super(TmArchive, self)._add_to_tm(entity, merge_strategy=merge_strategy)
+
+        added = []
+        ar = AddArchive.from_file(test_file)
+        ids = set(id(e) for e in added)
+        for e in list(ar.entities_by_type('flow')) + list(ar.entities_by_type('quantity')):
+            self.assertIn(id(e), ids)
+
+        registered = []
+        ar = TmArchive.from_file(test_file)
+        ids = set(id(e) for e in registered)
+        for e in list(ar.entities_by_type('flow')) + list(ar.entities_by_type('quantity')):
+            self.assertIn(id(e), ids)
+        self.assertEqual(len(list(ar.tm.flowables())), len(list(LcArchive.from_file(test_file).tm.flowables())))
+
     def test_recursive_references(self):
         fl_uuid = '9cc0ccce-8e33-35ca-a3c0-c7bb6c397e95'
         q_uuid = '8703965a-7a6b-3e3e-a1cf-d9adf7bf1d9f'
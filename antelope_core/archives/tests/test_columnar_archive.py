@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from ..lc_archive import LcArchive
+from ..columnar_archive import ColumnarArchive, write_columnar, read_columns, VALUE_NULL, VALUE_STORED
+from .. import archive_factory
+from ...entities import LcProcess
+from ...entities.flows import new_flow
+from ...entities.quantities import new_quantity
+
+
+def _build_archive():
+    ar = LcArchive(None, ref='test.columnar')
+    mass = new_quantity('Mass', 'kg', origin=ar.ref)
+    gwp = new_quantity('Global warming', 'kg CO2 eq', origin=ar.ref, Method='Test', Category='GWP', Indicator='kg')
+    ar.add(mass)
+    ar.add(gwp)
+    steel = new_flow('steel', mass, origin=ar.ref)
+    slag = new_flow('slag', mass, origin=ar.ref)
+    coal = new_flow('coal', mass, origin=ar.ref)
+    co2 = new_flow('carbon dioxide', mass, context='air', origin=ar.ref)
+    for f in (steel, slag, coal, co2):
+        ar.add_entity_and_children(f)
+    ar.tm.add_characterization('carbon dioxide', mass, gwp, 1.0, context='air', origin=ar.ref)
+    ar.tm.add_characterization('carbon dioxide', mass, gwp, 0.9, context='air', location='CA', origin=ar.ref)
+
+    p = LcProcess.new('steel production', origin=ar.ref)
+    rs = p.add_exchange(steel, 'Output', value=1.0)
+    p.set_reference(steel, 'Output')
+    rg = p.add_exchange(slag, 'Output', value=0.2)
+    p.set_reference(slag, 'Output')
+    p.add_exchange(coal, 'Input', value=0.7)
+    p.add_exchange(coal, 'Input', reference=rs, value=0.6)
+    p.add_exchange(coal, 'Input', reference=rg, value=0.1)
+    p.add_exchange(co2, 'Output', value=2.0, termination=ar.tm['air'])
+    ar.add_entity_and_children(p)
+
+    q = LcProcess.new('coal mining', origin=ar.ref)
+    q.add_exchange(coal, 'Output', value=1.0)
+    q.set_reference(coal, 'Output')
+    q.add_exchange(co2, 'Output', value=0.1, termination=ar.tm['air'])
+    q.add_exchange(steel, 'Input', value=0.01, termination=p.external_ref)
+    ar.add_entity_and_children(q)
+    return ar
+
+
+def _content(ar):
+    j = ar.serialize(exchanges=True, characterizations=True, values=True)
+    return {k: j[k] for k in ('flows', 'processes', 'quantities', 'termManager')}
+
+
+class ColumnarArchiveTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._dir = tempfile.TemporaryDirectory()
+        cls._path = os.path.join(cls._dir.name, 'test.columnar')
+        ar = _build_archive()
+        write_columnar(ar, cls._path)
+        json_file = os.path.join(cls._dir.name, 'test.json')
+        ar.write_to_file(json_file, complete=True)
+        cls._ar = LcArchive.from_file(json_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._dir.cleanup()
+
+    def test_columns(self):
+        cols = read_columns(self._path)
+        self.assertEqual(len(cols['x_flow']), 7)
+        self.assertEqual(len(cols['a_value']), 2)
+        self.assertEqual(len(cols['cf_value']), 2)
+        self.assertEqual(len(cols['x_alloc_start']), 8)
+        self.assertListEqual(cols['x_value_mask'].tolist(), [VALUE_STORED] * 7)
+
+    def test_round_trip(self):
+        ar = ColumnarArchive.from_directory(self._path)
+        self.assertEqual(ar.ref, 'test.columnar')
+        self.assertDictEqual(_content(ar), _content(self._ar))
+
+    def test_factory(self):
+        ar = archive_factory('ColumnarArchive')(self._path, ref='test.columnar')
+        ar.load_all()
+        self.assertDictEqual(_content(ar), _content(self._ar))
+
+    def test_null_value(self):
+        """
+        An exchange whose value is explicitly null is loaded with a value of None, not NaN
+        """
+        path = os.path.join(self._dir.name, 'null.columnar')
+        shutil.copytree(self._path, path)
+        cols = read_columns(path)
+        i = next(i for i, v in enumerate(cols['x_value'])  # the unallocated 0.1 emission from 'coal mining'
+                 if v == 0.1 and not cols['x_reference'][i]
+                 and cols['x_alloc_start'][i] == cols['x_alloc_start'][i + 1])
+        mask = cols['x_value_mask'].copy()
+        mask[i] = VALUE_NULL
+        np.save(os.path.join(path, 'x_value_mask.npy'), mask)
+        ar = ColumnarArchive.from_directory(path)
+        ar.load_all()
+        q = next(p for p in ar.entities_by_type('process') if p['Name'] == 'coal mining')
+        values = sorted((x.value for x in q.inventory()), key=lambda v: -1 if v is None else v)
+        self.assertListEqual(values, [None, 0.01, 1.0])
+
+    def test_write_to_file(self):
+        ar = ColumnarArchive.from_directory(self._path)
+        json_file = os.path.join(self._dir.name, 'written.json.gz')
+        ar.write_to_file(json_file)
+        self.assertTrue(os.path.isfile(json_file))
+        self.assertDictEqual(_content(LcArchive.from_file(json_file)), _content(self._ar))
+        plain_file = os.path.join(self._dir.name, 'plain_file')
+        with open(plain_file, 'w') as fp:
+            fp.write('keep me')
+        with self.assertRaises(ValueError):
+            ar.write_to_file(plain_file)
+        with open(plain_file) as fp:
+            self.assertEqual(fp.read(), 'keep me')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from copy import deepcopy
+
+from ..lc_archive import LcArchive
+from ..archive_index import index_archive
+from ..lazy_index import LazyIndex
+from .test_base import test_json
+
+
+class LazyIndexTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._dir = tempfile.TemporaryDirectory()
+        ar = LcArchive(None, ref=test_json['dataReference'])
+        ar.load_from_dict(deepcopy(test_json))
+        cls._ar = ar
+        cls._index = index_archive(ar, os.path.join(cls._dir.name, 'test_index.json'))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._dir.cleanup()
+
+    def _open(self):
+        return LazyIndex.open(self._index.source)
+
+    def test_nothing_built(self):
+        inx = self._open()
+        self.assertEqual(inx.ref, self._index.ref)
+        self.assertEqual(inx.n_pending, len(test_json['processes']))
+        for t in ('quantity', 'flow', 'process'):
+            self.assertEqual(inx.count_by_type(t), self._index.count_by_type(t))
+        self.assertTrue(os.path.exists(self._index.source[:-3] + '.offsets'))
+
+    def test_get_flow(self):
+        inx = self._open()
+        f = test_json['flows'][0]
+        flow = inx[str(f['externalId'])]
+        self.assertEqual(flow.external_ref, str(f['externalId']))
+        self.assertEqual(flow.name, f['Name'])
+        self.assertIs(inx.retrieve_or_fetch_entity(str(f['externalId'])), flow)
+        self.assertIn(str(test_json['flows'][1]['externalId']), inx)
+        self.assertEqual(inx.n_pending, len(test_json['processes']))
+
+    def test_get_process(self):
+        inx = self._open()
+        p = test_json['processes'][0]
+        proc = inx[str(p['externalId'])]
+        self.assertEqual(proc.entity_type, 'process')
+        for rx in proc.references():
+            self.assertIs(rx.flow, inx[rx.flow.external_ref])
+
+    def test_entities_by_type(self):
+        inx = self._open()
+        self.assertSetEqual({f.external_ref for f in inx.entities_by_type('flow')},
+                            {f.external_ref for f in self._index.entities_by_type('flow')})
+        self.assertEqual(inx.count_by_type('flow'), self._index.count_by_type('flow'))
+
+    def test_index_interface(self):
+        """
+        The index interface should give the same answers as for the fully loaded index
+        """
+        eager = self._index.make_interface('index')
+        lazy = self._open().make_interface('index')
+        self.assertSetEqual({str(c) for c in lazy.contexts()}, {str(c) for c in eager.contexts()})
+        self.assertSetEqual({str(f) for f in lazy.flowables()}, {str(f) for f in eager.flowables()})
+        for f in self._index.entities_by_type('flow'):
+            for d in ('Input', 'Output'):
+                self.assertListEqual([p.external_ref for p in lazy.targets(f.external_ref, direction=d)],
+                                     [p.external_ref for p in eager.targets(f.external_ref, direction=d)])
+
+    def test_close(self):
+        inx = self._open()
+        self.assertIsNotNone(inx._mm)
+        inx.close()
+        self.assertIsNone(inx._mm)
+        p = test_json['processes'][0]
+        self.assertEqual(inx[str(p['externalId'])].external_ref, str(p['externalId']))
+        self.assertEqual(inx.n_pending, 0)
+        self.assertIsNone(inx._mm)  # released once everything is built
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -68,4 +68,25 @@ class TestQuantityRelation(unittest.TestCase):
         with self.assertRaises(ConversionReferenceMismatch):
             eng.quantity_relation(self.f6.name, mass, None)
 
+    def test_conversion_cache(self):
+        mass = self.f4.reference_entity
+        eng = self.f6.reference_entity
+        cache = self.qdb.tm.conversion_cache
+        mass.quantity_relation(self.f4.name, eng, None)
+        hits = cache.hits
+        self.assertEqual(mass.quantity_relation(self.f4.name, eng, None).value, 1.0 / self.f4_mj_kg)
+        self.assertEqual(cache.hits, hits + 1)
+        with self.assertRaises(ConversionReferenceMismatch):
+            eng.quantity_relation(self.f6.name, mass, None)
+        with self.assertRaises(ConversionReferenceMismatch):
+            eng.quantity_relation(self.f6.name, mass, None)
+        self.assertEqual(cache.hits, hits + 2)
+        n = len(cache)
+        self.assertGreater(n, 0)
+        self.qdb.tm.add_characterization('A dummy flowable', mass, eng, 1.0)
+        self.assertEqual(len(cache), n)  # other flowables' entries are kept
+        self.assertEqual(mass.quantity_relation(self.f4.name, eng, None).value, 1.0 / self.f4_mj_kg)
+        self.assertEqual(cache.hits, hits + 3)
+        self.qdb.tm.add_characterization(self.f4.name, mass, eng, self.f4_mj_kg, overwrite=True)
+        self.assertFalse(any(k[0] == self.f4.name for k in cache._d))
 
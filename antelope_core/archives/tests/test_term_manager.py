@@ -89,5 +89,21 @@ class TermManagerTest(unittest.TestCase):
     '''
 
 
+class ColumnarTermManagerTest(TermManagerTest):
+    @classmethod
+    def setUpClass(cls):
+        cls.tm = TermManager(quiet=False, columnar=True)
+        cls.tm.add_context(['emissions', 'emissions to air', 'emissions to urban air'])
+
+    def test_columnar_characterization(self):
+        self.tm.add_characterization('air', rq, qq, 1.2, context='emissions to air')
+        self.tm.add_characterization('air', rq, qq, 1.1, context='emissions to air', location='CA')
+        cfs = list(self.tm.factors_for_flowable('air', quantity=qq, context='emissions to air'))
+        self.assertEqual(len(cfs), 1)
+        self.assertEqual(cfs[0]['CA'], 1.1)
+        self.assertEqual(cfs[0].value, 1.2)
+        self.assertGreater(len(self.tm.cf_store), 0)
+
+
 if __name__ == '__main__':
     unittest.main()
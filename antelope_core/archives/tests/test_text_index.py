@@ -0,0 +1,92 @@
+import unittest
+
+from ..lc_archive import LcArchive
+from ..text_index import TextIndex, is_plain
+from ...entities import LcFlow
+from .test_base import test_file
+
+
+QUERIES = [
+    {'Name': 'softwood'},
+    {'Name': 'SEEDLING, soft'},
+    {'Name': 'wood', 'Compartment': 'logging'},
+    {'Name': 'ood'},
+    {'Name': 'greenhouse'},
+    {'Name': ['combust', 'equip']},
+    {'Name': '^Gas'},  # regex
+    {'Name': 'softwood', 'Comment': 'no such'},
+    {'Name': 'aardvark'},
+]
+
+
+class TextIndexTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.plain = LcArchive.from_file(test_file)
+        cls.indexed = LcArchive.from_file(test_file, text_index=True)
+
+    def test_plain(self):
+        self.assertTrue(is_plain('carbon dioxide, fossil'))
+        self.assertFalse(is_plain('^carbon'))
+        self.assertFalse(is_plain('dioxide|monoxide'))
+
+    def test_same_results(self):
+        for etype in (None, 'flow', 'process'):
+            for q in QUERIES:
+                self.assertEqual([e.external_ref for e in self.indexed.search(etype, **q)],
+                                 [e.external_ref for e in self.plain.search(etype, **q)], (etype, q))
+        self.assertIsInstance(self.indexed._text_index, TextIndex)
+
+    def test_property_case(self):
+        for q in ({'name': 'wood'}, {'compartment': 'air'}, {'NAME': 'softwood', 'compartment': 'logging'},
+                  {'name': 'wood', 'no_such_property': 'wood'}):
+            self.assertEqual([e.external_ref for e in self.indexed.search('flow', **q)],
+                             [e.external_ref for e in self.plain.search('flow', **q)], q)
+        self.assertEqual(len(list(self.indexed.search('flow', name='wood'))), 2)
+        self.assertEqual(len(list(self.indexed.search('flow', compartment='air'))), 1)
+
+    def test_pagination(self):
+        full = list(self.plain.search('flow', Name='o'))
+        self.assertEqual(list(self.indexed.search('flow', Name='o', offset=1, count=1)), full[1:2])
+
+    def test_maintained_on_add(self):
+        ar = LcArchive.from_file(test_file, text_index=True)
+        self.assertEqual(len(list(ar.search('flow', Name='aardvark'))), 0)  # builds the index
+        f = LcFlow.new('Aardvark hide', ar['Item(s)'])
+        ar.add(f)
+        self.assertEqual(list(ar.search('flow', Name='aardvark')), [f])
+
+    def test_maintained_on_set(self):
+        ar = LcArchive.from_file(test_file, text_index=True)
+        f = LcFlow.new('Aardvark hide', ar['Item(s)'])
+        ar.add(f)
+        self.assertEqual(list(ar.search('flow', Name='aardvark')), [f])  # builds the index
+
+        f['Name'] = 'Zebra hide'
+        self.assertEqual(list(ar.search('flow', Name='ebra')), [f])
+        self.assertEqual(len(list(ar.search('flow', Name='aardvark'))), 0)
+
+        f['Tags'] = ['Zebra']
+        self.assertEqual(list(ar.search('flow', Tags='zebra')), [f])
+        f['Tags'].append('Okapi')  # changed in place: stale until reindexed
+        self.assertEqual(len(list(ar.search('flow', Tags='okapi'))), 0)
+        ar.reindex(f)
+        self.assertEqual(list(ar.search('flow', Tags='okapi')), [f])
+
+    def test_token_matches(self):
+        index = TextIndex()
+        for key, name in (('a', 'softwood lumber'), ('b', 'hardwood'), ('c', 'wooden crate'), ('d', 'wool')):
+            f = LcFlow.new(name, None)
+            index.add(key, f)
+        self.assertSetEqual(index.candidates(Name='wood'), {'a', 'b', 'c'})
+        self.assertSetEqual(index.candidates(Name='woo'), {'a', 'b', 'c', 'd'})
+        self.assertSetEqual(index.candidates(Name='dwoo'), {'b'})
+        index.remove('c')
+        self.assertSetEqual(index.candidates(Name='wood'), {'a', 'b'})
+        self.assertSetEqual(index.candidates(Name='crate'), set())
+        self.assertSetEqual(index.candidates(name='wood'), {'a', 'b'})
+        self.assertIsNone(index.candidates(Classification='wood'))
+
+
+if __name__ == '__main__':
+    unittest.main()
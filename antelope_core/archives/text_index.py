@@ -0,0 +1,187 @@
+"""
+An inverted index of entity property text, used to narrow archive searches.
+
+BasicArchive.search() tests every entity against a regular expression for each property filter.  When an archive is
+created with text_index=True, it keeps a TextIndex that maps each word token found in each property to the keys of the
+entities whose property contains it.  A filter that is a plain string (no regex syntax) must match within the tokens of
+the property text, so the index can supply a small set of candidate entities; the regex test is then applied to the
+candidates only.  Filters that use regex syntax, or that name a property the index has never seen, are not indexed and
+fall back to testing every entity.  Property names are case-insensitive, as they are for entities.
+
+Because a plain filter may match part of a word, each property's vocabulary is also kept as a sorted list of token
+suffixes, so that the tokens containing a given string are found by bisection instead of by scanning every token.
+
+The index is built on the first search and updated as entities are added to the archive.  Each indexed entity's
+property stamp (see LcEntity.property_stamp) is recorded, and before each search, entities whose properties have been
+set since they were indexed are indexed again (see refresh()).  Changes made by other means, e.g. by mutating a
+property value in place, are not detected: call reindex() on the archive to bring the index up to date.
+"""
+
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+from ..entities import LcEntity
+
+
+_TOKEN = re.compile(r'\w+')
+_REGEX_SYNTAX = set('.^$*+?{}[]\\|()')
+
+
+def expand_subtag(tag):
+    """
+    Flatten a property value into text
+    :param tag: a string, None, or an iterable of the same (recursively)
+    :return: str
+    """
+    if tag is None:
+        return ''
+    elif isinstance(tag, str):
+        return tag
+    else:
+        return '\n'.join([expand_subtag(t) for t in tag])
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+def is_plain(pattern):
+    """
+    Whether a search pattern is a literal string that the index can answer
+    :param pattern:
+    :return:
+    """
+    return isinstance(pattern, str) and pattern.isascii() and not any(c in _REGEX_SYNTAX for c in pattern)
+
+
+class TextIndex(object):
+    def __init__(self):
+        self._tokens = defaultdict(lambda: defaultdict(set))  # property -> token -> entity keys
+        self._suffixes = defaultdict(list)  # property -> sorted list of (suffix, token) for every listed token
+        self._listed = defaultdict(set)  # property -> tokens whose suffixes are in the list (or pending)
+        self._pending = defaultdict(list)  # property -> tokens whose suffixes have yet to be added to the list
+        self._unindexed = defaultdict(set)  # property -> keys of entities whose value could not be expanded
+        self._keys = dict()  # entity key -> {property: tokens}
+        self._stamps = dict()  # entity key -> property stamp when indexed
+        self._props = set()  # every property that has been indexed
+        self._serial = LcEntity.property_serial  # as of the last refresh()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def add(self, key, entity):
+        """
+        Index an entity's properties, replacing any previous entry for the key
+        :param key: the entity's key in the archive
+        :param entity:
+        :return:
+        """
+        self.remove(key)
+        entry = dict()
+        for prop in entity.properties():
+            prop = prop.lower()  # entity properties are case-insensitive
+            self._props.add(prop)
+            try:
+                tokens = set(tokenize(expand_subtag(entity[prop])))
+            except TypeError:
+                self._unindexed[prop].add(key)
+                tokens = None
+            else:
+                for t in tokens:
+                    if t not in self._listed[prop]:
+                        self._listed[prop].add(t)
+                        self._pending[prop].append(t)
+                    self._tokens[prop][t].add(key)
+            entry[prop] = tokens
+        self._keys[key] = entry
+        self._stamps[key] = getattr(entity, 'property_stamp', 0)
+
+    def _suffix_list(self, prop):
+        """
+        The sorted suffix list for a property, after adding the suffixes of any new tokens.  Tokens that have dropped
+        out of the vocabulary are left in the list, and are ignored when it is searched.
+        """
+        suffixes = self._suffixes[prop]
+        pending = self._pending.pop(prop, None)
+        if pending:
+            suffixes.extend((t[i:], t) for t in pending for i in range(len(t)))
+            suffixes.sort()  # the list is mostly sorted already, so this is nearly linear
+        return suffixes
+
+    def remove(self, key):
+        entry = self._keys.pop(key, None)
+        if entry is None:
+            return
+        self._stamps.pop(key, None)
+        for prop, tokens in entry.items():
+            if tokens is None:
+                self._unindexed[prop].discard(key)
+                continue
+            for t in tokens:
+                keys = self._tokens[prop][t]
+                keys.discard(key)
+                if len(keys) == 0:
+                    self._tokens[prop].pop(t)
+
+    def refresh(self, entities):
+        """
+        Index again any entities whose properties have been set since they were indexed
+        :param entities: mapping of key to entity, including every indexed key
+        :return:
+        """
+        if self._serial == LcEntity.property_serial:
+            return
+        for key, stamp in list(self._stamps.items()):
+            entity = entities[key]
+            if getattr(entity, 'property_stamp', 0) != stamp:
+                self.add(key, entity)
+        self._serial = LcEntity.property_serial
+
+    def _token_matches(self, prop, token):
+        """
+        Keys of entities having a token in the given property that contains the given token
+        """
+        matches = set()
+        tokens = self._tokens[prop]
+        suffixes = self._suffix_list(prop)
+        i = bisect_left(suffixes, (token,))
+        while i < len(suffixes) and suffixes[i][0].startswith(token):
+            keys = tokens.get(suffixes[i][1])
+            if keys:
+                matches |= keys
+            i += 1
+        return matches
+
+    def candidates(self, **kwargs):
+        """
+        Find the entities that could match the given property filters.  The candidates are a superset of the matches;
+        they must still be tested against the filters.
+        :param kwargs: property=pattern or list of patterns, as for BasicArchive.search()
+        :return: a set of entity keys, or None if none of the filters can be answered from the index
+        """
+        found = None
+        for prop, v in kwargs.items():
+            if v is None:
+                continue
+            prop = prop.lower()
+            if prop not in self._props:  # never seen: not answered from the index
+                continue
+            if isinstance(v, str):
+                v = [v]
+            for pattern in v:
+                if not is_plain(pattern):
+                    continue
+                tokens = tokenize(pattern)
+                if len(tokens) == 0:
+                    continue
+                keys = None
+                for token in sorted(set(tokens), key=len, reverse=True):  # longest tokens are the most selective
+                    matches = self._token_matches(prop, token)
+                    keys = matches if keys is None else keys & matches
+                keys |= self._unindexed[prop]
+                found = keys if found is None else found & keys
+        return found
@@ -0,0 +1,9 @@
+"""
+A native matrix background for unit process databases.  Requires scipy.
+
+MatrixBackgroundImplementation (in implementations.matrix_background) answers background queries from a
+BackgroundMatrix built from the archive's processes.  LcArchives provide it in place of the default proxy background
+when they are created with the init arg matrix_background=True.
+"""
+
+from .matrix import BackgroundMatrix, ProductColumn, ExteriorRow
@@ -0,0 +1,436 @@
+"""
+A sparse-matrix background engine for unit process databases.
+
+BackgroundMatrix builds a technosphere matrix A and an exterior matrix B from an LcArchive's processes.  Each column
+is a product flow: a process together with one of its reference exchanges.  The exchanges of each process are
+normalized (and allocated) to the reference, and sorted:
+ - an exchange terminated to a process (by external ref) is interior if that process has a reference exchange with
+   the same flow;
+ - an unterminated exchange is interior if exactly one process in the archive has a complementary reference exchange
+   with the same flow (see IndexImplementation.targets());
+ - all other exchanges, including those terminated to contexts, are exterior.
+
+A[i, j] is the amount of product i consumed per unit of product j (negative if product j co-produces product i) and
+B[k, j] is the amount of exterior flow k exchanged directly per unit of product j.  The activity required to deliver a
+unit of product j is the solution x of (I - A) x = e_j, and its LCI is B x.  The products are put in block-triangular
+order (see tarjan.py) so that only the strongly connected components of (I - A) need a general factorization with
+scipy's sparse LU decomposition; the acyclic runs between them are upper-triangular, and their LU factorization is
+trivial (see BackgroundMatrix._factorize()).  The factors are computed once, and solutions are cached.  Several demand vectors can be
+solved together as the columns of one demand matrix (see lci_block()).
+
+Given a cache directory, a BackgroundMatrix writes its matrices and ordering there after it is built, along with the
+inverse of each cyclic block (up to a size limit), and reads them instead of reordering and refactorizing when it is
+next created for the same archive.  The arrays are stored as .npy files and are memory-mapped read-only when loaded,
+so several processes can share one copy.  The matrices themselves are always rebuilt from the archive's exchanges,
+which is cheap by comparison; the cache records a digest of them (see matrix_digest()) and is ignored if the digest
+does not match, so any change to the archive's products, exchange values or terminations invalidates it.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from collections import namedtuple
+
+import numpy as np
+from scipy.sparse import csc_matrix, identity
+from scipy.sparse.linalg import splu
+
+from .tarjan import block_triangular_order, Segment
+from ..contexts import Context
+
+
+ProductColumn = namedtuple('ProductColumn', ('process', 'ref_exchange'))
+ExteriorRow = namedtuple('ExteriorRow', ('flow', 'direction', 'termination'))
+
+
+CACHE_HEADER = 'header.json'
+CACHE_ARRAYS = ('a_data', 'a_indices', 'a_indptr', 'b_data', 'b_indices', 'b_indptr', 'order')
+
+
+def _flow_ref(x):
+    return getattr(x.flow, 'external_ref', x.flow)
+
+
+def _term_to_json(term):
+    if isinstance(term, Context):
+        return {'context': term.as_list()}
+    return term
+
+
+def matrix_digest(products, exterior, a, b):
+    """
+    A digest of a background system: its product and exterior flow keys and the contents of its A and B matrices.
+    :param products: list of ProductColumn
+    :param exterior: list of ExteriorRow
+    :param a: csc_matrix
+    :param b: csc_matrix
+    :return: hex digest
+    """
+    h = hashlib.sha1()
+    for p, rx in products:
+        h.update(('%s:%s:%s\n' % (p.external_ref, rx.flow.external_ref, rx.direction)).encode())
+    for f, d, t in exterior:
+        h.update(('%s:%s:%s\n' % (f.external_ref, d, json.dumps(_term_to_json(t)))).encode())
+    for m in (a, b):
+        m = m.copy()
+        m.sum_duplicates()
+        m.sort_indices()
+        h.update(np.ascontiguousarray(m.indptr, dtype=np.int64).tobytes())
+        h.update(np.ascontiguousarray(m.indices, dtype=np.int64).tobytes())
+        h.update(np.ascontiguousarray(m.data, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+class _BlockInverse(object):
+    """
+    Stands in for the factorization of a cyclic block whose inverse was precomputed
+    """
+    def __init__(self, inverse):
+        self._inv = inverse
+
+    def solve(self, rhs):
+        return self._inv.dot(rhs)
+
+
+class BackgroundMatrix(object):
+    _solution_cache_size = 4096  # number of activity vectors to keep
+    _max_cached_inverse = 4096  # larger cyclic blocks are factorized again when a cache is loaded
+
+    def __init__(self, archive, index=None, cache=None):
+        """
+        :param archive: an LcArchive
+        :param index: [None] index interface used to find the targets of unterminated exchanges (default: the
+         archive's)
+        :param cache: [None] directory in which to persist the matrices
+        """
+        self._archive = archive
+        if index is None:
+            index = archive.make_interface('index')
+        self._index = index
+
+        self._products = []  # column -> ProductColumn
+        self._product_ix = dict()  # (process external ref, flow external ref) -> column
+        self._exterior = []  # row -> ExteriorRow
+        self._exterior_ix = dict()  # (flow external ref, direction, termination) -> row
+
+        self._A = None
+        self._B = None
+        self._A_rows = None
+        self._ordering = None  # (order, segments, cyclic) from block_triangular_order()
+        self._perm = None
+        self._m_rows = None  # (I - A) in solution order, by rows
+        self._factors = None  # list of (segment, factorization)
+        self._inverses = dict()  # segment index -> precomputed inverse, from cache
+        self._solutions = dict()
+
+        self._build()
+        if cache is not None:
+            digest = matrix_digest(self._products, self._exterior, self._A, self._B)
+            if not self._read_cache(cache, digest):
+                self._write_cache(cache, digest)
+
+    @property
+    def n_products(self):
+        return len(self._products)
+
+    @property
+    def n_exterior(self):
+        return len(self._exterior)
+
+    @property
+    def A(self):
+        return self._A
+
+    @property
+    def B(self):
+        return self._B
+
+    def product(self, i):
+        return self._products[i]
+
+    def exterior_flow(self, k):
+        return self._exterior[k]
+
+    def column(self, process_ref, flow_ref):
+        """
+        :param process_ref: process external ref
+        :param flow_ref: reference flow external ref
+        :return: the product flow's column, or None if it is not in the matrix
+        """
+        return self._product_ix.get((process_ref, flow_ref))
+
+    def target(self, x):
+        """
+        Find the product flow that an exchange is terminated to
+        :param x: an exchange, or anything with flow, direction, and termination
+        :return: column, or None if the exchange is exterior
+        """
+        term = x.termination
+        if isinstance(term, Context):
+            return None
+        flow = _flow_ref(x)
+        if term is None:
+            targets = list(self._index.targets(flow, direction=x.direction))
+            if len(targets) != 1:
+                return None  # cutoff, or ambiguous
+            term = targets[0].external_ref
+        return self._product_ix.get((term, flow))
+
+    def _exterior_row(self, x):
+        key = (_flow_ref(x), x.direction, x.termination)
+        try:
+            return self._exterior_ix[key]
+        except KeyError:
+            k = self._exterior_ix[key] = len(self._exterior)
+            self._exterior.append(ExteriorRow(x.flow, x.direction, x.termination))
+            return k
+
+    def demand_sign(self, i, direction):
+        """
+        An exchange with the given direction consumes product i if it is complementary to the product's reference
+        exchange, and supplies it otherwise
+        :param i: column
+        :param direction: of the exchange, with respect to its own process
+        :return: 1.0 or -1.0
+        """
+        if direction == self._products[i].ref_exchange.direction:
+            return -1.0
+        return 1.0
+
+    def _build(self):
+        for p in sorted(self._archive.entities_by_type('process'), key=lambda z: z.external_ref):
+            for rx in p.references():
+                self._product_ix[(p.external_ref, rx.flow.external_ref)] = len(self._products)
+                self._products.append(ProductColumn(p, rx))
+
+        a_i, a_j, a_v = [], [], []
+        b_i, b_j, b_v = [], [], []
+        for j, (p, rx) in enumerate(self._products):
+            for x in p.inventory(ref_flow=rx):
+                if x.is_reference or not x.value:
+                    continue
+                i = self.target(x)
+                if i is None:
+                    b_i.append(self._exterior_row(x))
+                    b_j.append(j)
+                    b_v.append(x.value)
+                else:
+                    a_i.append(i)
+                    a_j.append(j)
+                    a_v.append(self.demand_sign(i, x.direction) * x.value)
+
+        n = len(self._products)
+        self._A = csc_matrix((a_v, (a_i, a_j)), shape=(n, n))
+        self._B = csc_matrix((b_v, (b_i, b_j)), shape=(len(self._exterior), n))
+
+    def _order(self):
+        if self._ordering is None:
+            self._ordering = block_triangular_order(self._A)
+        return self._ordering
+
+    def is_in_scc(self, j):
+        """
+        :param j: column
+        :return: whether product j belongs to a strongly connected component, i.e. is part of a cycle
+        """
+        return j in self._order()[2]
+
+    def _factorize(self):
+        """
+        Reorder (I - A) to block upper-triangular form and factorize each segment on the diagonal with splu.  Acyclic
+        segments are upper-triangular, and are factorized with the natural column ordering and without row pivoting,
+        so SuperLU returns L = I and U = the block itself: the factorization amounts to a copy, and solving with it
+        is a single back-substitution.  (This is faster per solve than spsolve_triangular, and keeps one solve()
+        interface for every segment.)
+        :return:
+        """
+        order, segments, _ = self._order()
+        n = self.n_products
+        perm = np.array(order, dtype=np.int64)
+        m = csc_matrix(identity(n, format='csc') - self._A)[perm, :][:, perm]
+        self._perm = perm
+        self._m_rows = m.tocsr()
+        self._factors = []
+        for k, seg in enumerate(segments):
+            if k in self._inverses:
+                self._factors.append((seg, _BlockInverse(self._inverses[k])))
+                continue
+            block = csc_matrix(m[seg.start:seg.stop, seg.start:seg.stop])
+            if seg.cyclic:
+                self._factors.append((seg, splu(block)))
+            else:
+                self._factors.append((seg, splu(block, permc_spec='NATURAL', diag_pivot_thresh=0.0)))
+
+    @property
+    def n_factorized(self):
+        """
+        The number of products in cyclic segments, i.e. the size of the system that has to be factorized
+        """
+        return sum(seg.stop - seg.start for seg in self._order()[1] if seg.cyclic)
+
+    def solve(self, demand):
+        """
+        Solve the segments in reverse order, subtracting the contributions of the products already solved
+        :param demand: dense vector of product flow demands, or a (dense or sparse) matrix with one column of demands
+         per system to be solved
+        :return: the activity vector x that solves (I - A) x = demand, or a matrix of activity vectors
+        """
+        if self._factors is None:
+            self._factorize()
+        if hasattr(demand, 'toarray'):
+            demand = demand.toarray()
+        d = np.asarray(demand, dtype=float)[self._perm]
+        x = np.zeros(d.shape)
+        for seg, lu in reversed(self._factors):
+            rhs = d[seg.start:seg.stop] - self._m_rows[seg.start:seg.stop].dot(x)  # unsolved entries of x are 0
+            x[seg.start:seg.stop] = lu.solve(rhs)
+        result = np.empty(d.shape)
+        result[self._perm] = x
+        return result
+
+    def activity(self, j):
+        """
+        :param j: column
+        :return: the (cached) activity vector required to deliver a unit of product j
+        """
+        x = self._solutions.get(j)
+        if x is None:
+            if len(self._solutions) >= self._solution_cache_size:
+                self._solutions.clear()
+            e = np.zeros(self.n_products)
+            e[j] = 1.0
+            x = self._solutions[j] = self.solve(e)
+        return x
+
+    @staticmethod
+    def _nonzero_column(m, j):
+        col = m.getcol(j).tocoo()
+        for i, v in zip(col.row.tolist(), col.data.tolist()):
+            if v != 0:
+                yield i, v
+
+    def dependencies(self, j):
+        """
+        Direct interior exchanges of product j
+        :param j:
+        :return: generates (column, value) pairs; value is negative for co-products
+        """
+        return self._nonzero_column(self._A, j)
+
+    def exterior(self, j):
+        """
+        Direct exterior exchanges of product j
+        :param j:
+        :return: generates (row, value) pairs
+        """
+        return self._nonzero_column(self._B, j)
+
+    def consumers(self, i):
+        """
+        Products that directly consume (or co-produce) product i
+        :param i:
+        :return: generates columns
+        """
+        if self._A_rows is None:
+            self._A_rows = self._A.tocsr()
+        row = self._A_rows.getrow(i).tocoo()
+        for j, v in zip(row.col.tolist(), row.data.tolist()):
+            if v != 0:
+                yield j
+
+    def _lci(self, x):
+        b = self._B.dot(x)
+        for k in np.flatnonzero(b).tolist():
+            yield k, float(b[k])
+
+    def lci(self, j):
+        """
+        Aggregated exterior exchanges of product j
+        :param j:
+        :return: generates (row, value) pairs
+        """
+        return self._lci(self.activity(j))
+
+    def sys_lci(self, demand):
+        """
+        Aggregated exterior exchanges for a demand vector
+        :param demand: dense vector of product flow demands
+        :return: generates (row, value) pairs
+        """
+        return self._lci(self.solve(demand))
+
+    def lci_block(self, demand):
+        """
+        Aggregated exterior exchanges for several demand vectors, solved together
+        :param demand: (dense or sparse) matrix of product flow demands, with one column per system
+        :return: dense matrix with one row per exterior flow and one column per system
+        """
+        return np.asarray(self._B.dot(self.solve(demand)))
+
+    def _write_cache(self, path, digest):
+        """
+        Write the matrices and ordering to a cache directory.  The directory is written under a temporary name and
+        then renamed, so that other processes never see a partial cache.
+        :param path:
+        :param digest: from matrix_digest()
+        :return:
+        """
+        if self._factors is None:
+            self._factorize()
+        order, segments, _ = self._order()
+        arrays = {
+            'a_data': self._A.data, 'a_indices': self._A.indices, 'a_indptr': self._A.indptr,
+            'b_data': self._B.data, 'b_indices': self._B.indices, 'b_indptr': self._B.indptr,
+            'order': np.array(order, dtype=np.int64)
+        }
+        inverses = []
+        for k, (seg, lu) in enumerate(self._factors):
+            size = seg.stop - seg.start
+            if seg.cyclic and size <= self._max_cached_inverse:
+                arrays['inv_%d' % k] = lu.solve(np.eye(size))
+                inverses.append(k)
+        header = {
+            'digest': digest,
+            'segments': [list(seg) for seg in segments],
+            'inverses': inverses
+        }
+
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        os.makedirs(tmp, exist_ok=True)
+        for k, v in arrays.items():
+            np.save(os.path.join(tmp, k + '.npy'), v)
+        with open(os.path.join(tmp, CACHE_HEADER), 'w') as fp:
+            json.dump(header, fp)
+        shutil.rmtree(path, ignore_errors=True)
+        try:
+            os.rename(tmp, path)
+        except OSError:  # another process got there first
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _read_cache(self, path, digest):
+        """
+        Load the ordering and block inverses from a cache directory, if it was written for the same matrices, and
+        replace the matrices with the cache's read-only copies
+        :param path:
+        :param digest: of the matrices just built, from matrix_digest()
+        :return: True if the cache was loaded
+        """
+        try:
+            with open(os.path.join(path, CACHE_HEADER)) as fp:
+                header = json.load(fp)
+        except (OSError, ValueError):
+            return False
+        if header.get('digest') != digest:
+            return False
+
+        arrays = {k: np.load(os.path.join(path, k + '.npy'), mmap_mode='r') for k in CACHE_ARRAYS}
+        self._A = csc_matrix((arrays['a_data'], arrays['a_indices'], arrays['a_indptr']), shape=self._A.shape)
+        self._B = csc_matrix((arrays['b_data'], arrays['b_indices'], arrays['b_indptr']), shape=self._B.shape)
+
+        segments = [Segment(*seg) for seg in header['segments']]
+        order = arrays['order'].tolist()
+        cyclic = set(order[k] for seg in segments if seg.cyclic for k in range(seg.start, seg.stop))
+        self._ordering = (order, segments, cyclic)
+        self._inverses = {k: np.load(os.path.join(path, 'inv_%d.npy' % k), mmap_mode='r') for k in header['inverses']}
+        return True
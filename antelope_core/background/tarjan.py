@@ -0,0 +1,114 @@
+"""
+Strongly connected components and block-triangular ordering of a technosphere graph.
+
+The graph has one node per product flow, with an edge from each product to every product it consumes: i.e. an edge
+j -> i wherever A[i, j] is nonzero.  Tarjan's algorithm (implemented iteratively, so that long supply chains do not
+exhaust the recursion limit) emits each strongly connected component after all the components it depends on.  Listing
+the products in that order makes (I - A) block upper-triangular: the diagonal blocks are the SCCs, and everything else
+lies above them.  The system can then be solved block by block from the last to the first, and only the blocks that
+contain cycles need a general factorization; runs of acyclic products are upper-triangular, and are solved by
+back-substitution.
+"""
+
+from collections import namedtuple
+
+
+Segment = namedtuple('Segment', ('start', 'stop', 'cyclic'))
+
+
+def strongly_connected_components(indptr, indices):
+    """
+    Tarjan's algorithm, without recursion
+    :param indptr: compressed adjacency list: the successors of node v are indices[indptr[v]:indptr[v + 1]] (e.g. the
+     indptr and indices of a CSC matrix, giving an edge from each column to the rows of its nonzero entries)
+    :param indices:
+    :return: list of components (lists of nodes), each of which appears after all the components it can reach
+    """
+    indptr = list(indptr)
+    indices = list(indices)
+    n = len(indptr) - 1
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack = []
+    components = []
+    counter = 0
+
+    for root in range(n):
+        if index[root] >= 0:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, indptr[root])]
+        while work:
+            v, pos = work[-1]
+            end = indptr[v + 1]
+            while pos < end:
+                w = indices[pos]
+                pos += 1
+                if index[w] < 0:
+                    # descend into w; resume v at pos afterwards
+                    work[-1] = (v, pos)
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, indptr[w]))
+                    break
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+            else:
+                # v's successors are exhausted
+                work.pop()
+                if low[v] == index[v]:
+                    component = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        component.append(w)
+                        if w == v:
+                            break
+                    components.append(component)
+                if work:
+                    u = work[-1][0]
+                    if low[v] < low[u]:
+                        low[u] = low[v]
+    return components
+
+
+def block_triangular_order(matrix):
+    """
+    Order the products of a technosphere matrix so that (I - A) is block upper-triangular
+    :param matrix: square scipy sparse matrix A, with A[i, j] nonzero where product j consumes product i
+    :return: order, segments, cyclic.  order is a list of columns in solution order; segments is a list of Segments
+     (start, stop, cyclic) partitioning positions in order, in which each cyclic segment is one SCC and each acyclic
+     segment is a run of products that are not part of any cycle; cyclic is the set of columns that belong to an SCC
+     with more than one member
+    """
+    m = matrix.tocsc()
+    m.sort_indices()
+    indptr = m.indptr.tolist()
+    indices = m.indices.tolist()
+
+    order = []
+    segments = []
+    cyclic = set()
+    run_start = None
+    for component in strongly_connected_components(indptr, indices):
+        if len(component) == 1:  # a product that consumes itself only alters its own diagonal entry
+            if run_start is None:
+                run_start = len(order)
+            order.append(component[0])
+            continue
+        if run_start is not None:
+            segments.append(Segment(run_start, len(order), False))
+            run_start = None
+        start = len(order)
+        order.extend(sorted(component))
+        cyclic.update(component)
+        segments.append(Segment(start, len(order), True))
+    if run_start is not None:
+        segments.append(Segment(run_start, len(order), False))
+    return order, segments, cyclic
@@ -0,0 +1,54 @@
+import unittest
+
+import numpy as np
+from scipy.sparse import csc_matrix
+
+from ..tarjan import strongly_connected_components, block_triangular_order
+
+
+def _technosphere(n, edges):
+    """
+    :param n:
+    :param edges: (consumer, supplier) pairs
+    :return: A with A[supplier, consumer] = 0.1
+    """
+    rows = [i for j, i in edges]
+    cols = [j for j, i in edges]
+    return csc_matrix(([0.1] * len(edges), (rows, cols)), shape=(n, n))
+
+
+class TarjanTest(unittest.TestCase):
+    # 0 -> 1 -> 2 -> 1 (cycle 1-2); 2 -> 3; 4 -> 0; 5 consumes itself
+    edges = [(0, 1), (1, 2), (2, 1), (2, 3), (4, 0), (5, 5)]
+
+    def test_components(self):
+        a = _technosphere(6, self.edges)
+        comps = strongly_connected_components(a.indptr, a.indices)
+        self.assertEqual(sorted(sorted(c) for c in comps), [[0], [1, 2], [3], [4], [5]])
+        pos = {v: k for k, c in enumerate(comps) for v in c}
+        for j, i in self.edges:
+            self.assertLessEqual(pos[i], pos[j])  # suppliers come first
+
+    def test_long_chain(self):
+        n = 20000  # deeper than the recursion limit
+        a = _technosphere(n, [(k, k + 1) for k in range(n - 1)])
+        comps = strongly_connected_components(a.indptr, a.indices)
+        self.assertEqual(len(comps), n)
+        self.assertEqual(comps[0], [n - 1])
+
+    def test_block_order(self):
+        a = _technosphere(6, self.edges)
+        order, segments, cyclic = block_triangular_order(a)
+        self.assertEqual(sorted(order), list(range(6)))
+        self.assertEqual(cyclic, {1, 2})
+        self.assertEqual(sum(s.stop - s.start for s in segments), 6)
+        self.assertEqual([s.cyclic for s in segments].count(True), 1)
+        m = (np.eye(6) - a.toarray())[order, :][:, order]
+        for s in segments:
+            if s.cyclic:
+                m[s.start:s.stop, s.start:s.stop] = 0.0
+        self.assertTrue(np.allclose(np.tril(m, -1), 0.0))  # upper triangular outside the SCC block
+
+
+if __name__ == '__main__':
+    unittest.main()
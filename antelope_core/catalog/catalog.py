@@ -27,6 +27,7 @@ from collections import defaultdict
 
 from ..archives import InterfaceError, EntityExists
 from ..lcia_engine import LciaDb
+from ..lcia_engine.cf_cache import PersistentCFCache
 
 
 from antelope import CatalogRef, UnknownOrigin, InvalidQuery  # , EntityNotFound
@@ -60,6 +61,7 @@ class StaticCatalog(object):
     Public filenames:
      LcCatalog.cache_file(src) returns a sha1 hash of the source filename in the [absolute] cache dir
      LcCatalog.download_file(src) returns a sha1 hash of the source filename in the [absolute] download dir
+     LcCatalog.background_cache(src) returns a sha1 hash of the source filename in the cache dir, for matrix backgrounds
 
     Private folders + files:
      LcCatalog._download_dir
@@ -106,6 +108,14 @@ class StaticCatalog(object):
     def cache_file(self, source):
         return os.path.join(self._cache_dir, self._source_hash_file(source) + '.json.gz')
 
+    def background_cache(self, source):
+        """
+        Directory in which a matrix background for the source is persisted (see antelope_core.background)
+        :param source:
+        :return:
+        """
+        return os.path.join(self._cache_dir, self._source_hash_file(source) + '.background')
+
     @property
     def archive_dir(self):
         return os.path.join(self._rootdir, 'archives')
@@ -224,6 +234,21 @@ class StaticCatalog(object):
     def lcia_engine(self):
         return self._qdb.tm
 
+    def enable_cf_cache(self, filename=None):
+        """
+        Opt in to persisting quantity relation results across sessions.  Results are stored in a SQLite file and are
+        stamped against the LciaEngine's contents, so that stored results are ignored once the relevant CFs change.
+        :param filename: [None] default is 'cf_cache.sqlite' in the catalog's cache directory
+        :return: the PersistentCFCache
+        """
+        if filename is None:
+            if not os.path.exists(self._cache_dir):
+                os.makedirs(self._cache_dir)
+            filename = os.path.join(self._cache_dir, 'cf_cache.sqlite')
+        cf_cache = PersistentCFCache(filename, self.lcia_engine)
+        self.lcia_engine.set_cf_cache(cf_cache)
+        return cf_cache
+
     def register_entity_ref(self, q_ref):
         if q_ref.is_entity:
             raise TypeError('Supplied argument is an entity')
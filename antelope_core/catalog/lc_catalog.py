@@ -3,7 +3,7 @@ import tempfile
 from antelope.xdb_tokens import ResourceSpec
 
 from .catalog import StaticCatalog
-from ..archives import REF_QTYS, archive_from_json
+from ..archives import REF_QTYS, LazyIndex
 from ..lc_resource import LcResource
 from ..lcia_engine import DEFAULT_CONTEXTS, DEFAULT_FLOWABLES
 from ..providers.xdb_client.rest_client import RestClient
@@ -401,8 +401,8 @@ class LcCatalog(StaticCatalog):
                     return ex_res.origin
                 except StopIteration:
                     # index file exists, but no matching resource
-                    inx = archive_from_json(inx_file)
-                    self.new_resource(inx.ref, inx_local, 'json', priority=priority, store=stored,
+                    inx = LazyIndex.open(inx_file)
+                    self.new_resource(inx.ref, inx_local, 'LazyIndex', priority=priority, store=stored,
                                       interfaces='index', _internal=True, static=True, preload_archive=inx,
                                       config=cfg)
 
@@ -424,8 +424,8 @@ class LcCatalog(StaticCatalog):
                         self.delete_resource(stale)
 
         the_index = res.make_index(inx_file, force=force)
-        nr = self.new_resource(the_index.ref, inx_local, 'json', priority=priority, store=stored, interfaces='index',
-                               _internal=True, static=True, preload_archive=the_index, config=cfg)
+        nr = self.new_resource(the_index.ref, inx_local, 'LazyIndex', priority=priority, store=stored,
+                               interfaces='index', _internal=True, static=True, preload_archive=the_index, config=cfg)
         if nr.priority > res.priority:
             # this allows the index to act to retrieve entities if the primary resource fails
             nr.add_interface('basic')
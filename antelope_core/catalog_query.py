@@ -3,7 +3,7 @@ Query Interface -- used to operate catalog refs
 """
 
 from antelope import (BasicInterface, IndexInterface, BackgroundInterface, ExchangeInterface, QuantityInterface,
-                      EntityNotFound, UnknownOrigin)
+                      EntityNotFound, UnknownOrigin, QuantityRequired)
 #                      ForegroundInterface,
 #                      IndexRequired, PropertyExists,
 #                      )
@@ -352,3 +352,31 @@ class CatalogQuery(BasicInterface, IndexInterface, BackgroundInterface, Exchange
         lci = p_ref.lci(ref_flow=ref_flow)
         # aggregation
         return query_qty.do_lcia(lci, **kwargs)
+
+    def quantity_conversions_many(self, flows, query_quantity, ref_quantity=None, context=None, locale='GLO',
+                                  **kwargs):
+        """
+        Bulk form of quantity_conversions()
+        :param flows: an iterable of flows, flow refs, or flowable strings
+        :param query_quantity:
+        :param ref_quantity: [None] applies to all flows
+        :param context: [None] applies to all flows
+        :param locale:
+        :param kwargs:
+        :return: a list of (conversions, geographic proxies, mismatches) 3-tuples in the order of the flows given
+        """
+        return self._perform_query('quantity', 'quantity_conversions_many', QuantityRequired,
+                                   list(flows), query_quantity, ref_quantity=ref_quantity, context=context,
+                                   locale=locale, **kwargs)
+
+    def do_lcia_many(self, quantities, inventory, locale='GLO', **kwargs):
+        """
+        Perform LCIA of one inventory with respect to several query quantities in a single pass.
+        :param quantities: an iterable of quantity refs
+        :param inventory:
+        :param locale:
+        :param kwargs:
+        :return: a list of LciaResult objects in the order of the quantities given
+        """
+        return self._perform_query('quantity', 'do_lcia_many', QuantityRequired,
+                                   list(quantities), list(inventory), locale=locale, **kwargs)
@@ -105,6 +105,7 @@ class Context(Compartment):
     _first_origin = None
     entity_type = 'context'
     _elem = None
+    hierarchy_version = 0  # incremented whenever any context is re-parented; used to invalidate compiled lookups
 
     def set_name(self, name):
         raise ImmutableContextName('May not change canonical name for contexts')
@@ -206,6 +207,7 @@ class Context(Compartment):
         if str(self) in PROTECTED and str(parent) in PROTECTED and str(self) != str(parent):
             raise ProtectedTerm
         Compartment.parent.fset(self, parent)
+        Context.hierarchy_version += 1
 
     def _is_elem(self):
         for t in self.terms:
@@ -274,6 +276,9 @@ class ContextManager(CompartmentManager):
 
     def __init__(self, source_file=None):
         super(ContextManager, self).__init__()
+        self._matches = dict()  # foreign context fullname -> canonical match (or NullContext)
+        self._match_hits = 0
+        self._match_misses = 0
 
         self.new_entry('Resources', *SOURCES, sense='source')
         self.new_entry('Emissions', *SINKS, sense='sink')
@@ -296,6 +301,17 @@ class ContextManager(CompartmentManager):
         except TermExists:
             self.del_term(syn)
             self.add_synonym(c, syn)
+        self.clear_matches()
+
+    def clear_matches(self):
+        """
+        Discard all memoized results of find_matching_context()
+        :return:
+        """
+        self._matches.clear()
+
+    def match_stats(self):
+        return {'hits': self._match_hits, 'misses': self._match_misses, 'size': len(self._matches)}
 
     def new_entry(self, *args, parent=None, **kwargs):
         args = tuple(filter(None, args))
@@ -304,7 +320,11 @@ class ContextManager(CompartmentManager):
                 parent = self._d[parent]
             if parent.sense is not None:
                 args = tuple(_dir_mod(arg, parent.sense) for arg in args)
-        return super(ContextManager, self).new_entry(*args, parent=parent, **kwargs)
+        new = super(ContextManager, self).new_entry(*args, parent=parent, **kwargs)
+        # a new canonical context may match foreign contexts that previously matched nothing
+        for k in [k for k, v in self._matches.items() if v is NullContext]:
+            del self._matches[k]
+        return new
 
     def _gen_matching_entries(self, cx, sense):
         for t in cx.terms:
@@ -327,6 +347,7 @@ class ContextManager(CompartmentManager):
             existing_entry.sense = ent.sense  # this is essentially an assert w/raises InconsistentSense
 
         super(ContextManager, self)._merge(existing_entry, ent)  # yowza, moronic bug
+        Context.hierarchy_version += 1
 
     def add_compartments(self, comps, conflict=None):
         if conflict is not None:
@@ -380,11 +401,23 @@ class ContextManager(CompartmentManager):
 
         (2) If a canonical context is found, then all non-matching contexts from least-specific to most-specific,
         are mapped onto existing sub-contexts of the match, or if none is found, collapsed into the match.
+        Results, including failures to match, are memoized by the foreign context's full name until the next context
+        hint is added (or, for failures, until a new canonical context is created).
         :param context:
         :return:
         """
         if context.name == context.fullname:
             raise AttributeError('Context origin must be specified')
+        try:
+            found = self._matches[context.fullname]
+            self._match_hits += 1
+            return found
+        except KeyError:
+            self._match_misses += 1
+        found = self._matches[context.fullname] = self._find_matching_context(context)
+        return found
+
+    def _find_matching_context(self, context):
         current = NullContext  # current = deepest local match
 
         # first, look for stored auto_names or context_hints to find an anchor point:
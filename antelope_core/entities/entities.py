@@ -40,6 +40,9 @@ class LcEntity(BaseEntity):
 
     _origin = None
 
+    property_serial = 0  # incremented every time any entity's property is set
+    _property_stamp = 0  # the value of property_serial when this entity's properties were last set
+
     def __init__(self, entity_type, external_ref, origin=None, entity_uuid=None, **kwargs):
 
         if external_ref is None:
@@ -275,6 +278,15 @@ class LcEntity(BaseEntity):
             raise KeyError('Disallowed Keyname %s' % key)
         else:
             self._d[key] = value
+        LcEntity.property_serial += 1
+        self._property_stamp = LcEntity.property_serial
+
+    @property
+    def property_stamp(self):
+        """
+        The value of LcEntity.property_serial when a property of this entity was last set
+        """
+        return self._property_stamp
 
     def merge(self, other):
         if False:  # not isinstance(other, LcEntity):  ## This is not a requirement! cf. EntityRefs, Disclosure objs
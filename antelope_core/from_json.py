@@ -1,7 +1,14 @@
+import codecs
 import os
 import re
 import gzip as gz
 import json
+from contextlib import contextmanager
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 def from_json(fname):
@@ -20,19 +27,396 @@ def from_json(fname):
     return j
 
 
-def to_json(obj, fname, gzip=False):
+_WS = re.compile(r'[ \t\n\r]*')
+
+STREAM_SECTIONS = ('quantities', 'termManager', 'flows', 'processes')
+
+
+class JsonSectionReader(object):
+    """
+    An incremental reader for a JSON file (optionally gzipped) whose top level is an object.  The file is read in
+    chunks, and top-level values can be read whole, skipped, or (for arrays) generated one element at a time, so that
+    the file's contents never need to be held in memory all at once.
+
+    Byte offsets of top-level values can be obtained with tell() and returned to with seek().
+    """
+    _chunk = 1 << 20
+
+    def __init__(self, fname):
+        self._fname = fname
+        if bool(re.search('\.gz$', fname)):
+            self._fp = gz.open(fname, 'rb')
+        else:
+            self._fp = open(fname, 'rb')
+        self._decoder = json.JSONDecoder()
+        self.seek(0)
+
+    def close(self):
+        self._fp.close()
+
+    def seek(self, offset):
+        self._fp.seek(offset)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._base = offset  # byte offset of self._buf[0]
+        self._eof = False
+
+    def tell(self):
+        return self._base + len(self._buf[:self._pos].encode('utf-8'))
+
+    def _fill(self, size=None):
+        """
+        Read more of the file into the buffer, discarding what has already been consumed
+        :param size: [chunk size] number of bytes to read
+        :return: True if anything was read
+        """
+        if self._eof:
+            return False
+        data = self._fp.read(size or self._chunk)
+        if not data:
+            self._eof = True
+        if self._pos:
+            self._base += len(self._buf[:self._pos].encode('utf-8'))
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        self._buf += self._utf8.decode(data, final=self._eof)
+        return bool(data)
+
+    def _skip_ws(self):
+        """
+        :return: the whitespace skipped
+        """
+        ws = ''
+        while True:
+            end = _WS.match(self._buf, self._pos).end()
+            ws += self._buf[self._pos:end]
+            self._pos = end
+            if self._pos < len(self._buf) or not self._fill():
+                return ws
+
+    def _peek(self):
+        self._skip_ws()
+        return self._buf[self._pos:self._pos + 1]
+
+    def _expect(self, char):
+        c = self._peek()
+        if c != char:
+            raise ValueError('%s: expected %r at byte %d, found %r' % (self._fname, char, self.tell(), c))
+        self._pos += 1
+
+    def read(self):
+        """
+        Decode the next value
+        :return:
+        """
+        self._skip_ws()
+        size = self._chunk
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill(size):
+                    size *= 2  # a long value: avoid re-parsing it once per chunk
+                    continue
+                raise
+            if end == len(self._buf) and self._fill():  # a number may be cut off at the end of the buffer
+                continue
+            self._pos = end
+            return obj
+
+    def elements(self):
+        """
+        Generate the elements of the next value, which must be an array
+        :return:
+        """
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.read()
+            c = self._peek()
+            self._pos += 1
+            if c == ']':
+                return
+            if c != ',':
+                raise ValueError('%s: malformed array at byte %d' % (self._fname, self.tell()))
+
+    def _skip(self, indent):
+        """
+        Skip the next value.  Output of json.dump() with an indent has no raw newlines inside strings, so the closing
+        bracket of an indented top-level value can be found by searching for it on a line by itself.  In a file that
+        is not indented, an array is skipped one element at a time, so that it is never decoded all at once.
+        :param indent: the whitespace preceding the value's key on its line, or None if the file is not indented
+        :return:
+        """
+        c = self._peek()
+        if indent is None and c == '[':
+            for _ in self.elements():
+                pass
+            return
+        if indent is None or c not in '[{':
+            self.read()
+            return
+        self._pos += 1
+        if self._peek() == {'[': ']', '{': '}'}[c]:
+            self._pos += 1
+            return
+        closing = '\n' + indent + {'[': ']', '{': '}'}[c]
+        while True:
+            found = self._buf.find(closing, self._pos)
+            if found >= 0:
+                self._pos = found + len(closing)
+                return
+            self._pos = max(self._pos, len(self._buf) - len(closing))
+            if not self._fill():
+                raise ValueError('%s: unterminated value' % self._fname)
+
+    def index(self, lazy=STREAM_SECTIONS):
+        """
+        Read the top level of the file, decoding all values except those named in lazy, whose byte offsets are
+        recorded instead
+        :param lazy: keys whose values should be skipped
+        :return: a 2-tuple: dict of decoded values, dict of key to (byte offset, whether the value is an array)
+        """
+        values = dict()
+        offsets = dict()
+        self._expect('{')
+        ws = self._skip_ws()
+        if self._peek() == '}':
+            return values, offsets
+        while True:
+            key = self.read()
+            self._expect(':')
+            if key in lazy:
+                offsets[key] = (self.tell(), self._peek() == '[')
+                if '\n' in ws:
+                    self._skip(ws[ws.rindex('\n') + 1:])
+                else:
+                    self._skip(None)
+            else:
+                values[key] = self.read()
+            c = self._peek()
+            self._pos += 1
+            if c == '}':
+                return values, offsets
+            if c != ',':
+                raise ValueError('%s: malformed object at byte %d' % (self._fname, self.tell()))
+            ws = self._skip_ws()
+
+
+class JsonSection(object):
+    """
+    A top-level array in a JSON file, generated one element at a time from disk each time it is iterated
+    """
+    def __init__(self, fname, offset):
+        self._fname = fname
+        self._offset = offset
+
+    def __iter__(self):
+        reader = JsonSectionReader(self._fname)
+        try:
+            reader.seek(self._offset)
+            for e in reader.elements():
+                yield e
+        finally:
+            reader.close()
+
+    def read(self):
+        reader = JsonSectionReader(self._fname)
+        try:
+            reader.seek(self._offset)
+            return reader.read()
+        finally:
+            reader.close()
+
+
+class StreamingJson(dict):
+    """
+    A dict of the top-level contents of a JSON file, in which large sections are not loaded until they are accessed.
+    Array sections are returned as JsonSection iterables; other sections are decoded on access.
+    """
+    def __init__(self, fname, lazy=STREAM_SECTIONS):
+        reader = JsonSectionReader(fname)
+        try:
+            values, offsets = reader.index(lazy=lazy)
+        finally:
+            reader.close()
+        super(StreamingJson, self).__init__(values)
+        self._fname = fname
+        self._lazy = offsets
+
+    def _section(self, key):
+        offset, is_array = self._lazy[key]
+        section = JsonSection(self._fname, offset)
+        if is_array:
+            return section
+        return section.read()
+
+    def __contains__(self, key):
+        return key in self._lazy or super(StreamingJson, self).__contains__(key)
+
+    def __getitem__(self, key):
+        if key in self._lazy:
+            return self._section(key)
+        return super(StreamingJson, self).__getitem__(key)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def keys(self):
+        return list(super(StreamingJson, self).keys()) + list(self._lazy.keys())
+
+
+def from_json_stream(fname, lazy=STREAM_SECTIONS):
+    """
+    Like from_json(), but the sections named in lazy are not decoded until they are used, and array sections are
+    generated one element at a time.  Suitable for passing to an archive's load_from_dict().
+    :param fname: json file, optionally gzipped; must contain a JSON object
+    :param lazy: top-level keys to stream
+    :return: a StreamingJson dict
+    """
+    print('Loading JSON data from %s:' % fname)
+    return StreamingJson(fname, lazy=lazy)
+
+
+@contextmanager
+def _open_for_write(fname, gzip=False):
+    """
+    Open a temporary file alongside fname for writing, and move it into place only once the with-block completes.
+    If the block raises, the temporary file is removed and any existing file at fname is left intact.
+    :param fname:
+    :param gzip: [False] (.gz is appended to fname if absent)
+    :return:
+    """
     dirname = os.path.dirname(fname)
-    if not os.path.exists(dirname):
+    if dirname and not os.path.exists(dirname):
         os.makedirs(dirname, exist_ok=True)
     if gzip is True:
         if not bool(re.search('\.gz$', fname)):
             fname += '.gz'
-        try:  # python3
-            with gz.open(fname, 'wt') as fp:
-                json.dump(obj, fp, indent=2, sort_keys=True)
-        except ValueError:  # python2
-            with gz.open(fname, 'w') as fp:
-                json.dump(obj, fp, indent=2, sort_keys=True)
+    tmp = '%s.%d.tmp' % (fname, os.getpid())
+    try:
+        if gzip is True:
+            fp = gz.open(tmp, 'wt')
+        else:
+            fp = open(tmp, 'w')
+        with fp:
+            yield fp
+        os.replace(tmp, fname)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _dumps(obj, level=0, compact=False, sort_keys=True, fast=False):
+    """
+    Encode a value to appear at the given nesting depth of an indented document (or in a compact one)
+    :param obj:
+    :param level: the depth at which obj appears; continuation lines are indented to match
+    :param compact: [False] no whitespace
+    :param sort_keys: [True]
+    :param fast: [False] use orjson if it is available
+    :return: str
+    """
+    s = None
+    if fast and orjson is not None:
+        opt = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            opt |= orjson.OPT_SORT_KEYS
+        if not compact:
+            opt |= orjson.OPT_INDENT_2
+        try:
+            s = orjson.dumps(obj, option=opt).decode()
+        except TypeError:  # orjson.JSONEncodeError: fall back to the standard library
+            pass
+    if s is None:
+        if compact:
+            s = json.dumps(obj, separators=(',', ':'), sort_keys=sort_keys)
+        else:
+            s = json.dumps(obj, indent=2, sort_keys=sort_keys)
+    if level and not compact:
+        s = s.replace('\n', '\n' + '  ' * level)  # newlines within strings are escaped, so these are all structural
+    return s
+
+
+def to_json(obj, fname, gzip=False, compact=False, sort_keys=True, fast=False):
+    """
+    Write an object to a json file.  By default, the file is indented with sorted keys, which is the layout that
+    LazyIndex relies on.
+    :param obj:
+    :param fname:
+    :param gzip: [False] whether to gzip the file (.gz is appended to fname if absent)
+    :param compact: [False] omit all whitespace
+    :param sort_keys: [True]
+    :param fast: [False] encode with orjson if it is installed.  Note that orjson writes NaN as null.
+    :return:
+    """
+    with _open_for_write(fname, gzip=gzip) as fp:
+        if fast and orjson is not None:
+            fp.write(_dumps(obj, compact=compact, sort_keys=sort_keys, fast=True))
+        elif compact:
+            json.dump(obj, fp, separators=(',', ':'), sort_keys=sort_keys)
+        else:
+            json.dump(obj, fp, indent=2, sort_keys=sort_keys)
+
+
+def join_sections(header, sections):
+    """
+    Assemble a complete serialization from the output of an archive's _serialize_sections()
+    :param header: dict of top-level values
+    :param sections: dict of top-level key to iterable of entries
+    :return: the header dict, updated with the sections as lists
+    """
+    for k, v in sections.items():
+        header[k] = list(v)
+    return header
+
+
+def write_json_sections(header, sections, fname, gzip=False, compact=False, sort_keys=True, fast=False):
+    """
+    Write a json object whose array-valued sections are generated one entry at a time, so that the entire document
+    never needs to exist in memory.  The output is the same as to_json(join_sections(header, sections), ...) with the
+    same arguments.
+    :param header: dict of top-level values
+    :param sections: dict of top-level key to iterable of entries; keys override those in the header
+    :param fname:
+    :param gzip: [False]
+    :param compact: [False] omit all whitespace
+    :param sort_keys: [True]
+    :param fast: [False] encode with orjson if it is installed
+    :return:
+    """
+    keys = [k for k in header.keys() if k not in sections] + list(sections.keys())
+    if sort_keys:
+        keys = sorted(keys)
+    if compact:
+        nl, ind, sep = '', '', ':'
     else:
-        with open(fname, 'w') as fp:
-            json.dump(obj, fp, indent=2, sort_keys=True)
+        nl, ind, sep = '\n', '  ', ': '
+    with _open_for_write(fname, gzip=gzip) as fp:
+        fp.write('{')
+        for i, k in enumerate(keys):
+            if i:
+                fp.write(',')
+            fp.write(nl + ind + json.dumps(k) + sep)
+            if k not in sections:
+                fp.write(_dumps(header[k], level=1, compact=compact, sort_keys=sort_keys, fast=fast))
+                continue
+            fp.write('[')
+            empty = True
+            for entry in sections[k]:
+                if not empty:
+                    fp.write(',')
+                fp.write(nl + ind * 2 + _dumps(entry, level=2, compact=compact, sort_keys=sort_keys, fast=fast))
+                empty = False
+            if not empty:
+                fp.write(nl + ind)
+            fp.write(']')
+        if keys:
+            fp.write(nl)
+        fp.write('}')
@@ -1,5 +1,6 @@
 from .basic import BasicImplementation
 from .background import BackgroundImplementation, search_skip
+from .parallel_lcia import ParallelLciaRunner
 from .configure import CoreConfigureImplementation, ConfigureImplementation, LcConfigureImplementation
 from .quantity import QuantityImplementation
 from .index import IndexImplementation
@@ -208,6 +208,25 @@ class BackgroundImplementation(BasicImplementation, BackgroundInterface):
         for y in demand:
             yield y
 
+    def sys_lci_batch(self, demands, **kwargs):
+        """
+        sys_lci for several demands.  Implementations that can solve many systems together should override this.
+        :param demands: iterable of demand iterables
+        :param kwargs: passed to sys_lci
+        :return: a list of LCI results (lists of exchanges), one per demand
+        """
+        return [list(self.sys_lci(demand, **kwargs)) for demand in demands]
+
+    def sys_lcia_batch(self, demands, query_qty, **kwargs):
+        """
+        LCIA of the sys_lci results of several demands.
+        :param demands: iterable of demand iterables
+        :param query_qty: must be an operable quantity_ref
+        :param kwargs: passed to do_lcia, e.g. locale, quell_biogenic_co2, batch=True
+        :return: a list of LciaResult objects, one per demand
+        """
+        return [query_qty.do_lcia(lci, **kwargs) for lci in self.sys_lci_batch(demands)]
+
     def sys_lcia(self, process, query_qty, observed=None, ref_flow=None, **kwargs):
         """
         returns an LciaResult object, aggregated as appropriate depending on the interface's privacy level.
@@ -217,7 +236,7 @@ class BackgroundImplementation(BasicImplementation, BackgroundInterface):
         :param query_qty: must be an operable quantity_ref. the process must have exchange access
         :param observed: iterable of DirectedFlows (flow: FlowSpec, direction: str)
         :param ref_flow:
-        :param kwargs:
+        :param kwargs: passed to do_lcia, e.g. locale, quell_biogenic_co2, batch=True
         :return:
         """
         p_ref = self.get(process)  # a ref-- unless this was a basic impl. hrm.
@@ -0,0 +1,220 @@
+import numpy as np
+
+from antelope import comp_dir
+
+from .background import BackgroundImplementation
+from ..background import BackgroundMatrix
+from ..exchanges import ExchangeValue
+from .quantity import do_lcia_block
+
+
+class MatrixBackgroundImplementation(BackgroundImplementation):
+    """
+    A Background Implementation that computes LCI results for a linked unit process database, by solving its
+    technosphere matrix (see background.matrix).  The matrix is built and factorized when the background is first
+    used, and is kept by the archive so that it is shared by all the archive's background implementations.
+    Use check_bg(reset=True) to rebuild it after the archive's contents change.
+
+    If the archive has a bm_cache attribute (assigned by the catalog: see StaticCatalog.background_cache()), the matrix
+    is persisted there and reloaded in later sessions.
+
+    There is no foreground: every product flow is in the background.
+    """
+    @property
+    def _bm(self):
+        self.check_bg()
+        return self._archive.bm
+
+    def check_bg(self, reset=False, **kwargs):
+        self.setup_bm(reset=reset, **kwargs)
+        return True
+
+    def setup_bm(self, index=None, reset=False):
+        super(MatrixBackgroundImplementation, self).setup_bm(index=index)
+        if reset or getattr(self._archive, 'bm', None) is None:
+            self._archive.bm = BackgroundMatrix(self._archive, index=self._index,
+                                                cache=getattr(self._archive, 'bm_cache', None))
+
+    def _column(self, process, ref_flow=None):
+        """
+        :param process:
+        :param ref_flow:
+        :return: process entity, column
+        """
+        bm = self._bm
+        p = self._archive.retrieve_or_fetch_entity(process)
+        rx = p.reference(self._ensure_ref_flow(ref_flow))
+        return p, bm.column(p.external_ref, rx.flow.external_ref)
+
+    def _interior_exchange(self, process, i, value):
+        q, rx = self._archive.bm.product(i)
+        if value < 0:
+            return ExchangeValue(process, rx.flow, rx.direction, value=-value, termination=q.external_ref)
+        return ExchangeValue(process, rx.flow, comp_dir(rx.direction), value=value, termination=q.external_ref)
+
+    def _exterior_exchange(self, process, k, value):
+        flow, direction, term = self._archive.bm.exterior_flow(k)
+        return ExchangeValue(process, flow, direction, value=value, termination=term)
+
+    def _exterior(self, process, ref_flow=None, elementary=None):
+        p, j = self._column(process, ref_flow=ref_flow)
+        for k, v in self._archive.bm.exterior(j):
+            x = self._exterior_exchange(p, k, v)
+            if elementary is None or x.is_elementary == elementary:
+                yield x
+
+    def consumers(self, process, ref_flow=None, **kwargs):
+        p, i = self._column(process, ref_flow=ref_flow)
+        for j in self._archive.bm.consumers(i):
+            yield self._archive.bm.product(j).ref_exchange
+
+    def dependencies(self, process, ref_flow=None, **kwargs):
+        p, j = self._column(process, ref_flow=ref_flow)
+        for i, v in self._archive.bm.dependencies(j):
+            yield self._interior_exchange(p, i, v)
+
+    def emissions(self, process, ref_flow=None, **kwargs):
+        return self._exterior(process, ref_flow=ref_flow, elementary=True)
+
+    def cutoffs(self, process, ref_flow=None, **kwargs):
+        return self._exterior(process, ref_flow=ref_flow, elementary=False)
+
+    def is_in_scc(self, process, ref_flow=None, **kwargs):
+        p, j = self._column(process, ref_flow=ref_flow)
+        return self._archive.bm.is_in_scc(j)
+
+    def ad(self, process, ref_flow=None, **kwargs):
+        return self.dependencies(process, ref_flow=ref_flow, **kwargs)
+
+    def bf(self, process, ref_flow=None, **kwargs):
+        return self._exterior(process, ref_flow=ref_flow)
+
+    def lci(self, process, ref_flow=None, **kwargs):
+        p, j = self._column(process, ref_flow=ref_flow)
+        for k, v in self._archive.bm.lci(j):
+            yield self._exterior_exchange(p, k, v)
+
+    def _gather(self, demand, d):
+        """
+        Accumulate the exchanges in a demand that are terminated to background products into a dense demand vector
+        :param demand: iterable of exchanges
+        :param d: demand vector (modified in place)
+        :return: the process of the first exchange accumulated (None if there were none), and a list of the other
+         exchanges
+        """
+        bm = self._bm
+        process = None
+        other = []
+        for y in demand:
+            i = bm.target(y)
+            if i is None:
+                other.append(y)
+                continue
+            if process is None:
+                process = y.process
+            d[i] += bm.demand_sign(i, y.direction) * y.value
+        if process is not None and not hasattr(process, 'external_ref'):
+            process = self._archive.retrieve_or_fetch_entity(process)
+        return process, other
+
+    def _demand_block(self, demands, processes=None):
+        """
+        :param demands: iterable of demand iterables, or a sparse matrix of product flow demands (one column each)
+        :param processes: [None] for a sparse matrix, the process to which each column's results are attributed.  If
+         omitted, each column is attributed to the process supplying its first nonzero row, i.e. to a product
+         *supplier* rather than to the demanding process.
+        :return: dense or sparse demand matrix, list of processes, list of lists of pass-through exchanges
+        """
+        bm = self._bm
+        if hasattr(demands, 'tocsc'):
+            d = demands.tocsc()
+            if d.shape[0] != bm.n_products:
+                raise ValueError('Demand matrix has %d rows; %d products' % (d.shape[0], bm.n_products))
+            if processes is None:
+                d.sort_indices()
+                processes = []
+                for j in range(d.shape[1]):
+                    rows = d.indices[d.indptr[j]:d.indptr[j + 1]]
+                    processes.append(bm.product(int(rows[0])).process if len(rows) else None)
+            else:
+                processes = [p if p is None or hasattr(p, 'external_ref')
+                             else self._archive.retrieve_or_fetch_entity(p) for p in processes]
+                if len(processes) != d.shape[1]:
+                    raise ValueError('%d processes given for %d demand columns' % (len(processes), d.shape[1]))
+            return d, processes, [[] for _ in processes]
+        demands = list(demands)
+        d = np.zeros((bm.n_products, len(demands)))
+        processes = []
+        others = []
+        for j, demand in enumerate(demands):
+            process, other = self._gather(demand, d[:, j])
+            processes.append(process)
+            others.append(other)
+        return d, processes, others
+
+    def sys_lci(self, demand, **kwargs):
+        """
+        Exchanges that are terminated to product flows in the background are solved together; all others are passed
+        through.
+        :param demand: iterable of exchanges
+        :param kwargs:
+        :return:
+        """
+        bm = self._bm
+        d = np.zeros(bm.n_products)
+        process, other = self._gather(demand, d)
+        for y in other:
+            yield y
+        if process is None:
+            return
+        for k, v in bm.sys_lci(d):
+            yield self._exterior_exchange(process, k, v)
+
+    def sys_lci_batch(self, demands, processes=None, **kwargs):
+        """
+        Solve several demands together, as the columns of one demand matrix
+        :param demands: iterable of demand iterables (as for sys_lci), or a sparse matrix with one row per background
+         product (see BackgroundMatrix.column()) and one column per demand
+        :param processes: [None] for a sparse demand matrix, the process (entity or external ref) to assign as the
+         process of each column's exchanges.  By default, the supplier of the column's first nonzero product is used.
+        :param kwargs:
+        :return: a list of LCI results (lists of exchanges), one per demand
+        """
+        bm = self._bm
+        d, processes, others = self._demand_block(demands, processes=processes)
+        block = bm.lci_block(d)
+        lcis = []
+        for j, process in enumerate(processes):
+            lci = list(others[j])
+            if process is not None:
+                col = block[:, j]
+                lci.extend(self._exterior_exchange(process, k, float(col[k])) for k in np.flatnonzero(col).tolist())
+            lcis.append(lci)
+        return lcis
+
+    def sys_lcia_batch(self, demands, query_qty, locale='GLO', group=None, dist=2, processes=None, **kwargs):
+        """
+        Solve several demands together and characterize the whole block of results at once (see do_lcia_block()).
+        Exchanges that are passed through by sys_lci are characterized individually and included in the results.
+        :param demands: iterable of demand iterables, or a sparse demand matrix (see sys_lci_batch())
+        :param query_qty: must be an operable quantity_ref
+        :param locale: ['GLO']
+        :param group: How to group scores (see do_lcia())
+        :param dist: [2] controls how strictly to interpret exchange context (see do_lcia())
+        :param processes: [None] for a sparse demand matrix, the process to which each column's results are
+         attributed (see sys_lci_batch())
+        :param kwargs: passed to lookup_cf(), e.g. quell_biogenic_co2
+        :return: a list of LciaResult objects, one per demand
+        """
+        bm = self._bm
+        kwargs.pop('batch', None)
+        d, processes, others = self._demand_block(demands, processes=processes)
+        block = bm.lci_block(d)
+        exterior = [bm.exterior_flow(k) for k in range(bm.n_exterior)]
+        # the quantity's own implementation determines the canonical quantity, as for do_lcia()
+        if hasattr(query_qty, 'canonical'):
+            quantity = query_qty.canonical()
+        else:
+            quantity = query_qty._query.get_canonical(query_qty)
+        return do_lcia_block(quantity, exterior, block, processes, inventories=others, locale=locale, group=group,
+                             dist=dist, **kwargs)
@@ -0,0 +1,115 @@
+"""
+Run sys_lcia over a large collection of processes using a pool of worker processes.
+
+Workers are created by forking the calling process, so that each one inherits the archives, term manager and compiled
+CF lookups that are already loaded.  Nothing is pickled on the way out except integer shard bounds; each worker
+returns the serialized LCIA results for its shard.  Results are yielded in the order of the processes given,
+regardless of the order in which the shards finish.
+
+Where the 'fork' start method is not available, the shards are computed serially in the calling process.
+"""
+
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+
+ShardTiming = namedtuple('ShardTiming', ('shard', 'count', 'seconds', 'pid'))
+
+
+_job = None  # (target, processes, quantities, detailed, kwargs) -- inherited by forked workers
+
+
+def serialize_lcia_result(process, res, detailed=False):
+    """
+    A plain-data form of an LciaResult
+    :param process: the process (or its external ref) that was scored
+    :param res: an LciaResult
+    :param detailed: [False] whether to include the exchange-level details of each component
+    :return: a dict
+    """
+    return {
+        'process': getattr(process, 'external_ref', str(process)),
+        'quantity': res.quantity.link,
+        'scenario': res.scenario,
+        'scale': res.scale,
+        'total': res.total(),
+        'components': res.serialize_components(detailed=detailed)
+    }
+
+
+def _run_shard(shard, start, stop):
+    target, processes, quantities, detailed, kwargs = _job
+    t0 = time.perf_counter()
+    out = []
+    for p in processes[start:stop]:
+        out.append([serialize_lcia_result(p, target.sys_lcia(p, q, **kwargs), detailed=detailed)
+                    for q in quantities])
+    return out, ShardTiming(shard, stop - start, time.perf_counter() - t0, os.getpid())
+
+
+class ParallelLciaRunner(object):
+    """
+    Shards a list of processes across a ProcessPoolExecutor and scores each process against a set of quantities
+    with target.sys_lcia().  Per-shard timings are available in the timings attribute as shards are received.
+    """
+    def __init__(self, target, quantities, workers=None, shard_size=100, detailed=False):
+        """
+        :param target: an object that implements sys_lcia(process, query_qty, **kwargs), e.g. a catalog query or a
+         background implementation
+        :param quantities: an iterable of quantities to score each process against
+        :param workers: [None] number of worker processes (default: os.cpu_count())
+        :param shard_size: [100] number of processes per shard
+        :param detailed: [False] whether serialized results include exchange-level details
+        """
+        self._target = target
+        self._quantities = list(quantities)
+        self._workers = workers
+        self._shard_size = max(1, int(shard_size))
+        self._detailed = detailed
+        self.timings = []
+
+    @staticmethod
+    def can_fork():
+        return 'fork' in multiprocessing.get_all_start_methods()
+
+    def _shards(self, n):
+        for i, start in enumerate(range(0, n, self._shard_size)):
+            yield i, start, min(start + self._shard_size, n)
+
+    def run(self, processes, **kwargs):
+        """
+        Generate serialized results for each process, in the order given
+        :param processes: an iterable of process refs (or whatever the target's sys_lcia() accepts)
+        :param kwargs: passed to sys_lcia(), e.g. ref_flow, locale
+        :return: generates (process, [serialized LciaResult for each quantity]) in the order of the processes given
+        """
+        global _job
+        if _job is not None:
+            raise RuntimeError('A parallel LCIA job is already running')
+        processes = list(processes)
+        self.timings = []
+        shards = list(self._shards(len(processes)))
+        _job = (self._target, processes, self._quantities, self._detailed, kwargs)
+        try:
+            if self.can_fork() and len(shards) > 1:
+                with ProcessPoolExecutor(max_workers=self._workers,
+                                         mp_context=multiprocessing.get_context('fork')) as executor:
+                    futures = [executor.submit(_run_shard, *shard) for shard in shards]
+                    for (_, start, stop), future in zip(shards, futures):
+                        for k in self._receive(processes, start, future.result()):
+                            yield k
+            else:
+                for shard in shards:
+                    for k in self._receive(processes, shard[1], _run_shard(*shard)):
+                        yield k
+        finally:
+            _job = None
+
+    def _receive(self, processes, start, result):
+        out, timing = result
+        self.timings.append(timing)
+        for i, ress in enumerate(out):
+            yield processes[start + i], ress
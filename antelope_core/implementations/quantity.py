@@ -2,15 +2,20 @@
 Each archive now has a TermManager which interprets query arguments as synonyms for canonical flows and contexts.  This
 can also be upgraded to an LciaEngine, which extends the synonymization strategy to quantities as well
 """
+from collections import defaultdict
+
 from antelope import (QuantityInterface, NoFactorsFound, ConversionReferenceMismatch, EntityNotFound, FlowInterface,
                       convert, ConversionError, QuantityRequired, RefQuantityRequired)
 
 from antelope.flows.flow import QuelledCO2
 
+import numpy as np
+
 from .basic import BasicImplementation
 from ..characterizations import QRResult, LocaleMismatch
 from ..contexts import NullContext
-from ..lcia_results import LciaResult
+from ..exchanges import ExchangeValue
+from ..lcia_results import LciaResult, dirn_adjust
 from ..entities.quantities import new_quantity
 from ..entities.flows import new_flow
 
@@ -283,6 +288,261 @@ def do_lcia(quantity, inventory, locale=None, group=None, dist=2, **kwargs):
     return res
 
 
+def _lookup_key(x, locale):
+    """
+    The inputs that determine the outcome of Flow.lookup_cf() for a given quantity: the flow itself (whose
+    characterization cache is consulted first), the exchange's termination, and the locale.  Distinct flow objects
+    are never merged, even if they share a name and reference quantity, so that each flow's cache is used and filled
+    just as in do_lcia().  The flow is identified by id(); the inventory entries are retained by the results, so the
+    ids are not reused while the lookups are being made.
+    :param x: an exchange
+    :param locale:
+    :return:
+    """
+    f = x.flow
+    return id(f), x.termination, locale or f.locale
+
+
+def do_lcia_batch(quantity, inventory, locale=None, group=None, dist=2, **kwargs):
+    """
+    Batch version of do_lcia().  The characterization of each distinct (flow, context, locale) combination is looked
+    up only once for the whole inventory; CF values, exchange values and direction adjustments
+    are gathered into arrays and each component's score is computed as a dot product.  DetailedLciaResult objects
+    are only created if the result's details are requested.
+
+    Returns an LciaResult with the same components, cutoffs, zeros and errors as do_lcia().
+
+    :param quantity:
+    :param inventory: An iterable of exchange-like entries, having flow, direction, value, termination.
+    :param locale: ['GLO']
+    :param group: How to group scores.  Should be a lambda that operates on inventory items. Default x -> x.process
+    :param dist: [2] controls how strictly to interpret exchange context (see do_lcia())
+    :param kwargs: passed to lookup_cf()
+    :return:
+    """
+    res = LciaResult(quantity)
+    if group is None:
+        group = lambda _x: _x.process
+
+    resolved = dict()  # lookup key -> (qrr, value, sense)
+    blocks = dict()  # group key -> ([exchanges], [qrrs], [values], [signs], [factors])
+
+    for x in inventory:
+        xt = x.type
+        if xt == 'reference':
+            res.add_cutoff(x)
+            continue
+        elif xt == 'self':
+            continue
+        key = _lookup_key(x, locale)
+        try:
+            qrr, cf, sense = resolved[key]
+        except KeyError:
+            qrr = x.flow.lookup_cf(quantity, x.termination, locale, dist=dist, **kwargs)
+            if isinstance(qrr, QuantityConversion):
+                cf = qrr.value
+                sense = qrr.context.sense
+            else:
+                cf = sense = None
+            resolved[key] = qrr, cf, sense
+
+        if isinstance(qrr, QuantityConversion):
+            if cf == 0:
+                res.add_zero(x)
+            else:
+                g = group(x)
+                if g not in blocks:
+                    blocks[g] = ([], [], [], [], [])
+                b = blocks[g]
+                b[0].append(x)
+                b[1].append(qrr)
+                b[2].append(0.0 if x.value is None else x.value)
+                b[3].append(dirn_adjust(sense, x.direction))
+                b[4].append(cf)
+        elif isinstance(qrr, QuantityConversionError):
+            res.add_error(x, qrr)
+        elif isinstance(qrr, QuelledCO2):
+            res.add_zero(x)
+        elif qrr is None:
+            res.add_cutoff(x)
+        else:
+            raise TypeError('Unknown qrr type %s' % qrr)
+
+    for g, b in blocks.items():
+        res.add_scores(g, b[0], b[1], np.array(b[2], dtype=float), np.array(b[3], dtype=float),
+                       np.array(b[4], dtype=float))
+
+    e = len(list(res.errors()))
+    if e:
+        print('%s: %d CF errors encountered' % (quantity, e))
+    return res
+
+
+def do_lcia_block(quantity, exterior, block, processes, inventories=None, locale=None, group=None, dist=2, **kwargs):
+    """
+    LCIA of several inventories over a common set of exterior flows, such as the results of solving a background
+    system for many demand vectors at once.  Each exterior flow is characterized only once, giving a vector of CF
+    values and direction adjustments that is shared by all the inventories, and the scores of all the inventories are
+    computed with a single product of that vector with the block.
+
+    With the default grouping, no exchanges are created for the exterior flows until a result's details, cutoffs,
+    zeros or errors are requested.  A custom group function must be applied to the exchanges themselves, so in that
+    case they are created up front, and the scores are computed per group as in do_lcia_batch().
+
+    :param quantity: canonical query quantity
+    :param exterior: sequence of n exterior flow specifications, having flow, direction, and termination
+    :param block: n x m array: block[k, j] is the amount of exterior flow k in the j-th inventory
+    :param processes: sequence of m processes, one per inventory, to which the exchanges are attributed
+    :param inventories: [None] sequence of m iterables of additional exchange-like entries, characterized as in
+     do_lcia_batch() and added to the corresponding results
+    :param locale: ['GLO']
+    :param group: How to group scores.  Should be a lambda that operates on inventory items. Default x -> x.process
+    :param dist: [2] controls how strictly to interpret exchange context (see do_lcia())
+    :param kwargs: passed to lookup_cf()
+    :return: a list of m LciaResult objects
+    """
+    block = np.asarray(block, dtype=float)
+    n, m = block.shape
+    lazy = group is None
+    if group is None:
+        group = lambda _x: _x.process
+
+    resolved = dict()  # lookup key -> (qrr, value, sense)
+
+    def _resolve(x):
+        key = _lookup_key(x, locale)
+        try:
+            return resolved[key]
+        except KeyError:
+            qrr = x.flow.lookup_cf(quantity, x.termination, locale, dist=dist, **kwargs)
+            if isinstance(qrr, QuantityConversion):
+                cf = qrr.value
+                sense = qrr.context.sense
+            else:
+                cf = sense = None
+            resolved[key] = qrr, cf, sense
+            return resolved[key]
+
+    def _add(res, blocks, x, qrr, cf, sense):
+        if isinstance(qrr, QuantityConversion):
+            if cf == 0:
+                res.add_zero(x)
+            else:
+                g = group(x)
+                if g not in blocks:
+                    blocks[g] = ([], [], [], [], [])
+                b = blocks[g]
+                b[0].append(x)
+                b[1].append(qrr)
+                b[2].append(0.0 if x.value is None else x.value)
+                b[3].append(dirn_adjust(sense, x.direction))
+                b[4].append(cf)
+        elif isinstance(qrr, QuantityConversionError):
+            res.add_error(x, qrr)
+        elif isinstance(qrr, QuelledCO2):
+            res.add_zero(x)
+        elif qrr is None:
+            res.add_cutoff(x)
+        else:
+            raise TypeError('Unknown qrr type %s' % qrr)
+
+    def _exchange(j, k, col):
+        r = exterior[k]
+        return ExchangeValue(processes[j], r.flow, r.direction, value=float(col[k]), termination=r.termination)
+
+    qrrs = [None] * n
+    factors = np.zeros(n)
+    signs = np.zeros(n)
+    scored = np.zeros(n, dtype=bool)
+    errored = np.zeros(n, dtype=bool)
+    for k in np.flatnonzero(np.any(block != 0, axis=1)).tolist():
+        qrr, cf, sense = _resolve(exterior[k])
+        qrrs[k] = qrr
+        if isinstance(qrr, QuantityConversion) and cf != 0:
+            factors[k] = cf
+            signs[k] = dirn_adjust(sense, exterior[k].direction)
+            scored[k] = True
+        elif isinstance(qrr, QuantityConversionError):
+            errored[k] = True
+
+    totals = (factors * signs) @ block  # the exterior scores of every inventory at once
+    nonzero = np.any(block[scored] != 0, axis=0)
+    errors = np.count_nonzero(block[errored], axis=0)
+    distinct = list({id(qrrs[k]): qrrs[k] for k in np.flatnonzero(scored).tolist()}.values())
+
+    def _scored(j):
+        def build():
+            col = block[:, j]
+            ix = np.flatnonzero(scored & (col != 0)).tolist()
+            return [_exchange(j, k, col) for k in ix], [qrrs[k] for k in ix]
+        return build
+
+    def _unscored(j):
+        def build(res):
+            col = block[:, j]
+            for k in np.flatnonzero(~scored & (col != 0)).tolist():
+                _add(res, None, _exchange(j, k, col), *_resolve(exterior[k]))
+        return build
+
+    ress = []
+    for j in range(m):
+        res = LciaResult(quantity)
+        blocks = dict()  # group key -> ([exchanges], [qrrs], [values], [signs], [factors])
+
+        if inventories is not None:
+            for x in inventories[j]:
+                xt = x.type
+                if xt == 'reference':
+                    res.add_cutoff(x)
+                    continue
+                elif xt == 'self':
+                    continue
+                _add(res, blocks, x, *_resolve(x))
+
+        if not lazy:
+            col = block[:, j]
+            for k in np.flatnonzero(col).tolist():
+                x = _exchange(j, k, col)
+                _add(res, blocks, x, *_resolve(exterior[k]))
+
+        for g, b in blocks.items():
+            res.add_scores(g, b[0], b[1], np.array(b[2], dtype=float), np.array(b[3], dtype=float),
+                           np.array(b[4], dtype=float))
+
+        e = len(list(res.errors()))
+        if lazy:
+            if nonzero[j]:
+                res.add_lazy_scores(processes[j], totals[j], True, _scored(j), qrresults=distinct)
+            res.add_builder(_unscored(j))
+            e += int(errors[j])
+        if e:
+            print('%s: %d CF errors encountered' % (quantity, e))
+        ress.append(res)
+    return ress
+
+
+def _quelled(quantity, flow, context, quell_biogenic_co2=None):
+    """
+    Reproduces the biogenic CO2 test performed by Flow.lookup_cf(), for callers that bypass it.
+    :param quantity: canonical query quantity
+    :param flow:
+    :param context:
+    :param quell_biogenic_co2: [None] overrides the quantity's 'quell_biogenic_co2' property
+    :return: a QuelledCO2 if the flow's CF should be suppressed, else None
+    """
+    if quell_biogenic_co2 is None:
+        qbc = quantity.get('quell_biogenic_co2')
+    else:
+        qbc = quell_biogenic_co2
+    if qbc == 'only':
+        if not flow.quell_co2:
+            return QuelledCO2(flow.name, context)
+    elif qbc:
+        if flow.quell_co2:
+            return QuelledCO2(flow.name, context)
+    return None
+
+
 class NoConversion(Exception):
     pass
 
@@ -400,9 +660,57 @@ class QuantityImplementation(BasicImplementation, QuantityInterface):
         return self._archive.tm.add_characterization(flowable, rq, qq, value, context=context, location=location,
                                                      origin=origin, **kwargs)
 
-    def _ref_qty_conversion(self, target_quantity, flowable, compartment, conv, locale, _reverse=True):
+    def _ref_qty_conversion(self, target_quantity, flowable, compartment, conv, locale):
         """
-        Transforms a CF into a quantity conversion with the proper ref quantity. Does it recursively! watch with terror.
+        Transforms a CF into a quantity conversion with the proper ref quantity.  The search itself is performed by
+        _find_ref_qty_conversion(); its outcome (the results appended to the chain, or the mismatch) is memoized in
+        the term manager's conversion cache, whose entries for a flowable are discarded whenever a characterization of
+        that flowable is added or changed.
+        :param target_quantity: conversion target
+        :param flowable:
+        :param compartment:
+        :param conv: An existing QuantityConversion chain, whose ref we must turn into target_quantity
+        :param locale:
+        :return: the incoming conv, augmented (a copy, if any results were added)
+        """
+        if target_quantity is None:
+            raise ConversionReferenceMismatch('Cannot convert to None')
+        found_quantity = self.get_canonical(conv.ref)
+        if found_quantity == target_quantity:
+            return conv
+        # a direct unit conversion is always tried afresh, since it costs no more than a cache lookup.  Unit
+        # conversions found further along a chain are cached with the rest of the chain: after editing a quantity's
+        # unit conversion table in place, clear the term manager's conversion cache.
+        try:
+            new_conv = QuantityConversion.copy(conv)
+            new_conv.add_result(try_convert(flowable, target_quantity, found_quantity, compartment, locale))
+            return new_conv
+        except NoConversion:
+            pass
+        cache = self._archive.tm.conversion_cache
+        key = (flowable, found_quantity, target_quantity, compartment, locale,
+               frozenset(res.ref for res in conv.results))
+        try:
+            ext = cache.get(key)
+        except KeyError:
+            n = len(list(conv.results))
+            try:
+                found = self._find_ref_qty_conversion(target_quantity, flowable, compartment,
+                                                      QuantityConversion.copy(conv), locale)
+                ext = tuple(found[n:])
+            except ConversionReferenceMismatch as e:
+                ext = e
+            cache.put(key, ext)
+        if isinstance(ext, ConversionReferenceMismatch):
+            raise ext
+        new_conv = QuantityConversion.copy(conv)
+        for res in ext:
+            new_conv.add_result(res)
+        return new_conv
+
+    def _find_ref_qty_conversion(self, target_quantity, flowable, compartment, conv, locale, _reverse=True):
+        """
+        Searches for a conversion chain to the proper ref quantity. Does it recursively! watch with terror.
         :param target_quantity: conversion target
         :param flowable:
         :param compartment:
@@ -430,8 +738,8 @@ class QuantityImplementation(BasicImplementation, QuantityInterface):
                 new_conv = QuantityConversion.copy(conv)
                 new_conv.add_result(cf.query(locale))
                 try:
-                    return self._ref_qty_conversion(target_quantity, flowable, compartment, new_conv, locale,
-                                                    _reverse=_reverse)
+                    return self._find_ref_qty_conversion(target_quantity, flowable, compartment, new_conv, locale,
+                                                         _reverse=_reverse)
                 except ConversionReferenceMismatch:
                     continue
 
@@ -439,9 +747,9 @@ class QuantityImplementation(BasicImplementation, QuantityInterface):
             if _reverse:
                 new_conv = QuantityConversion.copy(conv)
                 try:
-                    rev_conv = self._ref_qty_conversion(found_quantity, flowable, compartment,
-                                                        QuantityConversion(query=target_quantity), locale,
-                                                        _reverse=False)
+                    rev_conv = self._find_ref_qty_conversion(found_quantity, flowable, compartment,
+                                                             QuantityConversion(query=target_quantity), locale,
+                                                             _reverse=False)
 
                     for res in rev_conv.invert().results:
                         new_conv.add_result(res)
@@ -543,6 +851,26 @@ class QuantityImplementation(BasicImplementation, QuantityInterface):
         :param context:
         :return: flowable, canonical ref_quantity, canonical context or None
         """
+        flowable, ref_quantity, context = self._flow_terms(flow, ref_quantity, context)
+        rq = self.get_canonical(ref_quantity)
+        return flowable, rq, self._canonical_context(context)
+
+    def _canonical_context(self, context):
+        if isinstance(context, list):
+            context = tuple(context)  # lists are unhashable and are not recognized by the term manager
+        cx = self._archive.tm[context]  # will fall back to find_matching_context if tm is an LciaEngine
+        if cx is None and context is not None:  # lcia_engine now returns NullContext, but TermManager does not
+            cx = NullContext
+        return cx
+
+    def _flow_terms(self, flow, ref_quantity, context):
+        """
+        The non-canonical part of _get_flowable_info()
+        :param flow:
+        :param ref_quantity:
+        :param context:
+        :return: flowable, ref_quantity, context as given or as taken from the flow
+        """
         if isinstance(flow, str):
             try:
                 flow = self.get(flow)  # assume it's a ref
@@ -570,12 +898,7 @@ class QuantityImplementation(BasicImplementation, QuantityInterface):
 
         if ref_quantity is None:
             raise RefQuantityRequired
-
-        rq = self.get_canonical(ref_quantity)
-        cx = self._archive.tm[context]  # will fall back to find_matching_context if tm is an LciaEngine
-        if cx is None and context is not None:  # lcia_engine now returns NullContext, but TermManager does not
-            cx = NullContext
-        return flowable, rq, cx
+        return flowable, ref_quantity, context
 
     def quantity_conversions(self, flow, query_quantity, ref_quantity=None, context=None, locale='GLO', **kwargs):
         """
@@ -615,6 +938,62 @@ class QuantityImplementation(BasicImplementation, QuantityInterface):
             else:
                 return [QuantityConversion.null(flowable, rq, qq, cx, locale, self.origin)], [], []
 
+    def quantity_conversions_many(self, flows, query_quantity, ref_quantity=None, context=None, locale='GLO',
+                                  **kwargs):
+        """
+        Bulk form of quantity_conversions().  The query quantity is canonicalized once, and each distinct ref
+        quantity and context among the flows is canonicalized only once.  The quantity engine is then consulted once
+        for each distinct (flowable, canonical ref quantity, canonical context), and flows that share these receive
+        the same conversions.
+
+        :param flows: an iterable of flows, flow refs, or flowable strings
+        :param query_quantity: convert to this quantity
+        :param ref_quantity: [None] convert for 1 unit of this quantity, for all flows (default: each flow's own)
+        :param context: [None] context for all flows (default: each flow's own)
+        :param locale: handled by CF; default 'GLO'
+        :param kwargs: passed to the quantity engine, e.g. dist
+        :return: a list of quantity_conversions() 3-tuples, in the order of the flows given
+        """
+        if query_quantity is None:
+            qq = None
+        else:
+            qq = self.get_canonical(query_quantity)
+            if qq is None:
+                raise EntityNotFound(query_quantity)
+
+        rqs = dict()
+        cxs = dict()
+        groups = defaultdict(list)
+        n = 0
+        for i, flow in enumerate(flows):
+            flowable, r, c = self._flow_terms(flow, ref_quantity, context)
+            if isinstance(c, list):
+                c = tuple(c)
+            if r not in rqs:
+                rqs[r] = self.get_canonical(r)
+            if c not in cxs:
+                cxs[c] = self._canonical_context(c)
+            cx = cxs[c]
+            groups[flowable, rqs[r], cx].append((i, c))
+            n += 1
+
+        results = [None] * n
+        for (flowable, rq, cx), members in groups.items():
+            if qq == rq:
+                for i, c in members:
+                    results[i] = [QRResult(flowable, rq, qq, c or NullContext, locale, qq.origin, 1.0)], [], []
+                continue
+            try:
+                res = self._quantity_engine(flowable, rq, qq, cx, locale=locale, **kwargs)
+            except NoFactorsFound:
+                if qq is None:
+                    res = [], [], []
+                else:
+                    res = [QuantityConversion.null(flowable, rq, qq, cx, locale, self.origin)], [], []
+            for i, c in members:
+                results[i] = tuple(list(k) for k in res)
+        return results
+
     def _quantity_relation(self, fb, rq, qq, cx, locale='GLO',
                            strategy=None, allow_proxy=True, **kwargs):
         """
@@ -676,12 +1055,42 @@ class QuantityImplementation(BasicImplementation, QuantityInterface):
 
         fb, rq, cx = self._get_flowable_info(flowable, ref_quantity, context)  # call only for exception handling
         qq = self.get_canonical(query_quantity)
+        return self._canonical_relation(flowable, context, fb, rq, qq, cx, locale=locale, strategy=strategy,
+                                        allow_proxy=allow_proxy, **kwargs)
 
+    def _canonical_relation(self, flowable, context, fb, rq, qq, cx, locale='GLO',
+                            strategy=None, allow_proxy=True, **kwargs):
+        """
+        The body of quantity_relation(), for terms that have already been made canonical
+        :param flowable: flowable as given
+        :param context: context as given
+        :param fb: flowable, ref quantity and context as returned by _get_flowable_info()
+        :param rq:
+        :param qq: canonical query quantity
+        :param cx:
+        :param locale:
+        :param strategy:
+        :param allow_proxy:
+        :param kwargs:
+        :return:
+        """
         if qq == rq:  # is?
             return QRResult(flowable, rq, qq, context or NullContext, locale, qq.origin, 1.0)
 
-        result, mismatch = self._quantity_relation(fb, rq, qq, cx, locale=locale,
-                                                   strategy=strategy, allow_proxy=allow_proxy, **kwargs)
+        cf_cache = self._archive.tm.cf_cache
+        if cf_cache is not None:
+            try:
+                return cf_cache.get(fb, rq, qq, cx, locale, strategy=strategy, allow_proxy=allow_proxy, **kwargs)
+            except KeyError:
+                pass
+
+        try:
+            result, mismatch = self._quantity_relation(fb, rq, qq, cx, locale=locale,
+                                                       strategy=strategy, allow_proxy=allow_proxy, **kwargs)
+        except NoFactorsFound:
+            if cf_cache is not None:
+                cf_cache.put_none(fb, rq, qq, cx, locale, strategy=strategy, allow_proxy=allow_proxy, **kwargs)
+            raise
         if result is None:
             if len(mismatch) > 0:
                 '''
@@ -694,6 +1103,8 @@ class QuantityImplementation(BasicImplementation, QuantityInterface):
 
             else:
                 raise AssertionError('Something went wrong')
+        if cf_cache is not None:
+            cf_cache.put(result, fb, rq, qq, cx, locale, strategy=strategy, allow_proxy=allow_proxy, **kwargs)
         return result
 
     def cf(self, flow, quantity, ref_quantity=None, context=None, locale='GLO', **kwargs):
@@ -763,7 +1174,7 @@ class QuantityImplementation(BasicImplementation, QuantityInterface):
                 pass
         return n[ix]
 
-    def do_lcia(self, quantity, inventory, locale='GLO', group=None, dist=2, **kwargs):
+    def do_lcia(self, quantity, inventory, locale='GLO', group=None, dist=2, batch=False, **kwargs):
         """
         This is *almost* static. Could be moved into interface, except that it requires LciaResult (which is core).
 
@@ -779,12 +1190,156 @@ class QuantityImplementation(BasicImplementation, QuantityInterface):
           1 - match child contexts (code default)
           2 - match parent contexts [this default]
           3 - match any ancestor context, including Null
+        :param batch: [False] use the batch engine do_lcia_batch(), which looks up each distinct flow / context
+          only once and defers creation of detailed results.
         :param kwargs:
         :return:
         """
         q = self.get_canonical(quantity)
+        if batch:
+            return do_lcia_batch(q, inventory, locale=locale, group=group, dist=dist, **kwargs)
         return do_lcia(q, inventory, locale=locale, group=group, dist=dist, **kwargs)
 
+    def _local(self, qq):
+        """
+        Whether Flow.lookup_cf() would answer a query for the given quantity from this implementation's archive
+        :param qq: canonical query quantity
+        :return: bool
+        """
+        qi = getattr(qq, '_qi', None)
+        return isinstance(qi, QuantityImplementation) and qi._archive is self._archive
+
+    def _lookup_many(self, qqs, flow, context, locale, refresh=False, quell_biogenic_co2=None, **kwargs):
+        """
+        Flow.lookup_cf() for a list of canonical query quantities, resolving the flowable, ref quantity and context
+        only once.  As in lookup_cf(), each result is first sought in the flow's cache, and is cached on the flow once
+        it is found.  Quantities that are answered elsewhere are looked up with lookup_cf() itself.
+        :param qqs: list of canonical query quantities
+        :param flow:
+        :param context:
+        :param locale:
+        :param refresh: [False] drop cached results and re-query
+        :param quell_biogenic_co2: [None] overrides the quantities' 'quell_biogenic_co2' property
+        :param kwargs: passed to quantity_relation(), e.g. dist
+        :return: list of whatever lookup_cf() returns, one per quantity
+        """
+        locale = locale or flow.locale
+        terms = None
+        results = []
+        for qq in qqs:
+            qrr = _quelled(qq, flow, context, quell_biogenic_co2=quell_biogenic_co2)
+            if qrr is not None:
+                results.append(qrr)
+                continue
+            key = qq, context, locale
+            if refresh:
+                flow.pop_char(*key)
+            try:
+                results.append(flow._chars_seen[key])
+                continue
+            except KeyError:
+                pass
+            if not self._local(qq):
+                results.append(flow.lookup_cf(qq, context, locale, quell_biogenic_co2=quell_biogenic_co2, **kwargs))
+                continue
+            if terms is None:
+                terms = self._get_flowable_info(flow.name, flow.reference_entity, context)
+            fb, rq, cx = terms
+            try:
+                qrr = self._canonical_relation(flow.name, context, fb, rq, qq, cx, locale=locale, **kwargs)
+            except ConversionReferenceMismatch as e:
+                qrr = e.args[0]
+            except NoFactorsFound:
+                qrr = None
+            flow._chars_seen[key] = qrr
+            results.append(qrr)
+        return results
+
+    def do_lcia_many(self, quantities, inventory, locale='GLO', group=None, dist=2, **kwargs):
+        """
+        Perform LCIA of a single inventory with respect to a list of query quantities in one pass.  The inventory is
+        traversed once; the flowable, reference quantity and context of each distinct exchange (as for
+        do_lcia_batch()) are resolved once and characterized for all quantities, generating a (quantities x
+        exchanges) matrix of CFs.  The results are the same as Flow.lookup_cf() would give, and are cached on the
+        flows in the same way.  Scores are computed as in do_lcia_batch(), with detailed results created only on
+        demand.
+
+        :param quantities: an iterable of query quantities
+        :param inventory: An iterable of exchange-like entries, having flow, direction, value, termination.
+        :param locale: ['GLO']
+        :param group: How to group scores.  Should be a lambda that operates on inventory items. Default x -> x.process
+        :param dist: [2] controls how strictly to interpret exchange context (see do_lcia())
+        :param kwargs: as for lookup_cf(), e.g. quell_biogenic_co2, strategy, allow_proxy
+        :return: a list of LciaResult objects, one per quantity, in the order given
+        """
+        qqs = [self.get_canonical(q) for q in quantities]
+        ress = [LciaResult(q) for q in qqs]
+        if group is None:
+            group = lambda _x: _x.process
+
+        keys = dict()  # lookup key -> column index
+        rows = []  # per key: list of per-quantity results
+        exchs = []  # characterized exchanges
+        cols = []  # column index of each characterized exchange
+
+        for x in inventory:
+            xt = x.type
+            if xt == 'reference':
+                for res in ress:
+                    res.add_cutoff(x)
+                continue
+            elif xt == 'self':
+                continue
+            key = _lookup_key(x, locale)
+            if key not in keys:
+                keys[key] = len(rows)
+                rows.append(self._lookup_many(qqs, x.flow, x.termination, key[2], dist=dist, **kwargs))
+            exchs.append(x)
+            cols.append(keys[key])
+
+        n = len(rows)
+        cfs = np.zeros((len(qqs), n))
+        senses = [[None] * n for _ in qqs]
+        for j, row in enumerate(rows):
+            for i, qrr in enumerate(row):
+                if isinstance(qrr, QuantityConversion):
+                    cfs[i, j] = qrr.value
+                    senses[i][j] = qrr.context.sense
+
+        values = np.array([0.0 if x.value is None else x.value for x in exchs], dtype=float)
+        groups = [group(x) for x in exchs]
+        cols = np.array(cols, dtype=int)
+
+        for i, res in enumerate(ress):
+            blocks = dict()  # group key -> [exchange indices]
+            for k, x in enumerate(exchs):
+                qrr = rows[cols[k]][i]
+                if isinstance(qrr, QuantityConversion):
+                    if cfs[i, cols[k]] == 0:
+                        res.add_zero(x)
+                    else:
+                        blocks.setdefault(groups[k], []).append(k)
+                elif isinstance(qrr, QuantityConversionError):
+                    res.add_error(x, qrr)
+                elif isinstance(qrr, QuelledCO2):
+                    res.add_zero(x)
+                elif qrr is None:
+                    res.add_cutoff(x)
+                else:
+                    raise TypeError('Unknown qrr type %s' % qrr)
+
+            for g, ix in blocks.items():
+                ix = np.array(ix, dtype=int)
+                res.add_scores(g, [exchs[k] for k in ix], [rows[cols[k]][i] for k in ix], values[ix],
+                               np.array([dirn_adjust(senses[i][cols[k]], exchs[k].direction) for k in ix],
+                                        dtype=float),
+                               cfs[i, cols[ix]])
+
+            e = len(list(res.errors()))
+            if e:
+                print('%s: %d CF errors encountered' % (res.quantity, e))
+        return ress
+
     def lcia(self, process, ref_flow, quantity_ref, **kwargs):
         """
         Implementation of foreground LCIA -- moved from LcCatalog
@@ -0,0 +1,237 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from scipy.sparse import csc_matrix
+
+from ...archives import LcArchive
+from ...background import BackgroundMatrix
+from ...entities import LcFlow, LcProcess, LcQuantity
+from ..background import BackgroundImplementation
+from ..matrix_background import MatrixBackgroundImplementation
+
+
+def _cyclic_archive(**kwargs):
+    """
+    Electricity production consumes coal (unterminated) and emits CO2; coal mining consumes electricity (terminated)
+    and emits methane.  Smelting consumes electricity but is not part of the cycle.
+    """
+    ar = LcArchive(None, ref='test.matrix', **kwargs)
+    mass = LcQuantity.new('Mass', 'kg')
+    ar.add(mass)
+    air = ar.tm.add_context(('emissions', 'to air'))
+    elec = LcFlow.new('electricity', mass)
+    coal = LcFlow.new('coal', mass)
+    co2 = LcFlow.new('carbon dioxide', mass, context=air)
+    ch4 = LcFlow.new('methane', mass, context=air)
+    for f in (elec, coal, co2, ch4):
+        ar.add(f)
+    pe = LcProcess.new('electricity production')
+    pe.add_exchange(elec, 'Output', value=1.0)
+    pe.set_reference(elec, 'Output')
+    pe.add_exchange(coal, 'Input', value=0.5)
+    pe.add_exchange(co2, 'Output', value=1.0, termination=air)
+    pc = LcProcess.new('coal mining')
+    pc.add_exchange(coal, 'Output', value=2.0)
+    pc.set_reference(coal, 'Output')
+    pc.add_exchange(elec, 'Input', value=0.2, termination=pe.external_ref)
+    pc.add_exchange(ch4, 'Output', value=0.4, termination=air)
+    ps = LcProcess.new('smelting')
+    ps.add_exchange(LcFlow.new('aluminium', mass), 'Output', value=1.0)
+    ps.set_reference(next(ps.exchanges()).flow, 'Output')
+    ps.add_exchange(elec, 'Input', value=2.0)
+    for p in (pe, pc, ps):
+        ar.add_entity_and_children(p)
+    return ar, pe, pc, ps
+
+
+class MatrixBackgroundTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.ar, cls.pe, cls.pc, cls.ps = _cyclic_archive(matrix_background=True)
+        cls.bg = cls.ar.make_interface('background')
+
+    def _values(self, exchanges):
+        return {(x.flow['Name'], x.direction): x.value for x in exchanges}
+
+    def test_interface(self):
+        self.assertIsInstance(self.bg, MatrixBackgroundImplementation)
+        plain = _cyclic_archive()[0]
+        self.assertNotIsInstance(plain.make_interface('background'), MatrixBackgroundImplementation)
+        self.assertIsInstance(plain.make_interface('background'), BackgroundImplementation)
+
+    def test_dependencies(self):
+        deps = list(self.bg.dependencies(self.pe.external_ref))
+        self.assertEqual(len(deps), 1)
+        self.assertEqual(deps[0].termination, self.pc.external_ref)
+        self.assertEqual(self._values(deps), {('coal', 'Input'): 0.5})
+        self.assertEqual(self._values(self.bg.dependencies(self.pc.external_ref)), {('electricity', 'Input'): 0.1})
+        self.assertEqual([x.process for x in self.bg.consumers(self.pc.external_ref)], [self.pe])
+
+    def test_emissions(self):
+        self.assertEqual(self._values(self.bg.emissions(self.pc.external_ref)), {('methane', 'Output'): 0.2})
+        self.assertEqual(len(list(self.bg.cutoffs(self.pc.external_ref))), 0)
+
+    def test_scc(self):
+        self.assertTrue(self.bg.is_in_scc(self.pe.external_ref))
+        self.assertTrue(self.bg.is_in_scc(self.pc.external_ref))
+        self.assertFalse(self.bg.is_in_scc(self.ps.external_ref))
+        self.assertEqual(self.ar.bm.n_factorized, 2)
+
+    def test_acyclic_factors(self):
+        self.bg.check_bg()
+        bm = self.ar.bm
+        bm.solve(np.zeros(bm.n_products))
+        for seg, lu in bm._factors:
+            if seg.cyclic:
+                continue
+            size = seg.stop - seg.start
+            self.assertEqual(lu.L.nnz, size)  # L = I: solving is back-substitution with U
+            self.assertListEqual(lu.perm_r.tolist(), list(range(size)))
+            self.assertListEqual(lu.perm_c.tolist(), list(range(size)))
+
+    def test_lci(self):
+        lci = self._values(self.bg.lci(self.pe.external_ref))
+        self.assertAlmostEqual(lci[('carbon dioxide', 'Output')], 1.0 / 0.95)
+        self.assertAlmostEqual(lci[('methane', 'Output')], 0.1 / 0.95)
+        smelting = self._values(self.bg.lci(self.ps.external_ref))
+        for k, v in lci.items():
+            self.assertAlmostEqual(smelting[k], 2.0 * v)
+
+    def test_sys_lci(self):
+        """
+        sys_lci(dependencies) + emissions should equal lci
+        """
+        sys = self._values(self.bg.sys_lci(self.bg.dependencies(self.pe.external_ref)))
+        for x in self.bg.emissions(self.pe.external_ref):
+            k = (x.flow['Name'], x.direction)
+            sys[k] = sys.get(k, 0.0) + x.value
+        lci = self._values(self.bg.lci(self.pe.external_ref))
+        self.assertEqual(set(sys.keys()), set(lci.keys()))
+        for k, v in lci.items():
+            self.assertAlmostEqual(sys[k], v)
+
+    def test_sys_lci_batch(self):
+        demands = [list(self.bg.dependencies(p.external_ref)) for p in (self.pe, self.pc, self.ps)]
+        for demand, lci in zip(demands, self.bg.sys_lci_batch(demands)):
+            batch = self._values(lci)
+            single = self._values(self.bg.sys_lci(demand))
+            self.assertEqual(set(batch.keys()), set(single.keys()))
+            for k, v in single.items():
+                self.assertAlmostEqual(batch[k], v)
+
+    def test_sys_lcia_batch(self):
+        qi = self.ar.make_interface('quantity')
+        gwp = LcQuantity.new('Global warming', 'kg CO2 eq', Method='test')
+        self.ar.add(gwp)
+        for f in self.ar.entities_by_type('flow'):
+            if f['Name'] == 'carbon dioxide':
+                qi.characterize(f.name, f.reference_entity, gwp, 1.0, context=f.context)
+            elif f['Name'] == 'methane':
+                qi.characterize(f.name, f.reference_entity, gwp, 25.0, context=f.context)
+        demands = [list(self.bg.dependencies(p.external_ref)) for p in (self.pe, self.pc, self.ps)]
+        for demand, res in zip(demands, self.bg.sys_lcia_batch(demands, gwp)):
+            self.assertAlmostEqual(res.total(), gwp.do_lcia(self.bg.sys_lci(demand)).total())
+
+        bm = self.ar.bm
+        js = [bm.column(p.external_ref, next(p.references()).flow.external_ref) for p in (self.pe, self.ps)]
+        d = csc_matrix((np.ones(2), (js, [0, 1])), shape=(bm.n_products, 2))
+        res = self.bg.sys_lcia_batch(d, gwp)
+        self.assertEqual([c.entity for c in res[1].components()], [self.ps])
+        self.assertAlmostEqual(res[0].total(), (1.0 + 0.1 * 25.0) / 0.95)
+        self.assertAlmostEqual(res[1].total(), 2.0 * res[0].total())
+
+        res = self.bg.sys_lcia_batch(d, gwp, processes=[self.ps, self.pc.external_ref])
+        self.assertEqual([c.entity for c in res[0].components()], [self.ps])
+        self.assertEqual([c.entity for c in res[1].components()], [self.pc])
+        self.assertAlmostEqual(res[1].total(), 2.0 * res[0].total())
+        with self.assertRaises(ValueError):
+            self.bg.sys_lcia_batch(d, gwp, processes=[self.ps])
+
+    def test_sys_lcia_batch_lazy(self):
+        """
+        The exterior exchanges are only created when a result's details, cutoffs, zeros or errors are requested
+        """
+        qi = self.ar.make_interface('quantity')
+        gwp = LcQuantity.new('Fossil carbon', 'kg CO2', Method='test')
+        self.ar.add(gwp)
+        for f in self.ar.entities_by_type('flow'):
+            if f['Name'] == 'carbon dioxide':
+                qi.characterize(f.name, f.reference_entity, gwp, 1.0, context=f.context)
+        demands = [list(self.bg.dependencies(p.external_ref)) for p in (self.pe, self.pc, self.ps)]
+        for demand, res in zip(demands, self.bg.sys_lcia_batch(demands, gwp)):
+            single = gwp.do_lcia(self.bg.sys_lci(demand))
+            for c in res.components():
+                self.assertEqual(c._details, [])
+            self.assertAlmostEqual(res.total(), single.total())
+            self.assertEqual(sorted((d.flowable, round(d.result, 12)) for d in res.details()),
+                             sorted((d.flowable, round(d.result, 12)) for d in single.details()))
+            self.assertEqual(sorted(x.flow['Name'] for x in res.cutoffs()),
+                             sorted(x.flow['Name'] for x in single.cutoffs()))
+            self.assertEqual(sorted(x.flow['Name'] for x in res.zeros()),
+                             sorted(x.flow['Name'] for x in single.zeros()))
+            self.assertEqual(sorted(d.exchange.flow['Name'] for d in res.errors()),
+                             sorted(d.exchange.flow['Name'] for d in single.errors()))
+            self.assertGreater(len(list(res.details())), 0)
+            self.assertGreater(len(list(res.errors())), 0)
+            self.assertAlmostEqual(res.total(), single.total())
+
+        group = lambda x: x.flow['Name']
+        for demand, res in zip(demands, self.bg.sys_lcia_batch(demands, gwp, group=group)):
+            single = gwp.do_lcia(self.bg.sys_lci(demand), group=group)
+            self.assertEqual(sorted(res.keys()), sorted(single.keys()))
+            self.assertAlmostEqual(res.total(), single.total())
+
+
+class MatrixBackgroundCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._cache = os.path.join(self._dir.name, 'test.background')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_cache(self):
+        ar, pe, pc, ps = _cyclic_archive()
+        built = BackgroundMatrix(ar, cache=self._cache)
+        self.assertTrue(os.path.exists(os.path.join(self._cache, 'header.json')))
+        self.assertEqual(built._inverses, {})
+
+        loaded = BackgroundMatrix(ar, cache=self._cache)
+        self.assertEqual(len(loaded._inverses), 1)
+        self.assertFalse(loaded.A.data.flags.writeable)  # mapped read-only from the cache
+        self.assertEqual(loaded.n_factorized, 2)
+        for p in (pe, pc, ps):
+            j = built.column(p.external_ref, next(p.references()).flow.external_ref)
+            self.assertEqual(loaded.column(p.external_ref, next(p.references()).flow.external_ref), j)
+            self.assertTrue(np.allclose(loaded.activity(j), built.activity(j)))
+            self.assertEqual(dict(loaded.lci(j)).keys(), dict(built.lci(j)).keys())
+
+    def test_stale(self):
+        ar, pe, pc, ps = _cyclic_archive()
+        BackgroundMatrix(ar, cache=self._cache)
+        p = LcProcess.new('more smelting')
+        p.add_exchange(next(ps.references()).flow, 'Output', value=1.0)
+        p.set_reference(next(ps.references()).flow, 'Output')
+        ar.add(p)
+        rebuilt = BackgroundMatrix(ar, cache=self._cache)
+        self.assertEqual(rebuilt.n_products, 4)
+        self.assertEqual(BackgroundMatrix(ar, cache=self._cache).n_products, 4)
+
+    def test_stale_value(self):
+        ar, pe, pc, ps = _cyclic_archive()
+        built = BackgroundMatrix(ar, cache=self._cache)
+        j = built.column(ps.external_ref, next(ps.references()).flow.external_ref)
+        elec = next(pe.references()).flow
+        pc.add_exchange(elec, 'Input', value=0.2, termination=pe.external_ref, add_dups=True)  # only a value changes
+        rebuilt = BackgroundMatrix(ar, cache=self._cache)
+        self.assertEqual(rebuilt._inverses, {})  # cache was not used
+        self.assertFalse(np.allclose(rebuilt.activity(j), built.activity(j)))
+        loaded = BackgroundMatrix(ar, cache=self._cache)
+        self.assertEqual(len(loaded._inverses), 1)
+        self.assertTrue(np.allclose(loaded.activity(j), rebuilt.activity(j)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from collections import namedtuple
+
+from ...archives import BasicArchive
+from ...lcia_engine import IPCC_2007_GWP
+from ...exchanges import ExchangeValue
+from ...entities.flows import new_flow
+from ..parallel_lcia import ParallelLciaRunner
+
+DummyProcess = namedtuple('DummyProcess', ('origin', 'uuid', 'external_ref', 'name'))
+
+ar = BasicArchive.from_file(IPCC_2007_GWP)
+mass = ar['Mass']
+air = ar.tm['air']
+gwp = ar['Global Warming Air']
+
+
+class _Target(object):
+    """
+    scores a dummy process that emits (index) kg of methane and 1 kg of CO2
+    """
+    @staticmethod
+    def sys_lcia(process, query_qty, **kwargs):
+        co2 = new_flow('carbon dioxide', mass, origin='test')
+        ch4 = new_flow('methane', mass, origin='test')
+        xs = [ExchangeValue(process, co2, 'Output', termination=air, value=1.0),
+              ExchangeValue(process, ch4, 'Output', termination=air, value=float(process.uuid))]
+        return query_qty.do_lcia(xs, **kwargs)
+
+
+class ParallelLciaTest(unittest.TestCase):
+    def setUp(self):
+        self.procs = [DummyProcess('test.null', str(i), 'proc %d' % i, 'proc %d' % i) for i in range(11)]
+
+    def test_parallel_order(self):
+        runner = ParallelLciaRunner(_Target(), [gwp], workers=2, shard_size=3)
+        results = list(runner.run(self.procs))
+        self.assertListEqual([p for p, _ in results], self.procs)
+        for i, (p, ress) in enumerate(results):
+            self.assertEqual(len(ress), 1)
+            self.assertEqual(ress[0]['process'], p.external_ref)
+            self.assertAlmostEqual(ress[0]['total'], 1.0 + 25.0 * i)
+        self.assertListEqual(sorted(t.shard for t in runner.timings), [0, 1, 2, 3])
+        self.assertEqual(sum(t.count for t in runner.timings), len(self.procs))
+
+    def test_serial_matches(self):
+        par = list(ParallelLciaRunner(_Target(), [gwp], workers=2, shard_size=4).run(self.procs))
+        ser = list(ParallelLciaRunner(_Target(), [gwp], shard_size=100).run(self.procs))
+        self.assertEqual(len(ser), len(par))
+        for (_, a), (_, b) in zip(par, ser):
+            self.assertAlmostEqual(a[0]['total'], b[0]['total'])
+
+
+if __name__ == '__main__':
+    unittest.main()
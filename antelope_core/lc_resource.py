@@ -141,6 +141,8 @@ class LcResource(object):
 
         if catalog is not None and os.path.exists(catalog.cache_file(self.source)):
             update_archive(self._archive, catalog.cache_file(self.source))
+        if catalog is not None and self._archive.init_args.get('matrix_background'):
+            self._archive.bm_cache = catalog.background_cache(self.source)
         self._static |= self._archive.static
         if self.static and self.ds_type.lower() != 'json':
             self._archive.load_all()  # static json archives are loaded on open- load_all() would be redundant
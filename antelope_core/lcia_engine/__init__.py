@@ -63,15 +63,14 @@ class LciaDb(Qdb):
             # raise AttributeError('Origin not set! %s' % entity)
         super(LciaDb, self)._ensure_valid_refs(entity)
 
-    def add(self, entity):
+    def _entity_key(self, entity):
         """
-        Add entity to archive, by link instead of external ref. If the entity has a uuid and uuid does not already
-        exist, add it.  If the UUID does already exist, warn.
+        Entities are added to the archive by link instead of external ref. If the entity has a uuid and uuid does not
+        already exist, add it.  If the UUID does already exist, warn.
         :param entity:
         :return:
         """
-        self._add(entity, entity.link)
-        self._add_to_tm(entity)
+        return entity.link
 
     def _add_to_tm(self, entity, merge_strategy=None):
         if entity.entity_type == 'quantity':
@@ -0,0 +1,215 @@
+"""
+A persistent store for quantity relation results, so that CFs derived in one session can be reused by the next.
+
+The cache is a SQLite file, normally located in the catalog's cache directory (see StaticCatalog.enable_cf_cache()).
+Each entry records the outcome of QuantityImplementation.quantity_relation() for a given flowable, canonical ref
+quantity, canonical query quantity, canonical context and locale: either a flattened conversion (value, context,
+locale and origin of the CF that was found) or the fact that no factors were found.  Conversion errors are not
+stored.
+
+Every entry is stamped with the term manager's content stamp for the query quantity (see
+TermManager.content_stamp()) and with the synonym state of the flowable (see TermManager.flowable_stamp()).  An entry
+whose stamp does not match the current stamp is ignored and eventually overwritten, so the cache invalidates itself
+when a quantity's CFs change, or when a synonym changes the flowable that a name refers to.
+
+The SQLite connection is opened on first use in each process, and is closed before the process forks, so that
+worker processes (e.g. those of ParallelLciaRunner) open their own.  It may be shared among threads.
+"""
+
+import atexit
+import os
+import sqlite3
+import threading
+import weakref
+
+from antelope import NoFactorsFound
+
+from ..characterizations import QRResult
+from ..contexts import NullContext
+
+
+_SCHEMA = '''CREATE TABLE IF NOT EXISTS cfs (
+    flowable TEXT NOT NULL,
+    ref_q TEXT NOT NULL,
+    query_q TEXT NOT NULL,
+    context TEXT NOT NULL,
+    locale TEXT NOT NULL,
+    opts TEXT NOT NULL,
+    stamp TEXT NOT NULL,
+    found INTEGER NOT NULL,
+    value,
+    cf_context TEXT,
+    cf_locale TEXT,
+    cf_origin TEXT,
+    PRIMARY KEY (flowable, ref_q, query_q, context, locale, opts))'''
+
+
+def _close_before_fork(cache):
+    ref = weakref.ref(cache)
+
+    def _close():
+        c = ref()
+        if c is not None:
+            c._release()
+    return _close
+
+
+class PersistentCFCache(object):
+    """
+    SQLite-backed store of quantity relation results.  Writes are committed in batches; call flush() to commit
+    pending writes (this is also done at interpreter exit).
+    """
+    def __init__(self, filename, term_manager, batch=500):
+        """
+        :param filename: path to the SQLite file (created if absent)
+        :param term_manager: the term manager whose contents the entries are stamped against
+        :param batch: [500] number of writes between commits
+        """
+        self._filename = filename
+        self._tm = term_manager
+        self._batch = batch
+        self._pending = 0
+        self.hits = 0
+        self.misses = 0
+        self._conn_ = None
+        self._pid = None
+        self._lock = threading.RLock()
+        atexit.register(self.flush)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(before=_close_before_fork(self))
+
+    @property
+    def _conn(self):
+        """
+        The connection belonging to the current process, opened if necessary
+        """
+        if self._pid != os.getpid():
+            # a connection inherited from a parent process must not be used (or closed) by the child
+            self._lock = threading.RLock()
+            self._pending = 0
+            self._conn_ = sqlite3.connect(self._filename, check_same_thread=False)
+            self._conn_.execute('PRAGMA journal_mode=WAL')
+            self._conn_.execute(_SCHEMA)
+            self._conn_.commit()
+            self._pid = os.getpid()
+        return self._conn_
+
+    def _release(self):
+        """
+        Commit and close the connection, if this process has one.  It is reopened on next use.
+        """
+        if self._conn_ is not None and self._pid == os.getpid():
+            with self._lock:
+                self._conn_.commit()
+                self._conn_.close()
+        self._conn_ = None
+        self._pid = None
+        self._pending = 0
+
+    @property
+    def filename(self):
+        return self._filename
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM cfs').fetchone()[0]
+
+    @staticmethod
+    def _key(fb, rq, qq, cx, locale, **kwargs):
+        if cx is None:
+            cx_name = '*'
+        else:
+            cx_name = cx.fullname
+        opts = ';'.join('%s=%s' % (k, kwargs[k]) for k in sorted(kwargs))
+        return str(fb), rq.link, qq.link, cx_name, locale, opts
+
+    def _stamp(self, fb, qq):
+        return '%s:%s' % (self._tm.content_stamp(qq), self._tm.flowable_stamp(str(fb)))
+
+    def get(self, fb, rq, qq, cx, locale, **kwargs):
+        """
+        Retrieve a stored quantity relation result.
+        :param fb: flowable
+        :param rq: canonical ref quantity
+        :param qq: canonical query quantity
+        :param cx: canonical context or None
+        :param locale:
+        :param kwargs: other arguments that influence the result (dist, strategy, allow_proxy)
+        :return: a QuantityConversion; raises NoFactorsFound if that outcome was stored; KeyError on a miss
+        """
+        from ..implementations.quantity import QuantityConversion  # circular import
+        key = self._key(fb, rq, qq, cx, locale, **kwargs)
+        with self._lock:
+            row = self._conn.execute('SELECT stamp, found, value, cf_context, cf_locale, cf_origin FROM cfs WHERE '
+                                     'flowable=? AND ref_q=? AND query_q=? AND context=? AND locale=? AND opts=?',
+                                     key).fetchone()
+        if row is None or row[0] != self._stamp(fb, qq):
+            self.misses += 1
+            raise KeyError(key)
+        stamp, found, value, cf_cx, cf_loc, cf_origin = row
+        if not found:
+            self.hits += 1
+            raise NoFactorsFound
+        if cf_cx is None:
+            cf_cx = NullContext
+        else:
+            cf_cx = self._tm[cf_cx]
+            if cf_cx is None:
+                self.misses += 1
+                raise KeyError(key)
+        self.hits += 1
+        qrr = QRResult(str(fb), rq, qq, cf_cx, cf_loc, cf_origin, value)
+        return QuantityConversion(qrr, query=qq, context=cx or NullContext)
+
+    def _put(self, key, stamp, found, value=None, cf_cx=None, cf_loc=None, cf_origin=None):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO cfs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               key + (stamp, found, value, cf_cx, cf_loc, cf_origin))
+            self._pending += 1
+            if self._pending >= self._batch:
+                self.flush()
+
+    def put(self, result, fb, rq, qq, cx, locale, **kwargs):
+        """
+        Store a quantity relation result
+        :param result: a QuantityConversion or QRResult
+        :param fb:
+        :param rq:
+        :param qq:
+        :param cx:
+        :param locale:
+        :param kwargs:
+        :return:
+        """
+        cf_cx = result.context
+        if cf_cx is None or cf_cx is NullContext:
+            cf_cx = None
+        else:
+            cf_cx = cf_cx.fullname
+        self._put(self._key(fb, rq, qq, cx, locale, **kwargs), self._stamp(fb, qq), 1,
+                  value=result.value, cf_cx=cf_cx, cf_loc=result.locale, cf_origin=result.origin)
+
+    def put_none(self, fb, rq, qq, cx, locale, **kwargs):
+        """
+        Store the fact that no factors were found
+        """
+        self._put(self._key(fb, rq, qq, cx, locale, **kwargs), self._stamp(fb, qq), 0)
+
+    def flush(self):
+        if self._pending and self._pid == os.getpid():
+            with self._lock:
+                self._conn_.commit()
+                self._pending = 0
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM cfs')
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self):
+        atexit.unregister(self.flush)
+        self._release()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self)}
@@ -41,10 +41,16 @@ class CLookup(object):
     associated with a single quantity and a specific flowable.  The query then provides the compartment and returns
     either: a set of best-available characterizations; a single characterization according to a selection rule; or a
     characterization factor (float) depending on which method is used.
+
+    The outcome of each find() query is compiled into a table keyed by (context, dist, return_first, origin), so that
+    repeated lookups of the same context require only one dict access.  The table is cleared whenever a CF is added
+    to or removed from the CLookup, and whenever the context hierarchy changes (see Context.hierarchy_version).
     """
     def __init__(self):
         self._dict = dict()
         self._q = None
+        self._compiled = dict()
+        self._version = Context.hierarchy_version
 
     def __repr__(self):
         return '%s(%s: %d contexts)' % (self.__class__.__name__, self._q, len(self._dict))
@@ -85,12 +91,14 @@ class CLookup(object):
                 raise DuplicateOrigin(value.origin)
             '''
             self._dict[key].add(value)
+            self._compiled.clear()
         else:
             raise ValueError('Context is not valid: %s (%s)' % (key, type(key)))
 
     def remove(self, value):
         key = value.context
         self._dict[key].remove(value)
+        self._compiled.clear()
 
     def keys(self):
         return self._dict.keys()
@@ -106,6 +114,18 @@ class CLookup(object):
         else:
             return [k for k in self.__getitem__(item) if k.origin == origin]
 
+    def _cf_key(self, cf):
+        """
+        The value stored in the compiled table for a given CF
+        """
+        return cf
+
+    def _key_cf(self, key):
+        """
+        The CF corresponding to a value stored in the compiled table
+        """
+        return key
+
     def find(self, item, dist=1, return_first=True, origin=None):
         """
         Hunt for a matching compartment. 'dist' param controls the depth of search:
@@ -121,6 +141,23 @@ class CLookup(object):
         :param origin: [None] if present, only return cfs whose origins match the specification
         :return: a list of characterization factors that meet the query criteria, ordered by increasing dist
         """
+        if not isinstance(item, Context):
+            return []
+        if self._version != Context.hierarchy_version:
+            self._compiled.clear()
+            self._version = Context.hierarchy_version
+        key = (item, dist, return_first, origin)
+        try:
+            return [self._key_cf(k) for k in self._compiled[key]]
+        except KeyError:
+            results = self._find(item, dist=dist, return_first=return_first, origin=origin)
+            self._compiled[key] = tuple(self._cf_key(cf) for cf in results)
+            return results
+
+    def _find(self, item, dist=1, return_first=True, origin=None):
+        """
+        Performs the context walk described in find()
+        """
         #!TODO: This should be performed by the term manager, not the CLookup (though that is the whole point of CLookup)
         if not isinstance(item, Context):
             return []
@@ -195,7 +232,7 @@ class SCLookup(CLookup):
         if key is None:
             key = value.context
         if key in self._dict and len(self._dict[key]) > 0:
-            existing = list(self._dict[key])[0]
+            existing = list(self[key])[0]
             if existing.value == value.value:
                 return
             print('Collision with context: %s' % repr(key))
@@ -203,3 +240,72 @@ class SCLookup(CLookup):
             print('%s current' % repr(existing))
             raise FactorCollision('This context already has a CF defined!')
         super(SCLookup, self).add(value, key)
+
+
+class ColumnarCLookup(CLookup):
+    """
+    A CLookup that holds integer CF ids and keeps the characterizations themselves in a ColumnarCFStore.
+    Characterization objects are created by the store when they are retrieved; the compiled find() table also holds
+    ids, so that it does not keep materialized characterizations alive.
+    """
+    def __init__(self, store):
+        super(ColumnarCLookup, self).__init__()
+        self._store = store
+
+    def _cf_key(self, cf):
+        return self._store.cf_id(cf)
+
+    def _key_cf(self, key):
+        return self._store.get(key)
+
+    def __getitem__(self, item):
+        if item is None:
+            item = NullContext
+        if not isinstance(item, Context):
+            raise TypeError('Supplied CLookup key is not a Context: %s (%s)' % (item, type(item)))
+        if item in self._dict:
+            return {self._store.get(i) for i in self._dict[item]}
+        return set()
+
+    def add(self, value, key=None):
+        if key is None:
+            key = value.context
+        if isinstance(key, Context):
+            self._check_qty(value)
+            if key not in self._dict:
+                self._dict[key] = set()
+            self._dict[key].add(self._store.add(value))
+            self._compiled.clear()
+        else:
+            raise ValueError('Context is not valid: %s (%s)' % (key, type(key)))
+
+    def remove(self, value):
+        key = value.context
+        self._dict[key].remove(self._store.cf_id(value))
+        self._compiled.clear()
+
+    def cfs(self):
+        for c in self._dict.keys():
+            for cf in self[c]:
+                yield cf
+
+    def serialize(self, values=False):
+        return {str(c): self._ser_set(self[c], values=values) for c in self._dict.keys()}
+
+    def serialize_for_origin(self, origin, values=False):
+        cxs = dict()
+        for c in self._dict.keys():
+            try:
+                cf_filt = next(cf for cf in self[c] if cf.origin == origin)
+            except StopIteration:
+                continue
+            cxs[str(c)] = cf_filt.serialize(values=values, concise=True)
+        return cxs
+
+
+class ColumnarSCLookup(SCLookup, ColumnarCLookup):
+    """
+    Strict CLookup with columnar storage
+    """
+    pass
+
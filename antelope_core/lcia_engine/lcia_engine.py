@@ -1,9 +1,11 @@
 from collections import defaultdict
+from functools import partial
 import os
 
 from ..archives.term_manager import TermManager, NoFQEntry
+from ..archives.cf_store import Interner
 from ..contexts import Context, NullContext
-from .clookup import CLookup, SCLookup
+from .clookup import CLookup, SCLookup, ColumnarCLookup, ColumnarSCLookup
 
 from antelope.flows.flow import flowname_is_biogenic
 
@@ -78,7 +80,7 @@ class LciaEngine(TermManager):
         :param contexts:
         :param flowables:
         :param strict_clookup: [True] whether to prohibit multiple CFs for each quantity / flowable / context tuple
-        :param kwargs: from TermManager: quiet, merge_strategy
+        :param kwargs: from TermManager: quiet, merge_strategy, columnar
         """
         if contexts is None:
             contexts = DEFAULT_CONTEXTS
@@ -88,8 +90,12 @@ class LciaEngine(TermManager):
         self._configure_flowables(flowables)
 
         # the CF lookup: allow hierarchical traversal over compartments [or, um, use a graph db..]
-        self._cl_typ = {True: SCLookup,
-                        False: CLookup}[strict_clookup]  #
+        if self._cf_store is None:
+            self._cl_typ = {True: SCLookup,
+                            False: CLookup}[strict_clookup]  #
+        else:
+            self._cl_typ = partial({True: ColumnarSCLookup,
+                                    False: ColumnarCLookup}[strict_clookup], self._cf_store)
         # another reverse mapping
         self._origins = set()
         self._fb_by_origin = defaultdict(set)  # maps origin to flowables having that origin
@@ -100,6 +106,12 @@ class LciaEngine(TermManager):
 
         self._factors_for_later = defaultdict(bool)
 
+        # integer ids for canonical flowables and contexts, with per-term memos
+        self._fb_ids = Interner()
+        self._cx_ids = Interner()
+        self._fb_memo = dict()
+        self._cx_memo = dict()
+
     def get_canonical(self, quantity):
         """
         We override this because here we are using canonical quantities and 'kg' is not a canonical quantity, but it
@@ -140,6 +152,78 @@ class LciaEngine(TermManager):
                 return self.__getitem__(item[1:])
             return NullContext
 
+    def flowable_id(self, term):
+        """
+        Return a stable integer id for the canonical flowable matching the given term.  Results are memoized by term
+        until flowables are merged.
+        :param term: a flowable synonym
+        :return: an int; raises KeyError if the term is not known
+        """
+        try:
+            return self._fb_memo[term]
+        except KeyError:
+            i = self._fb_ids.id(self._fm[term])
+            self._fb_memo[term] = i
+            return i
+        except TypeError:  # unhashable term
+            return self._fb_ids.id(self._fm[term])
+
+    def flowable_by_id(self, i):
+        return self._fb_ids.term(i)
+
+    def context_id(self, cx):
+        """
+        Return a stable integer id for the canonical context matching the given term or foreign context, as found
+        by __getitem__ (so unmatched contexts map to the NullContext's id).  Matches are memoized by term until new
+        contexts or context hints are added.
+        :param cx: a context term, tuple, or Context
+        :return: an int, or None if cx is None ('unspecified')
+        """
+        if cx is None:
+            return None
+        try:
+            return self._cx_memo[cx]
+        except KeyError:
+            c = self[cx]
+            i = self._cx_ids.id(c)
+            if c is not NullContext:  # an unmatched term may match later
+                self._cx_memo[cx] = i
+            return i
+        except TypeError:
+            return self._cx_ids.id(self[cx])
+
+    def context_by_id(self, i):
+        if i is None:
+            return None
+        return self._cx_ids.term(i)
+
+    def factors_for_flowable(self, flowable, quantity=None, context=None, **kwargs):
+        """
+        Uses the memoized flowable and context ids to skip repeated term matching
+        :param flowable:
+        :param quantity:
+        :param context:
+        :param kwargs:
+        :return:
+        """
+        try:
+            fb = self._fb_ids.term(self.flowable_id(flowable))
+        except KeyError:
+            return
+        cx = self.context_by_id(self.context_id(context))
+        if quantity is None:
+            for qq in self._fq_map[fb]:
+                for cf in self._factors_for_flowable(fb, qq, cx, **kwargs):
+                    yield cf
+        else:
+            qq = self._canonical_q(quantity)
+            for cf in self._factors_for_flowable(fb, qq, cx, **kwargs):
+                yield cf
+
+    def _merge_terms(self, dominant, *syns):
+        self._fb_memo.clear()
+        return super(LciaEngine, self)._merge_terms(dominant, *syns)
+
     def apply_hints(self, names, hints):
         """
         Hints should be
@@ -149,6 +233,7 @@ class LciaEngine(TermManager):
         :return:
         """
         orgs = list(names)
+        self._cx_memo.clear()
         for hint_type, term, canonical in hints:
             if term in self.synonyms(canonical):
                 continue
@@ -302,7 +387,11 @@ class LciaEngine(TermManager):
         :param comps:
         :return:
         """
-        return self._cm.add_compartments(comps)
+        n = len(self._cm)
+        cx = self._cm.add_compartments(comps)
+        if len(self._cm) != n:
+            self._cx_memo.clear()  # new contexts may match terms that were previously unmatched
+        return cx
 
     '''  # This doesn't do anything useful
     def add_subcontext(self, context, prefix, sub, origin=None):
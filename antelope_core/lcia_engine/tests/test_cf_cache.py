@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+from .. import IPCC_2007_GWP
+from ..cf_cache import PersistentCFCache
+from ...archives import BasicArchive
+from .test_ipcc import _batch_gen
+
+
+def _session(filename):
+    ar = BasicArchive.from_file(IPCC_2007_GWP)
+    cache = PersistentCFCache(filename, ar.tm)
+    ar.tm.set_cf_cache(cache)
+    return ar, cache
+
+
+class PersistentCFCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._file = os.path.join(self._dir.name, 'cf_cache.sqlite')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_warm_restart(self):
+        ar, cache = _session(self._file)
+        cold = ar['Global Warming Air'].do_lcia(_batch_gen())
+        self.assertGreater(cache.misses, 0)
+        self.assertGreater(len(cache), 0)
+        cache.close()
+
+        ar, cache = _session(self._file)
+        warm = ar['Global Warming Air'].do_lcia(_batch_gen())
+        self.assertEqual(cache.misses, 0)
+        self.assertGreater(cache.hits, 0)
+        self.assertAlmostEqual(warm.total(), cold.total())
+        self.assertEqual(len(list(warm.cutoffs())), len(list(cold.cutoffs())))
+        cache.close()
+
+    def test_stamp_invalidation(self):
+        ar, cache = _session(self._file)
+        gwp = ar['Global Warming Air']
+        gwp.do_lcia(_batch_gen())
+        cache.close()
+
+        ar, cache = _session(self._file)
+        gwp = ar['Global Warming Air']
+        ar.tm.add_characterization('water', ar['Mass'], gwp, 0.5, context='air')
+        res = gwp.do_lcia(_batch_gen())
+        self.assertGreater(cache.misses, 0)
+        self.assertAlmostEqual(res.total(), 34.7 + 16 * 25 + 2.5 + 25 + 50)
+        cache.close()
+
+    def test_synonym_invalidation(self):
+        """
+        A stored 'no factors' result must not survive a synonym that maps the flowable to a characterized one
+        """
+        ar, cache = _session(self._file)
+        ar['Global Warming Air'].do_lcia(_batch_gen())
+        cache.close()
+
+        ar, cache = _session(self._file)
+        ar.tm.add_terms('flowable', 'carbon dioxide', 'water')
+        res = ar['Global Warming Air'].do_lcia(_batch_gen())
+        self.assertAlmostEqual(res.total(), 34.7 + 16 * 25 + 2.5 + 25 + 100)
+        cache.close()
+
+    def test_fork(self):
+        """
+        A process that inherits the cache opens its own connection
+        """
+        ar, cache = _session(self._file)
+        ar['Global Warming Air'].do_lcia(_batch_gen())
+        cache.flush()
+        conn = cache._conn
+        cache._pid = -1  # as seen by a child process
+        self.assertIsNot(cache._conn, conn)
+        self.assertGreater(len(cache), 0)
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
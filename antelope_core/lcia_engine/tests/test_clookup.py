@@ -1,4 +1,5 @@
-from ..clookup import CLookup, SCLookup, FactorCollision, QuantityMismatch, DuplicateOrigin, Context
+from ..clookup import CLookup, SCLookup, ColumnarCLookup, FactorCollision, QuantityMismatch, DuplicateOrigin, Context
+from ...archives.cf_store import ColumnarCFStore
 from ...entities import LcFlow, LcQuantity
 from ...characterizations import Characterization
 import unittest
@@ -70,6 +71,42 @@ class SingleCfTest(unittest.TestCase):
         self.assertEqual(len(g.find(cx_rg, dist=1)), 0)
         self.assertListEqual(g.find(cx_rg, dist=2), [cg])
 
+    def test_compiled(self):
+        g = CLookup()
+        g.add(cfua)
+        self.assertListEqual(g.find(cx_air, dist=1), [cfua])
+        g.find(cx_air, dist=1).append(cfra)  # returned lists must not alias the compiled table
+        self.assertListEqual(g.find(cx_air, dist=1), [cfua])
+        g.add(cf)
+        self.assertListEqual(g.find(cx_air, dist=1), [cf])
+        g.remove(cf)
+        self.assertListEqual(g.find(cx_air, dist=1), [cfua])
+
+    def test_compiled_hierarchy(self):
+        cx_w = Context('to water')
+        cx_sw = Context('to surface water')
+        cf_sw = Characterization.from_flow(f1, q2, context=cx_sw, value=19)
+        g = CLookup()
+        g.add(cf_sw)
+        self.assertListEqual(g.find(cx_w, dist=1), [])
+        cx_sw.parent = cx_w  # re-parenting must invalidate compiled results
+        self.assertListEqual(g.find(cx_w, dist=1), [cf_sw])
+        cx_sw.parent = None
+        self.assertListEqual(g.find(cx_w, dist=1), [])
+
+    def test_compiled_columnar(self):
+        rq = LcQuantity.new('mass', 'kg', origin='test')
+        qq = LcQuantity.new('energy', 'MJ', origin='test')
+        fc = LcFlow.new('Columnar flow', rq, Compartment=['emissions', 'to air'])
+        store = ColumnarCFStore()
+        g = ColumnarCLookup(store)
+        g.add(Characterization.from_flow(fc, qq, context=cx_ua, value=58))
+        found = g.find(cx_air, dist=1)
+        self.assertEqual(len(found), 1)
+        self.assertEqual(found[0].value, 58)
+        self.assertTrue(all(isinstance(k, int) for v in g._compiled.values() for k in v))
+        self.assertEqual(g.find(cx_air, dist=1)[0].value, 58)
+
 
 if __name__ == '__main__':
     unittest.main()
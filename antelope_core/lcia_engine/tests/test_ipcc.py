@@ -21,12 +21,137 @@ def _exch_gen():
     yield ExchangeValue(p, ch4, 'Output', termination=air, value=16)
 
 
+def _batch_gen():
+    p = DummyEntity('test.null', '1234567', 'dummy process')
+    q = DummyEntity('test.null', '7654321', 'other process')
+    co2 = new_flow('carbon dioxide', mass, origin='test')
+    co2_dup = new_flow('carbon dioxide', mass, origin='test')
+    ch4 = new_flow('methane', mass, origin='test')
+    h2o = new_flow('water', mass, origin='test')
+    yield ExchangeValue(p, co2, 'Output', termination=air, value=34.7)
+    yield ExchangeValue(p, ch4, 'Output', termination=air, value=16)
+    yield ExchangeValue(q, co2_dup, 'Output', termination=air, value=2.5)
+    yield ExchangeValue(q, ch4, 'Input', termination=air, value=1.0)
+    yield ExchangeValue(q, h2o, 'Output', termination=air, value=100.0)
+
+
 class IpccTestCase(unittest.TestCase):
     def test_lcia(self):
         gwp = I['Global Warming Air']
         res = gwp.do_lcia(_exch_gen())
         self.assertEqual(res.total(), 34.7 + 16*25)
 
+    def test_lcia_batch(self):
+        gwp = I['Global Warming Air']
+        res = gwp.do_lcia(_batch_gen())
+        bat = gwp.do_lcia(_batch_gen(), batch=True)
+        self.assertAlmostEqual(bat.total(), res.total())
+        self.assertListEqual([str(k) for k in bat.keys()], [str(k) for k in res.keys()])
+        for k in res.keys():
+            self.assertAlmostEqual(bat[k].cumulative_result, res[k].cumulative_result)
+        self.assertEqual(len(list(bat.zeros())), len(list(res.zeros())))
+        self.assertEqual(len(list(bat.cutoffs())), len(list(res.cutoffs())))
+        self.assertEqual(len(list(bat.details())), 4)
+        self.assertSetEqual({d.result for d in bat.details()}, {d.result for d in res.details()})
+
+    def test_lcia_batch_flow_cache(self):
+        """
+        Distinct flows are not merged in batch: each flow's own cached characterization is used, as in do_lcia()
+        """
+        gwp = I['Global Warming Air']
+        exchs = list(_batch_gen())
+        co2, ch4, co2_dup = exchs[0].flow, exchs[1].flow, exchs[2].flow
+        co2_dup._chars_seen[gwp, air, 'GLO'] = ch4.lookup_cf(gwp, air, 'GLO')  # a stale or overridden entry
+        res = gwp.do_lcia(exchs)
+        bat = gwp.do_lcia(exchs, batch=True)
+        self.assertAlmostEqual(res.total(), gwp.do_lcia(_batch_gen()).total() + 2.5 * (25 - 1))
+        self.assertAlmostEqual(bat.total(), res.total())
+        self.assertTrue(co2.is_seen(gwp, context=air, locale='GLO'))
+
+    def test_lcia_many(self):
+        gwp = I['Global Warming Air']
+        qi = I.make_interface('quantity')
+        ch4 = qi.new_quantity('Methane potential', 'kg CH4-eq')
+        qi.characterize('methane', mass, ch4, 1.0, context='air')
+        ress = qi.do_lcia_many([gwp, ch4], _batch_gen())
+        self.assertEqual(len(ress), 2)
+        for q, bat in zip([gwp, ch4], ress):
+            res = q.do_lcia(_batch_gen())
+            self.assertIs(bat.quantity, q)
+            self.assertAlmostEqual(bat.total(), res.total())
+            self.assertListEqual([str(k) for k in bat.keys()], [str(k) for k in res.keys()])
+            self.assertEqual(len(list(bat.zeros())), len(list(res.zeros())))
+            self.assertEqual(len(list(bat.cutoffs())), len(list(res.cutoffs())))
+            self.assertSetEqual({d.result for d in bat.details()}, {d.result for d in res.details()})
+
+    def test_lcia_many_shares_flow_cache(self):
+        gwp = I['Global Warming Air']
+        qi = I.make_interface('quantity')
+        exchs = list(_exch_gen())
+        for x in exchs:
+            self.assertFalse(x.flow.is_seen(gwp, context=air, locale='GLO'))
+        many = qi.do_lcia_many([gwp], exchs)[0]
+        for x in exchs:
+            self.assertTrue(x.flow.is_seen(gwp, context=air, locale='GLO'))  # looked up via Flow.lookup_cf()
+        self.assertAlmostEqual(many.total(), gwp.do_lcia(exchs).total())
+
+    def test_lcia_many_resolves_once(self):
+        """
+        Each distinct exchange's flowable terms are resolved once for all quantities
+        """
+        gwp = I['Global Warming Air']
+        qi = I.make_interface('quantity')
+        ch4 = qi.new_quantity('Methane potential', 'kg CH4-eq')
+        qi.characterize('methane', mass, ch4, 1.0, context='air')
+        calls = []
+        info = qi._get_flowable_info
+
+        def _counting(*args, **kwargs):
+            calls.append(args[0])
+            return info(*args, **kwargs)
+
+        qi._get_flowable_info = _counting
+        exchs = list(_batch_gen())
+        ress = qi.do_lcia_many([gwp, ch4], exchs)
+        self.assertListEqual(sorted(calls), ['carbon dioxide', 'carbon dioxide', 'methane', 'water'])
+        for bat in ress:
+            for x in exchs:
+                self.assertTrue(x.flow.is_seen(bat.quantity, context=air, locale='GLO'))
+            self.assertAlmostEqual(bat.total(), bat.quantity.do_lcia(exchs).total())
+        calls.clear()
+        qi.do_lcia_many([gwp, ch4], exchs)  # answered from the flows' caches
+        self.assertListEqual(calls, [])
+
+    def test_quantity_conversions_many(self):
+        gwp = I['Global Warming Air']
+        qi = I.make_interface('quantity')
+        flows = ['carbon dioxide', 'methane', 'water', 'methane', 'carbon dioxide']
+        many = qi.quantity_conversions_many(flows, gwp, ref_quantity=mass, context='air')
+        self.assertEqual(len(many), len(flows))
+        for f, res in zip(flows, many):
+            one = qi.quantity_conversions(f, gwp, ref_quantity=mass, context='air')
+            self.assertListEqual([[k.value for k in r] for r in res], [[k.value for k in r] for r in one])
+        self.assertEqual(many[1][0][0].value, 25.0)
+        self.assertEqual(many[2][0][0].value, 0.0)
+        self.assertEqual(many[4][0][0].value, 1.0)
+
+    def test_quantity_conversions_many_grouped(self):
+        gwp = I['Global Warming Air']
+        qi = I.make_interface('quantity')
+        calls = []
+        engine = qi._quantity_engine
+
+        def _counting(*args, **kwargs):
+            calls.append(args[0])
+            return engine(*args, **kwargs)
+
+        qi._quantity_engine = _counting
+        flows = ['carbon dioxide', 'methane', 'methane', 'carbon dioxide', 'methane']
+        many = qi.quantity_conversions_many(flows, gwp, ref_quantity=mass, context=['air'])  # unhashable context
+        self.assertListEqual(sorted(calls), ['carbon dioxide', 'methane'])
+        self.assertListEqual([res[0][0].value for res in many], [1.0, 25.0, 25.0, 1.0, 25.0])
+        self.assertIsNot(many[1][0], many[2][0])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -39,6 +39,18 @@ class LciaEngineTest(unittest.TestCase):
         self.lcia.tm.add_quantity(dup_mass)
         self.assertEqual(self.lcia.query.get_canonical(dummy), self.lcia.query.get_canonical('mass'))
 
+    def test_interning(self):
+        tm = self.lcia.tm
+        i = tm.flowable_id('carbon dioxide')
+        self.assertEqual(tm.flowable_id('124-38-9'), i)
+        self.assertIs(tm.flowable_by_id(i), tm.get_flowable('carbon dioxide'))
+        with self.assertRaises(KeyError):
+            tm.flowable_id('not a known flowable')
+        j = tm.context_id('emissions to air')
+        self.assertIs(tm.context_by_id(j), tm['emissions to air'])
+        self.assertEqual(tm.context_id(tm['emissions to air']), j)
+        self.assertIsNone(tm.context_id(None))
+
     def test_add_flow(self):
         """
         In this case, the flow's synonyms should be added. But dummy flows' links are not added to synonym set.
@@ -70,5 +82,32 @@ class LciaEngineTest(unittest.TestCase):
         self.assertEqual(len(c1.seq), 3)
 
 
+class ColumnarLciaEngineTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.lcia = LciaDb.new(columnar=True)
+
+    def test_cf(self):
+        rq = self.lcia.query.get_canonical('mass')
+        qq = self.lcia.query.get_canonical('volume')
+        self.lcia.query.characterize('water', rq, qq, .001)
+        self.assertEqual(self.lcia.query.quantity_relation('water', 'mass', 'volume', None).value, .001)
+        self.assertEqual(self.lcia.query.quantity_relation('water', 'volume', 'mass', None).value, 1000.0)
+
+    def test_columnar_store(self):
+        rq = self.lcia.query.get_canonical('mass')
+        qq = self.lcia.query.get_canonical('net calorific value')
+        self.lcia.tm.add_characterization('natural gas', rq, qq, 47.1, context='resources')
+        self.lcia.tm.add_characterization('natural gas', rq, qq, 45.0, context='resources', location='US')
+        cfs = list(self.lcia.tm.factors_for_flowable('natural gas', quantity=qq, context='resources'))
+        self.assertEqual(len(cfs), 1)
+        self.assertEqual(cfs[0]['US'], 45.0)
+        self.assertEqual(cfs[0].value, 47.1)
+        store = self.lcia.tm.cf_store
+        i = store.cf_id(cfs[0])
+        self.assertIs(store.get(i), cfs[0])
+        self.assertDictEqual(store.values(i), {'GLO': 47.1, 'US': 45.0})
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -9,6 +9,8 @@ from numbers import Number
 from math import isclose
 from collections import defaultdict
 
+import numpy as np
+
 #from .models import DetailedLciaResult as DetailedLciaResultModel
 # from lcatools.interfaces import to_uuid
 
@@ -40,6 +42,21 @@ def number(val):
         return '%10.10s' % '----'
 
 
+def dirn_adjust(sense, direction):
+    """
+    The sign applied to an exchange's result, given the sense of the characterization's context and the direction
+    of the exchange.
+    :param sense: the sense of a [canonical] context, or None
+    :param direction: exchange direction
+    :return: 1.0 or -1.0
+    """
+    if sense is None:
+        return 1.0
+    elif comp_dir(sense) == direction:
+        return 1.0
+    return -1.0
+
+
 class DetailedLciaResult(object):
     """
     Contains exchange, factor, result
@@ -69,11 +86,7 @@ class DetailedLciaResult(object):
 
     @property
     def _dirn_adjust(self):
-        if self._qr.context.sense is None:
-            return 1.0
-        elif comp_dir(self._qr.context.sense) == self._exchange.direction:
-            return 1.0
-        return -1.0
+        return dirn_adjust(self._qr.context.sense, self._exchange.direction)
 
     @property
     def is_null(self):
@@ -405,18 +418,46 @@ class AggregateLciaScore(object):
     """
     contains an entityId which should be either a process or a fragment (fragment stages show up as fragments??)
     The Aggregate score is constructed either from individual LCIA Details (exchange value x characterization factor)
-    or from summary results
+    or from summary results.  Details are stored in blocks of scores whose totals are known, and are only made into
+    DetailedLciaResult objects when they are requested (LciaDetails, details(), show_detailed_result()).
     """
     static = True
 
     def __init__(self, lc_result, entity):
         self.entity = entity
         self._lc = lc_result
-        self.LciaDetails = []  # what exactly was having unique membership protecting us from??
+        self._details = []  # what exactly was having unique membership protecting us from??
+        # scores not yet made into DetailedLciaResults, as blocks of (total, nonzero, exchanges, qrresults) in the
+        # order added: total is the block's unscaled score, and nonzero is whether any of its scores is nonzero.
+        # exchanges and qrresults are parallel lists; or exchanges is a function that returns both, and qrresults is
+        # None
+        self._blocks = []
+        self._scalars = ([], [], [])  # exchanges, qrresults, scores added one at a time, not yet made into a block
 
     def update_parent(self, lc_result):
         self._lc = lc_result
 
+    @property
+    def LciaDetails(self):
+        if self._blocks or self._scalars[0]:
+            self._materialize()
+        return self._details
+
+    def _materialize(self):
+        self._flush()
+        for total, nonzero, exchanges, qrresults in self._blocks:
+            if qrresults is None:
+                exchanges, qrresults = exchanges()
+            for x, qrr in zip(exchanges, qrresults):
+                self._details.append(DetailedLciaResult(self._lc, x, qrr))
+        self._blocks = []
+
+    def _flush(self):
+        exchanges, qrresults, scores = self._scalars
+        if exchanges:
+            self._blocks.append((sum(scores), any(scores), exchanges, qrresults))
+            self._scalars = ([], [], [])
+
     @property
     def name(self):
         if isinstance(self.entity, tuple):
@@ -431,13 +472,20 @@ class AggregateLciaScore(object):
 
     @property
     def cumulative_result(self):
-        if len(self.LciaDetails) == 0:
-            return 0.0
-        return sum([i.result for i in self.LciaDetails])
+        result = 0.0
+        if len(self._details) > 0:
+            result = sum([i.result for i in self._details])
+        self._flush()
+        if self._blocks:
+            result += sum(b[0] for b in self._blocks) * self._lc.scale
+        return result
 
     @property
     def is_null(self):
-        for i in self.LciaDetails:
+        self._flush()
+        if any(b[1] for b in self._blocks):
+            return False
+        for i in self._details:
             if not i.is_null:
                 return False
         return True
@@ -452,18 +500,47 @@ class AggregateLciaScore(object):
     '''
 
     def add_detailed_result(self, exchange, qrresult):
-        d = DetailedLciaResult(self._lc, exchange, qrresult)
-        '''
-        if d in self.LciaDetails:  # process.uuid, direction, flow.uuid are the same
-            if factor[location] != 0:
-                other = next(k for k in self.LciaDetails if k == d)
-                raise DuplicateResult('exchange: %s\n  factor: %s\nlocation: %s\nconflicts with %s' %
-                                      (exchange, factor, location, other.factor))
-            else:
-                # do nothing
-                return
-        '''
-        self.LciaDetails.append(d)
+        """
+        Add a single score.  The DetailedLciaResult is only created when the details are requested.
+        :param exchange:
+        :param qrresult:
+        :return:
+        """
+        exchanges, qrresults, scores = self._scalars
+        exchanges.append(exchange)
+        qrresults.append(qrresult)
+        if exchange.value is None or qrresult.value is None:
+            scores.append(0.0)
+        else:
+            scores.append(exchange.value * dirn_adjust(qrresult.context.sense, exchange.direction) * qrresult.value)
+
+    def add_deferred_results(self, exchanges, qrresults, values, signs, factors):
+        """
+        Add a block of scores computed in batch.  The DetailedLciaResult objects are only created when the
+        details are requested; the block's total is computed from the arrays when it is added.
+        :param exchanges: list of exchanges
+        :param qrresults: list of QRResult-like objects, one per exchange
+        :param values: array of exchange values (unscaled)
+        :param signs: array of direction adjustments (1.0 or -1.0)
+        :param factors: array of characterization values
+        :return:
+        """
+        self._flush()
+        scores = values * signs * factors
+        self._blocks.append((float(np.sum(scores)), bool(np.any(scores)), exchanges, qrresults))
+
+    def add_lazy_results(self, total, nonzero, build):
+        """
+        Add a block of scores whose total is already known.  Not even the exchanges are created until the details are
+        requested.
+        :param total: the unscaled sum of the scores
+        :param nonzero: whether any of the scores is nonzero
+        :param build: a function of no arguments that returns a list of exchanges and a list of QRResult-like objects,
+         one per exchange
+        :return:
+        """
+        self._flush()
+        self._blocks.append((float(total), bool(nonzero), build, None))
 
     def show(self, **kwargs):
         self.show_detailed_result(**kwargs)
@@ -570,6 +647,7 @@ class LciaResult(object):
         self._cutoffs = []
         self._errors = []
         self._zeros = []
+        self._builders = []  # functions that add cutoffs, zeros and errors when they are first requested
 
         self._private = private
         self._autorange = None
@@ -797,6 +875,52 @@ class LciaResult(object):
             self.add_component(key)
         self._LciaScores[key].add_detailed_result(exchange, qrresult)
 
+    def add_scores(self, key, exchanges, qrresults, values, signs, factors):
+        """
+        Batch version of add_score: adds a block of scores to a single component, deferring the creation of
+        DetailedLciaResult objects until details are requested.
+        :param key: component key
+        :param exchanges: list of exchanges
+        :param qrresults: list of QRResults, one per exchange
+        :param values: numpy array of exchange values
+        :param signs: numpy array of direction adjustments
+        :param factors: numpy array of characterization values
+        :return:
+        """
+        seen = set()
+        for qrresult in qrresults:
+            if id(qrresult) in seen:
+                continue
+            seen.add(id(qrresult))
+            if qrresult.query != self.quantity:
+                raise InconsistentQuantity('%s\nqrresult.quantity: %s\nself.quantity: %s' % (qrresult,
+                                                                                             qrresult.query,
+                                                                                             self.quantity))
+        if key not in self._LciaScores.keys():
+            self.add_component(key)
+        self._LciaScores[key].add_deferred_results(exchanges, qrresults, values, signs, factors)
+
+    def add_lazy_scores(self, key, total, nonzero, build, qrresults=()):
+        """
+        Lazy version of add_scores: adds a block of scores to a single component when only their total is known.
+        Neither the exchanges nor the DetailedLciaResult objects are created until details are requested.
+        :param key: component key
+        :param total: the unscaled sum of the scores
+        :param nonzero: whether any of the scores is nonzero
+        :param build: a function of no arguments that returns a list of exchanges and a list of QRResults, one per
+         exchange
+        :param qrresults: the distinct QRResults among the scores, to be checked against the result's quantity
+        :return:
+        """
+        for qrresult in qrresults:
+            if qrresult.query != self.quantity:
+                raise InconsistentQuantity('%s\nqrresult.quantity: %s\nself.quantity: %s' % (qrresult,
+                                                                                             qrresult.query,
+                                                                                             self.quantity))
+        if key not in self._LciaScores.keys():
+            self.add_component(key)
+        self._LciaScores[key].add_lazy_results(total, nonzero, build)
+
     def add_summary(self, key, entity, node_weight, unit_score):
         self._check_type('summary')
         summary = SummaryLciaResult(self, entity, node_weight, unit_score)
@@ -845,11 +969,26 @@ class LciaResult(object):
     def add_cutoff(self, exchange):
         self._cutoffs.append(exchange)
 
+    def add_builder(self, build):
+        """
+        Defer the creation of cutoffs, zeros and errors, for results computed in bulk (see do_lcia_block()).
+        :param build: a function of the LciaResult that adds them with add_cutoff(), add_zero() and add_error(). It
+         is called when any of them is first requested.
+        :return:
+        """
+        self._builders.append(build)
+
+    def _build(self):
+        builders, self._builders = self._builders, []
+        for build in builders:
+            build(self)
+
     def cutoffs(self):
         """
         Generates exchanges for which no factor was found during LCIA.
         :return:
         """
+        self._build()
         for x in self._cutoffs:
             yield x
 
@@ -862,6 +1001,7 @@ class LciaResult(object):
         Note the difference from self.failed_summaries, which reports summary scores that could not be added.
         :return:
         """
+        self._build()
         for x in self._errors:
             yield x
 
@@ -869,6 +1009,7 @@ class LciaResult(object):
         self._zeros.append(x)
 
     def zeros(self):
+        self._build()
         for x in self._zeros:
             yield x
 
@@ -995,6 +1136,7 @@ class LciaResult(object):
 
     def __str__(self):
         err = ''
+        self._build()
         if len(self._errors) > 0:
             err = '\n[%d Flow Conversion Errors]' % len(self._errors)
         return '%s %s%s' % (number(self.total()), self.quantity, err)
@@ -1194,4 +1336,5 @@ class LciaResult(object):
             return results, balance
 
     def serialize_components(self, detailed=False):
-        return [c.serialize(detailed=detailed) for c in sorted(self.components(), key=lambda x: x.result, reverse=True)]
+        return [c.serialize(detailed=detailed)
+                for c in sorted(self.components(), key=lambda x: x.cumulative_result, reverse=True)]
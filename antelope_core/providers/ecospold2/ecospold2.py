@@ -2,7 +2,9 @@
 Import ecospold2 files
 """
 
+import multiprocessing
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from time import time
 
 from lxml import objectify
@@ -25,6 +27,12 @@ from .master_data import EcoSpoldMasterData
 EcospoldExchange = namedtuple('EcospoldExchange', ('flow', 'direction', 'value', 'termination', 'is_ref', 'comment'))
 EcospoldLciaResult = namedtuple('EcospoldLciaResult', ('Method', 'Category', 'Indicator', 'score'))
 
+# plain-data forms of the XML content, which can be returned from worker processes (see _load_all)
+EcospoldFlowRecord = namedtuple('EcospoldFlowRecord', ('uid', 'elementary', 'name', 'cas', 'compartment',
+                                                       'unit_id', 'unit_name', 'synonyms'))
+EcospoldProcessRecord = namedtuple('EcospoldProcessRecord', ('uid', 'name', 'comment', 'geography', 'temporal',
+                                                             'classifications', 'parent'))
+
 
 def spold_reference_flow(filename):
     """
@@ -47,6 +55,40 @@ class EcospoldV2Error(Exception):
     pass
 
 
+_loader = None  # (archive, exchanges) -- inherited by forked workers during a parallel _load_all
+
+
+def _init_loader():
+    """
+    Give each worker its own handle on the data source, since compressed archives cannot share a file pointer
+    across processes
+    """
+    archive = _loader[0]
+    archive._archive = FileStore(archive.source, internal_prefix=archive.init_args.get('prefix'))
+
+
+def _parse_process(args):
+    """
+    Parse all the datasets of one process in a worker
+    :param args: process uuid, list of reference flow uuids
+    :return: list of (ref uuid, process record, list of exchange records or None)
+    """
+    archive, exchanges = _loader
+    process_uuid, ref_uuids = args
+    out = []
+    for ref_uuid in ref_uuids:
+        try:
+            o = archive.objectify(process_uuid, ref_uuid)
+        except KeyError:
+            raise FileNotFoundError
+        xrecs = None
+        if exchanges:
+            xrecs = [(archive._flow_record(exch), d, v, t, is_ref, c)
+                     for exch, d, v, t, is_ref, c in archive._read_exchanges(o, ref_uuid)]
+        out.append((ref_uuid, archive._process_record(o), xrecs))
+    return out
+
+
 def _add_syn_if(syn, synset):
     g = syn.strip()
     if g != '' and g != 'PSM':
@@ -207,8 +249,9 @@ class EcospoldV2Archive(LcArchive):
         :param exchange:
         :return:
         """
-        unitstring = exchange.unitName.text
-        unit_uuid = exchange.attrib['unitId']
+        return self._quantity_from_unit(exchange.attrib['unitId'], exchange.unitName.text)
+
+    def _quantity_from_unit(self, unit_uuid, unitstring):
         try_q = self[unit_uuid]
         if try_q is None:
             ref_unit, _ = self._create_unit(unitstring)
@@ -235,47 +278,71 @@ class EcospoldV2Archive(LcArchive):
         else:
             return []
 
-    def _create_flow(self, exchange):
-        """
-        makes a flow entity and adds to the db
-        :param exchange:
-        :return:
-        """
+    @staticmethod
+    def _flow_uid(exchange):
         if 'intermediate' in exchange.tag:
             try:
-                uid = exchange.attrib['intermediateExchangeId']
+                return exchange.attrib['intermediateExchangeId']
             except KeyError:
-                uid = exchange.attrib['id']
-            cat = [self._cls_to_text(exchange.classification)]
+                return exchange.attrib['id']
         elif 'elementary' in exchange.tag:
             try:
-                uid = exchange.attrib['elementaryExchangeId']
+                return exchange.attrib['elementaryExchangeId']
             except KeyError:
-                uid = exchange.attrib['id']
-            cat = self._cat_to_text(exchange.compartment)
+                return exchange.attrib['id']
         else:
             raise AttributeError('No exchange type found for id %s' % exchange.attrib['id'])
 
-        f = self[uid]
-        if f is not None:
-            return f
+    @classmethod
+    def _flow_record(cls, exchange):
+        """
+        Extract the flow information from an exchange element
+        :param exchange:
+        :return: an EcospoldFlowRecord
+        """
+        uid = cls._flow_uid(exchange)
+        elementary = 'elementary' in exchange.tag
+        if elementary:
+            cat = cls._cat_to_text(exchange.compartment)
+        else:
+            cat = [cls._cls_to_text(exchange.classification)]
 
         if 'casNumber' in exchange.attrib:
             cas = exchange.attrib['casNumber']
         else:
             cas = ''
 
-        q = self._create_quantity(exchange)
+        syns = _syn_set(exchange)
+        syns.add(uid)
+
+        return EcospoldFlowRecord(uid, elementary, exchange.name.text, cas, cat, exchange.attrib['unitId'],
+                                  exchange.unitName.text, sorted(syns))
+
+    def _create_flow(self, exchange):
+        """
+        makes a flow entity and adds to the db
+        :param exchange:
+        :return:
+        """
+        f = self[self._flow_uid(exchange)]
+        if f is not None:
+            return f
+        return self._flow_from_record(self._flow_record(exchange))
+
+    def _flow_from_record(self, rec):
+        f = self[rec.uid]
+        if f is not None:
+            return f
+
+        q = self._quantity_from_unit(rec.unit_id, rec.unit_name)
 
-        n = exchange.name.text
         c = 'EcoSpold02 Flow'
 
-        f = LcFlow(uid, Name=n, CasNumber=cas, Comment=c, Compartment=cat, ReferenceQuantity=q)
+        f = LcFlow(rec.uid, Name=rec.name, CasNumber=rec.cas, Comment=c, Compartment=rec.compartment,
+                   ReferenceQuantity=q)
         # TODO: implement ecospold flow properties, only for reference products
 
-        syns = _syn_set(exchange)
-        syns.add(uid)
-        f['Synonyms'] = syns
+        f['Synonyms'] = set(rec.synonyms)
 
         self.add(f)
 
@@ -306,35 +373,53 @@ class EcospoldV2Archive(LcArchive):
             c = 'no comment.'
         return c
 
-    def _create_process_entity(self, o):
+    @classmethod
+    def _process_record(cls, o):
         """
-        Constructs the process without populating exchanges
+        Extract the process metadata from a dataset
         :param o:
-        :return:
+        :return: an EcospoldProcessRecord
         """
         ad = find_tag(o, 'activityDescription')
 
         u = ad.activity.get('id')
 
-        if self[u] is not None:
-            return self[u]
-
         n = find_tag(ad, 'activityName').text
 
-        c = self._get_process_comment(ad, u)
+        c = cls._get_process_comment(ad, u)
 
         g = find_tag(ad, 'geography').shortname.text
 
         tp = find_tag(ad, 'timePeriod')
         stt = {'begin': tp.get('startDate'), 'end': tp.get('endDate')}
-        cls = [self._cls_to_text(i) for i in find_tags(ad, 'classification')]
-
-        p = LcProcess(u, Name=n, Comment=c, SpatialScope=g, TemporalScope=stt,
-                      Classifications=cls)
+        classes = [cls._cls_to_text(i) for i in find_tags(ad, 'classification')]
 
         parent = find_tag(o, 'activity').get('parentActivityId')
-        if parent is not None:
-            p['ParentActivityId'] = parent
+
+        return EcospoldProcessRecord(u, n, c, g, stt, classes, parent)
+
+    def _create_process_entity(self, o):
+        """
+        Constructs the process without populating exchanges
+        :param o:
+        :return:
+        """
+        u = find_tag(o, 'activityDescription').activity.get('id')
+
+        if self[u] is not None:
+            return self[u]
+
+        return self._process_from_record(self._process_record(o))
+
+    def _process_from_record(self, rec):
+        if self[rec.uid] is not None:
+            return self[rec.uid]
+
+        p = LcProcess(rec.uid, Name=rec.name, Comment=rec.comment, SpatialScope=rec.geography,
+                      TemporalScope=rec.temporal, Classifications=rec.classifications)
+
+        if rec.parent is not None:
+            p['ParentActivityId'] = rec.parent
 
         self.add(p)
         return p
@@ -355,22 +440,20 @@ class EcospoldV2Archive(LcArchive):
 
         raise KeyError('Noted reference exchange %s not found!' % rf_uuid)
 
-    def _collect_exchanges(self, o, ref_uuid):
+    @staticmethod
+    def _read_exchanges(o, ref_uuid):
         """
-
+        Generate the exchange elements of a dataset, together with their data
         :param o:
         :param ref_uuid: strictly for diagnostic purposes
-        :return:
+        :return: generates (exch, direction, value, activity link or None, is_ref, comment)
         """
-        flowlist = []
-
         for exch in find_tag(o, 'flowData').getchildren():
             if 'parameter' in exch.tag:
                 continue
             if 'impactIndicator' in exch.tag:
                 continue
 
-            f = self._create_flow(exch)
             is_ref = False
             if hasattr(exch, 'outputGroup'):
                 d = 'Output'
@@ -388,9 +471,6 @@ class EcospoldV2Archive(LcArchive):
                 raise DirectionlessExchangeError
             v = float(exch.get('amount'))  # or None if not found
             t = exch.get('activityLinkId')  # or None if not found
-            if t is None:
-                if 'elementary' in exch.tag:
-                    t = self.tm[f.context]
             try:
                 c = '; '.join([str(c) for c in exch.iterchildren() if c.tag == '{%s}comment' % o.nsmap[None]])
             except ValueError:
@@ -400,8 +480,23 @@ class EcospoldV2Archive(LcArchive):
 
                 print('Failed reading comment %s_%s: %s' % (u, ref_uuid, exch.get('id')))
                 c = None
-            flowlist.append(EcospoldExchange(f, d, v, t, is_ref, c))
-        return flowlist
+            yield exch, d, v, t, is_ref, c
+
+    def _ecospold_exchange(self, f, elementary, d, v, t, is_ref, c):
+        if t is None:
+            if elementary:
+                t = self.tm[f.context]
+        return EcospoldExchange(f, d, v, t, is_ref, c)
+
+    def _collect_exchanges(self, o, ref_uuid):
+        """
+
+        :param o:
+        :param ref_uuid: strictly for diagnostic purposes
+        :return:
+        """
+        return [self._ecospold_exchange(self._create_flow(exch), 'elementary' in exch.tag, d, v, t, is_ref, c)
+                for exch, d, v, t, is_ref, c in self._read_exchanges(o, ref_uuid)]
 
     @staticmethod
     def _collect_impact_scores(o):  # , process, flow):
@@ -480,70 +575,80 @@ class EcospoldV2Archive(LcArchive):
             rx = None
         '''
         if exchanges:
-            rx = None
-            exchs = self._collect_exchanges(o, ref_uuid)
-            if self._linked:
-                for exch in exchs:
-                    if exch.is_ref and exch.value != 0:
-                        try:
-                            _rx = p.add_exchange(exch.flow, exch.direction, value=exch.value)
-                        except AlreadyAReference:
-                            raise EcospoldV2Error('Already a reference: %s | %s' % (process_uuid, ref_uuid))
-                        p.set_reference(exch.flow, exch.direction)
-                        self._print('# Identified reference exchange\n %s' % _rx)
-                        if len(exch.comment) > 0:
-                            _rx.comment = exch.comment
-                        if exch.flow.external_ref == ref_uuid:
-                            if rx is None:
-                                rx = _rx
-                            else:
-                                raise EcospoldV2Error('Multiple rx found: %s | %s' % (process_uuid, ref_uuid))
-                if rx is None:
-                    raise EcospoldV2Error('No rx found: %s | %s' % (process_uuid, ref_uuid))
+            self._add_exchanges(p, self._collect_exchanges(o, ref_uuid), process_uuid, ref_uuid)
+        return p
+
+    def _add_exchanges(self, p, exchs, process_uuid, ref_uuid):
+        """
+        Add a dataset's exchanges to its process
+        :param p: the process
+        :param exchs: list of EcospoldExchanges
+        :param process_uuid: uuid of activity
+        :param ref_uuid: uuid of reference flow
+        :return:
+        """
+        rx = None
+        if self._linked:
             for exch in exchs:
-                """
-                If the dataset is linked, all we do is load non-zero exchanges, ideally all with terminations.  Spurious
-                 terminations in reference exchanges are dropped (deprecated EI linker feature)
-                If the dataset is unlinked, we will err on the side of adding zero-valued exchanges.  The unlinked data
-                 should include as much information as possible.  Spurious terminations in reference exchanges are
-                  retained, but the reference status is dropped (in-use EI linker feature)
-
-                We could simplify this function by placing those tests in _collect_exchanges, but I would rather not
-                muck with the data at that stage.
-
-                """
-                if exch.value == 0 and self._linked:
+                if exch.is_ref and exch.value != 0:
+                    try:
+                        _rx = p.add_exchange(exch.flow, exch.direction, value=exch.value)
+                    except AlreadyAReference:
+                        raise EcospoldV2Error('Already a reference: %s | %s' % (process_uuid, ref_uuid))
+                    p.set_reference(exch.flow, exch.direction)
+                    self._print('# Identified reference exchange\n %s' % _rx)
+                    if len(exch.comment) > 0:
+                        _rx.comment = exch.comment
+                    if exch.flow.external_ref == ref_uuid:
+                        if rx is None:
+                            rx = _rx
+                        else:
+                            raise EcospoldV2Error('Multiple rx found: %s | %s' % (process_uuid, ref_uuid))
+            if rx is None:
+                raise EcospoldV2Error('No rx found: %s | %s' % (process_uuid, ref_uuid))
+        for exch in exchs:
+            """
+            If the dataset is linked, all we do is load non-zero exchanges, ideally all with terminations.  Spurious
+             terminations in reference exchanges are dropped (deprecated EI linker feature)
+            If the dataset is unlinked, we will err on the side of adding zero-valued exchanges.  The unlinked data
+             should include as much information as possible.  Spurious terminations in reference exchanges are
+              retained, but the reference status is dropped (in-use EI linker feature)
+
+            We could simplify this function by placing those tests in _collect_exchanges, but I would rather not
+            muck with the data at that stage.
+
+            """
+            if exch.value == 0 and self._linked:
+                continue
+            self._print('## Exch %s [%s] (%g)' % (exch.flow, exch.direction, exch.value))
+
+            term = exch.termination
+            is_ref = exch.is_ref
+
+            if is_ref:
+                if self._linked:  # in new regime, ref exch is already added
+                    '''
+                    if self._linked:
+                        print('Squashing bad termination in linked reference exchange, %s\nFlow %s Term %s' % (
+                            p.external_ref, exch.flow.external_ref, exch.termination))
+                        term = None
+                    '''
                     continue
-                self._print('## Exch %s [%s] (%g)' % (exch.flow, exch.direction, exch.value))
-
-                term = exch.termination
-                is_ref = exch.is_ref
-
+                else:
+                    if exch.termination is not None:
+                        print('Removing reference status from linked reference exchange, %s\nFlow %s Term %s' % (
+                            p.external_ref, exch.flow.external_ref, exch.termination))
+                        is_ref = False
+
+            x = p.add_exchange(exch.flow, exch.direction, reference=rx, value=exch.value,
+                               termination=term)
+            if len(exch.comment) > 0:
+                x.comment = exch.comment
+
+            if not self._linked:
                 if is_ref:
-                    if self._linked:  # in new regime, ref exch is already added
-                        '''
-                        if self._linked:
-                            print('Squashing bad termination in linked reference exchange, %s\nFlow %s Term %s' % (
-                                p.external_ref, exch.flow.external_ref, exch.termination))
-                            term = None
-                        '''
-                        continue
-                    else:
-                        if exch.termination is not None:
-                            print('Removing reference status from linked reference exchange, %s\nFlow %s Term %s' % (
-                                p.external_ref, exch.flow.external_ref, exch.termination))
-                            is_ref = False
-
-                x = p.add_exchange(exch.flow, exch.direction, reference=rx, value=exch.value,
-                                   termination=term)
-                if len(exch.comment) > 0:
-                    x.comment = exch.comment
-
-                if not self._linked:
-                    if is_ref:
-                        self._print('## ## Exch is reference %s %s' % (exch.flow, exch.direction))
-                        p.set_reference(exch.flow, exch.direction)
-        return p
+                    self._print('## ## Exch is reference %s %s' % (exch.flow, exch.direction))
+                    p.set_reference(exch.flow, exch.direction)
 
     def find_tag(self, process_uuid, rf_uuid, tag):
         return find_tag(self.objectify(process_uuid, rf_uuid), tag)
@@ -641,19 +746,86 @@ class EcospoldV2Archive(LcArchive):
 
         return results
 
-    def _load_all(self, exchanges=True, bailout=None):
+    def _merge_dataset(self, process_uuid, ref_uuid, p_rec, x_recs):
+        """
+        Add a dataset parsed by _parse_process() to the archive
+        :param process_uuid:
+        :param ref_uuid:
+        :param p_rec: EcospoldProcessRecord
+        :param x_recs: list of exchange records, or None to skip exchanges
+        :return:
+        """
+        p = self[process_uuid]
+        if p is not None:
+            if p.has_reference(ref_uuid):
+                return p
+
+        p = self._process_from_record(p_rec)
+
+        if p.has_reference(ref_uuid):
+            self._print('Process %s already has reference %s' % (process_uuid, ref_uuid))
+            return p
+
+        if x_recs is not None:
+            exchs = [self._ecospold_exchange(self._flow_from_record(f), f.elementary, d, v, t, is_ref, c)
+                     for f, d, v, t, is_ref, c in x_recs]
+            self._add_exchanges(p, exchs, process_uuid, ref_uuid)
+        return p
+
+    def _parsed_processes(self, items, workers, exchanges):
+        """
+        Parse datasets in a pool of forked workers
+        :param items: list of (process uuid, list of ref uuids)
+        :param workers:
+        :param exchanges: whether to extract exchanges
+        :return: generates parse results in the order of items
+        """
+        global _loader
+        if _loader is not None:
+            raise RuntimeError('A parallel load is already running')
+        _loader = (self, exchanges)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'),
+                                     initializer=_init_loader) as executor:
+                for out in executor.map(_parse_process, items, chunksize=max(1, len(items) // (8 * workers))):
+                    yield out
+        finally:
+            _loader = None
+
+    def _load_all(self, exchanges=True, bailout=None, workers=None):
+        """
+        Load all datasets in the archive.
+        :param exchanges: [True] whether to load exchanges
+        :param bailout: [None] stop after this many processes
+        :param workers: [None] if greater than 1, parse the XML files in a pool of this many worker processes, and
+         add the results to the archive in the same order as a serial load.  Requires the 'fork' start method.
+        :return:
+        """
         now = time()
         count = 0
-        for p_u, r_set in self._process_flow_map.items():
-            for r_u in r_set:
-                self._create_process_and_single_reference(p_u, r_u, exchanges=exchanges)
-            count += 1
-            if count % 100 == 0:
-                print(' Loaded %d processes (t=%.2f s)' % (count, time()-now))
+        if workers is not None and workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            items = [(p_u, list(r_set)) for p_u, r_set in self._process_flow_map.items()]
             if bailout is not None:
-                if count > bailout:
-                    print('Bailing out...')
-                    break
+                items = items[:bailout + 1]
+            for (p_u, _), out in zip(items, self._parsed_processes(items, workers, exchanges)):
+                for r_u, p_rec, x_recs in out:
+                    self._merge_dataset(p_u, r_u, p_rec, x_recs)
+                count += 1
+                if count % 100 == 0:
+                    print(' Loaded %d processes (t=%.2f s)' % (count, time()-now))
+            if bailout is not None and count > bailout:
+                print('Bailing out...')
+        else:
+            for p_u, r_set in self._process_flow_map.items():
+                for r_u in r_set:
+                    self._create_process_and_single_reference(p_u, r_u, exchanges=exchanges)
+                count += 1
+                if count % 100 == 0:
+                    print(' Loaded %d processes (t=%.2f s)' % (count, time()-now))
+                if bailout is not None:
+                    if count > bailout:
+                        print('Bailing out...')
+                        break
 
         print(' Loaded %d processes (t=%.2f s)' % (count, time() - now))
         self.check_counter()
@@ -0,0 +1,160 @@
+import os
+import tempfile
+import unittest
+
+from ..ecospold2 import EcospoldV2Archive
+
+
+KG = '487df68b-4994-4027-8fdc-a4dc298257b7'
+CO2 = '349b29d1-3e58-4c66-98b9-9d1a076efd2e'
+CH4 = '0795345f-c7ae-410c-ad25-1845784c75f5'
+
+A = 'aaaaaaaa-0000-4000-8000-000000000001'  # power plant: consumes coal, emits CO2
+B = 'bbbbbbbb-0000-4000-8000-000000000002'  # coal mine: consumes electricity, emits methane
+C = 'cccccccc-0000-4000-8000-000000000003'  # refinery: two allocated co-products, consumes coal
+ELEC = 'eeeeeeee-0000-4000-8000-00000000000e'
+COAL = 'eeeeeeee-0000-4000-8000-00000000000c'
+FUEL = 'eeeeeeee-0000-4000-8000-00000000000f'
+TAR = 'eeeeeeee-0000-4000-8000-00000000000a'
+
+
+_SPOLD = '''<?xml version="1.0" encoding="UTF-8"?>
+<ecoSpold xmlns="http://www.EcoInvent.org/EcoSpold02">
+  <activityDataset>
+    <activityDescription>
+      <activity id="{id}">
+        <activityName>{name}</activityName>
+        <generalComment><text index="0">Synthetic dataset {name}</text></generalComment>
+      </activity>
+      <classification>
+        <classificationSystem>ISIC rev.4 ecoinvent</classificationSystem>
+        <classificationValue>0000:test</classificationValue>
+      </classification>
+      <geography><shortname>GLO</shortname></geography>
+      <timePeriod startDate="2010-01-01" endDate="2020-12-31"/>
+    </activityDescription>
+    <flowData>
+{exchanges}
+    </flowData>
+  </activityDataset>
+</ecoSpold>
+'''
+
+_INTERMEDIATE = '''      <intermediateExchange id="{xid}" unitId="{unit}" amount="{amount}" intermediateExchangeId="{flow}"{link}>
+        <name>{name}</name>
+        <unitName>kg</unitName>
+        <comment>{name} comment</comment>
+        <classification>
+          <classificationSystem>CPC</classificationSystem>
+          <classificationValue>1234: {name}</classificationValue>
+        </classification>
+        <{group}>{og}</{group}>
+      </intermediateExchange>'''
+
+_ELEMENTARY = '''      <elementaryExchange id="{xid}" unitId="{unit}" amount="{amount}" elementaryExchangeId="{flow}" casNumber="{cas}">
+        <name>{name}</name>
+        <unitName>kg</unitName>
+        <compartment>
+          <compartment>air</compartment>
+          <subcompartment>urban air close to ground</subcompartment>
+        </compartment>
+        <outputGroup>4</outputGroup>
+      </elementaryExchange>'''
+
+
+def _x(n, flow, name, amount, output=True, og=0, link=None):
+    return _INTERMEDIATE.format(xid='%08d-0000-4000-8000-000000000000' % n, unit=KG, amount=amount, flow=flow,
+                                name=name, group='outputGroup' if output else 'inputGroup', og=og,
+                                link='' if link is None else ' activityLinkId="%s"' % link)
+
+
+def _e(n, flow, name, amount, cas):
+    return _ELEMENTARY.format(xid='%08d-0000-4000-8000-000000000000' % n, unit=KG, amount=amount, flow=flow,
+                              name=name, cas=cas)
+
+
+_DATASETS = {
+    (A, ELEC): ('electricity production', [_x(1, ELEC, 'electricity', 1.0),
+                                           _x(2, COAL, 'hard coal', 0.4, output=False, og=5, link=B),
+                                           _e(3, CO2, 'Carbon dioxide, fossil', 0.9, '000124-38-9')]),
+    (B, COAL): ('hard coal mine operation', [_x(4, COAL, 'hard coal', 1.0),
+                                             _x(5, ELEC, 'electricity', 0.05, output=False, og=5, link=A),
+                                             _e(6, CH4, 'Methane, fossil', 0.01, '000074-82-8')]),
+    (C, FUEL): ('coal refinery', [_x(7, FUEL, 'coal fuel', 0.8),
+                                  _x(8, TAR, 'coal tar', 0.0),
+                                  _x(9, COAL, 'hard coal', 1.2, output=False, og=5, link=B),
+                                  _e(10, CO2, 'Carbon dioxide, fossil', 0.1, '000124-38-9')]),
+    (C, TAR): ('coal refinery', [_x(7, FUEL, 'coal fuel', 0.0),
+                                 _x(8, TAR, 'coal tar', 0.2),
+                                 _x(9, COAL, 'hard coal', 0.3, output=False, og=5, link=B),
+                                 _e(10, CO2, 'Carbon dioxide, fossil', 0.025, '000124-38-9')]),
+}
+
+
+# the contents of the archive as loaded by the serial loader prior to the introduction of parallel loading
+BASELINE = {
+    'processes': [
+        (A, 'electricity production', 'GLO', ((ELEC, 'Output'),)),
+        (B, 'hard coal mine operation', 'GLO', ((COAL, 'Output'),)),
+        (C, 'coal refinery', 'GLO', ((TAR, 'Output'), (FUEL, 'Output'))),
+    ],
+    'flows': [
+        (CH4, 'Methane, fossil', 'air; urban air close to ground'),
+        (CO2, 'Carbon dioxide, fossil', 'air; urban air close to ground'),
+        (TAR, 'coal tar', 'CPC: 1234: coal tar'),
+        (COAL, 'hard coal', 'CPC: 1234: hard coal'),
+        (ELEC, 'electricity', 'CPC: 1234: electricity'),
+        (FUEL, 'coal fuel', 'CPC: 1234: coal fuel'),
+    ],
+    'exchanges': [
+        (A, ELEC, CO2, 'Output', 0.9, 'urban air close to ground'),
+        (A, ELEC, COAL, 'Input', 0.4, B),
+        (B, COAL, CH4, 'Output', 0.01, 'urban air close to ground'),
+        (B, COAL, ELEC, 'Input', 0.05, A),
+        (C, TAR, CO2, 'Output', 0.125, 'urban air close to ground'),
+        (C, TAR, COAL, 'Input', 1.5, B),
+        (C, FUEL, CO2, 'Output', 0.125, 'urban air close to ground'),
+        (C, FUEL, COAL, 'Input', 1.5, B),
+    ]
+}
+
+
+def _contents(ar):
+    processes = sorted((p.external_ref, p.name, p['SpatialScope'],
+                        tuple(sorted((rx.flow.external_ref, rx.direction) for rx in p.references())))
+                       for p in ar.entities_by_type('process'))
+    flows = sorted((f.external_ref, f.name, '; '.join(f['Compartment'])) for f in ar.entities_by_type('flow'))
+    exchanges = sorted((p.external_ref, rx.flow.external_ref, x.flow.external_ref, x.direction, round(x.value, 12),
+                        str(x.termination))
+                       for p in ar.entities_by_type('process')
+                       for rx in p.references()
+                       for x in p.inventory(ref_flow=rx.flow))
+    return {'processes': processes, 'flows': flows, 'exchanges': exchanges}
+
+
+class EcospoldV2LoadTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._dir = tempfile.TemporaryDirectory()
+        for (act, ref), (name, exchanges) in _DATASETS.items():
+            with open(os.path.join(cls._dir.name, '%s_%s.spold' % (act, ref)), 'w') as fp:
+                fp.write(_SPOLD.format(id=act, name=name, exchanges='\n'.join(exchanges)))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._dir.cleanup()
+
+    def _load(self, workers):
+        ar = EcospoldV2Archive(self._dir.name, ref='test.ecospold2')
+        ar.load_all(workers=workers)
+        return _contents(ar)
+
+    def test_serial(self):
+        self.assertDictEqual(self._load(1), BASELINE)
+
+    def test_parallel(self):
+        self.assertDictEqual(self._load(2), BASELINE)
+
+
+if __name__ == '__main__':
+    unittest.main()
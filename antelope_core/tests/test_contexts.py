@@ -291,6 +291,21 @@ class DefaultContextsTest(unittest.TestCase):
         self.assertIs(self.cm.find_matching_context(fx), tgt)
         self.assertIs(self.cm['dummy.test:ground'], tgt)
 
+    def test_match_memo(self):
+        foreign_cm = ContextManager()
+        fx = foreign_cm.add_compartments(('Elementary Flows', 'NETL Elementary Flows', ' [Resources] ', 'ground'))
+        fx.add_origin('memo.test')
+
+        self.assertIs(self.cm.find_matching_context(fx), self.cm._null_entry)
+        self.assertIs(self.cm.find_matching_context(fx), self.cm._null_entry)
+        self.assertEqual(self.cm.match_stats()['misses'], 1)
+        self.assertEqual(self.cm.match_stats()['hits'], 1)
+
+        self.cm.add_context_hint('memo.test', '[resources]', 'Resources')
+        self.assertEqual(self.cm.match_stats()['size'], 0)
+        self.assertIs(self.cm.find_matching_context(fx), self.cm['from ground'])
+        self.assertEqual(self.cm.match_stats()['misses'], 2)
+
     def test_match_tuple(self):
         res = self.cm['Resources']
         ing = self.cm['in ground']  # the true name is 'from ground'; 'in ground' is a synonym
@@ -0,0 +1,124 @@
+import os
+import json
+import tempfile
+import unittest
+
+from ..from_json import (from_json, from_json_stream, to_json, JsonSection, JsonSectionReader, join_sections,
+                         write_json_sections)
+from ..archives import archive_from_json, LcArchive
+from ..archives.tests.test_base import test_json, test_file
+
+
+class JsonStreamTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._file = os.path.join(self._dir.name, 'test.json')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _check(self, filename):
+        j = from_json_stream(filename)
+        self.assertIn('flows', j)
+        self.assertIsInstance(j['flows'], JsonSection)
+        self.assertListEqual(list(j['flows']), test_json['flows'])
+        self.assertListEqual(list(j['processes']), test_json['processes'])
+        self.assertEqual(j['dataReference'], test_json['dataReference'])
+        self.assertNotIn('termManager', j)
+
+    def test_indented(self):
+        to_json(test_json, self._file)
+        self._check(self._file)
+
+    def test_gzip(self):
+        to_json(test_json, self._file, gzip=True)
+        self._check(self._file + '.gz')
+
+    def test_compact_small_chunks(self):
+        with open(self._file, 'w') as fp:
+            json.dump(test_json, fp)
+        chunk = JsonSectionReader._chunk
+        JsonSectionReader._chunk = 16
+        try:
+            self._check(self._file)
+        finally:
+            JsonSectionReader._chunk = chunk
+
+    def test_compact_skip(self):
+        to_json(test_json, self._file, compact=True)
+        decoded = []
+
+        class _Reader(JsonSectionReader):
+            def read(self):
+                obj = super(_Reader, self).read()
+                decoded.append(obj)
+                return obj
+
+        reader = _Reader(self._file)
+        try:
+            values, offsets = reader.index()
+        finally:
+            reader.close()
+        self.assertIn('flows', offsets)
+        self.assertNotIn(test_json['flows'], decoded)  # skipped element by element, not decoded whole
+        self.assertEqual(len([d for d in decoded if d in test_json['flows']]), len(test_json['flows']))
+
+    def test_archive(self):
+        to_json(test_json, self._file, gzip=True)
+        ar = archive_from_json(self._file + '.gz', ref=test_json['dataReference'])
+        j = from_json(self._file + '.gz')
+        self.assertEqual(len(list(ar.entities_by_type('flow'))), len(j['flows']))
+        self.assertEqual(len(list(ar.entities_by_type('process'))), len(j['processes']))
+
+
+class JsonWriteTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _read(self, name):
+        with open(os.path.join(self._dir.name, name)) as fp:
+            return fp.read()
+
+    def _sections(self):
+        header = {k: v for k, v in test_json.items() if k not in ('flows', 'processes')}
+        return header, {'flows': iter(test_json['flows']), 'processes': iter(test_json['processes']), 'none': []}
+
+    def test_sections_match_to_json(self):
+        for opts in ({}, {'compact': True}, {'sort_keys': False}, {'compact': True, 'sort_keys': False}):
+            to_json(join_sections(*self._sections()), os.path.join(self._dir.name, 'whole.json'), **opts)
+            write_json_sections(*self._sections(), os.path.join(self._dir.name, 'sections.json'), **opts)
+            self.assertEqual(self._read('sections.json'), self._read('whole.json'), opts)
+
+    def test_archive(self):
+        ar = LcArchive.from_file(test_file)
+        ar.write_to_file(os.path.join(self._dir.name, 'indented.json'), exchanges=True)
+        to_json(ar.serialize(exchanges=True), os.path.join(self._dir.name, 'whole.json'))
+        self.assertEqual(self._read('indented.json'), self._read('whole.json'))
+
+        ar.write_to_file(os.path.join(self._dir.name, 'compact.json'), exchanges=True, compact=True, fast=True)
+        compact = self._read('compact.json')
+        self.assertNotIn('\n', compact)
+        self.assertEqual(json.loads(compact), json.loads(json.dumps(ar.serialize(exchanges=True))))
+
+    def test_failed_write(self):
+        fname = os.path.join(self._dir.name, 'sections.json')
+        write_json_sections(*self._sections(), fname)
+        before = self._read('sections.json')
+
+        def _broken():
+            yield test_json['flows'][0]
+            raise ValueError('serialization failed')
+
+        header, sections = self._sections()
+        sections['flows'] = _broken()
+        with self.assertRaises(ValueError):
+            write_json_sections(header, sections, fname)
+        self.assertEqual(self._read('sections.json'), before)
+        self.assertListEqual(os.listdir(self._dir.name), ['sections.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,11 @@
 import unittest
 
+import numpy as np
+
+from ..characterizations import QRResult
+from ..contexts import NullContext
+from ..entities import LcFlow, LcProcess, LcQuantity
+from ..exchanges import ExchangeValue
 from ..lcia_results import LciaResult
 from antelope import CatalogRef
 
@@ -14,6 +20,52 @@ class LciaResultTestCase(unittest.TestCase):
         res = LciaResult(qty)
         self.assertEqual(res.total(), 0.0)
 
+    def test_lazy_details(self):
+        """
+        Scores are kept as arrays until the details are requested
+        :return:
+        """
+        mass = LcQuantity.new('Mass', 'kg')
+        gwp = LcQuantity.new('GWP', 'kg CO2 eq')
+        p = LcProcess.new('test process')
+        res = LciaResult(gwp)
+        for name, value, cf in (('a', 2.0, 3.0), ('b', 1.5, 0.0), ('c', 4.0, -1.0)):
+            f = LcFlow.new(name, mass)
+            qrr = QRResult(name, mass, gwp, NullContext, 'GLO', 'test', cf)
+            res.add_score('test', ExchangeValue(p, f, 'Output', value=value), qrr)
+        f = LcFlow.new('d', mass)
+        qrr = QRResult('d', mass, gwp, NullContext, 'GLO', 'test', 10.0)
+        res.add_scores('test', [ExchangeValue(p, f, 'Output', value=0.5)], [qrr], np.array([0.5]), np.array([1.0]),
+                       np.array([10.0]))
+
+        component = res['test']
+        self.assertEqual(component._details, [])
+        self.assertAlmostEqual(res.total(), 6.0 - 4.0 + 5.0)
+        res.scale_result(2.0)
+        self.assertAlmostEqual(res.total(), 14.0)
+        self.assertEqual([d.flowable for d in component.details()], ['a', 'c', 'd'])
+        self.assertEqual(len(component._details), 4)
+        self.assertAlmostEqual(res.total(), 14.0)
+
+    def test_add_after_details(self):
+        """
+        Scores added after the details have been read are counted once
+        :return:
+        """
+        mass = LcQuantity.new('Mass', 'kg')
+        gwp = LcQuantity.new('GWP', 'kg CO2 eq')
+        p = LcProcess.new('test process')
+        res = LciaResult(gwp)
+        for name, value, cf in (('a', 2.0, 3.0), ('b', 1.0, 1.0)):
+            f = LcFlow.new(name, mass)
+            qrr = QRResult(name, mass, gwp, NullContext, 'GLO', 'test', cf)
+            res.add_score('test', ExchangeValue(p, f, 'Output', value=value), qrr)
+            if name == 'a':
+                self.assertEqual(len(list(res['test'].details())), 1)
+        self.assertAlmostEqual(res.total(), 7.0)
+        self.assertEqual(len(list(res['test'].details())), 2)
+        self.assertAlmostEqual(res.total(), 7.0)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -8,7 +8,8 @@ requires = [
     "xlstools>=0.1.3",
     "python-magic>=0.4.18",
     "requests>=2.25",
-    "pydantic>=2.5.0"
+    "pydantic>=2.5.0",
+    "numpy>=1.19"
 ]
 
 # optional: pylzma
@@ -87,7 +88,9 @@ setup(
     install_requires=requires,
     extras_require={
         'XML': ['lxml>=1.2.0'],
-        'write_to_excel': ['xlsxwriter>=1.3.7']
+        'write_to_excel': ['xlsxwriter>=1.3.7'],
+        'fast_json': ['orjson'],
+        'background': ['scipy']
     },
     include_package_data=True,
     url="https://github.com/AntelopeLCA/core",